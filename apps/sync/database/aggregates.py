@@ -0,0 +1,458 @@
+import datetime
+import json
+import re
+from typing import Any, List, Mapping, Tuple
+from psycopg import sql
+from wywy_website_types import DictSchema
+
+from utils import get_env_int
+from database.filters import parse_select_filters
+
+# the largest number of buckets that a downsample request may ask for
+MAX_DOWNSAMPLE_BUCKETS: int = get_env_int("MAX_DOWNSAMPLE_BUCKETS", 10000)
+
+# the query parameters of aggregate and downsample requests that are not filters (see parse_select_filters)
+AGGREGATE_PARAMETERS: set[str] = {"group_by", "metrics"}
+DOWNSAMPLE_PARAMETERS: set[str] = {
+    "column",
+    "bucket",
+    "start",
+    "end",
+    "gaps",
+    "metrics",
+}
+
+# aggregate functions (?metrics=[function]:[column]) and the datatypes that they accept. count takes no column.
+AGGREGATE_DATATYPES: dict[str, set[str]] = {
+    "sum": {"int", "integer", "float", "number"},
+    "avg": {"int", "integer", "float", "number"},
+    "min": {"int", "integer", "float", "number", "date", "time", "timestamp"},
+    "max": {"int", "integer", "float", "number", "date", "time", "timestamp"},
+}
+
+# datatypes that rows can be grouped by as they are
+GROUP_DATATYPES: set[str] = {"enum", "bool", "boolean", "date"}
+
+# datatypes that rows can be grouped by after truncating them (?group_by=[column]:[unit])
+DATE_TRUNC_UNITS: dict[str, set[str]] = {
+    "date": {"week", "month", "quarter", "year"},
+    "timestamp": {"hour", "day", "week", "month", "quarter", "year"},
+}
+
+# ?group_by=tag groups data by its tags
+TAG_GROUP = "tag"
+
+# ?bucket=[number][unit], e.g. 15m, 1h, 7d
+BUCKET_UNITS: dict[str, datetime.timedelta] = {
+    "s": datetime.timedelta(seconds=1),
+    "m": datetime.timedelta(minutes=1),
+    "h": datetime.timedelta(hours=1),
+    "d": datetime.timedelta(days=1),
+    "w": datetime.timedelta(weeks=1),
+}
+
+# buckets are aligned to this instant (a Monday at midnight), so that weekly buckets start on Mondays
+BUCKET_ORIGIN = datetime.datetime(2000, 1, 3)
+
+# columns that data can be downsampled along
+DOWNSAMPLE_DATATYPES: set[str] = {"date", "timestamp"}
+
+
+def construct_group(
+    group: str, schema: DictSchema, tagging: bool
+) -> Tuple[List[str], List[sql.Composable]]:
+    """Reads a single grouping (?group_by=[column] | [column]:[unit] | tag) of an aggregate request.
+
+    Args:
+        group (str): The grouping.
+        schema (DictSchema): The table's schema.
+        tagging (bool): Whether or not the table has tags.
+
+    Raises:
+        ValueError: When the rows cannot be grouped this way.
+
+    Returns:
+        Tuple[List[str], List[sql.Composable]]: The names of the grouped columns and the expressions that they are grouped by.
+    """
+    if group == TAG_GROUP:
+        if not tagging:
+            raise ValueError("This table has no tags.")
+        return ["tag_id", "tag_name"], [
+            sql.SQL("tag_names.id"),
+            sql.SQL("tag_names.tag_name"),
+        ]
+    if group == "primary_tag" and tagging:
+        return ["primary_tag"], [sql.SQL("entries.primary_tag")]
+
+    column_name, _, unit = group.partition(":")
+    if column_name not in schema:
+        raise ValueError(f'Cannot group by unknown column "{column_name}".')
+    datatype = schema[column_name]["datatype"]
+    column = sql.Identifier("entries", column_name)
+
+    if not unit:
+        if datatype not in GROUP_DATATYPES:
+            raise ValueError(f'Cannot group by {datatype} column "{column_name}".')
+        return [column_name], [column]
+
+    if unit not in DATE_TRUNC_UNITS.get(datatype, set()):
+        raise ValueError(f'Cannot group column "{column_name}" by {unit}.')
+    # dates are truncated as timestamps and turned back into dates
+    return [column_name], [
+        sql.SQL(
+            "date_trunc({unit}, {column}::timestamp)::date"
+            if datatype == "date"
+            else "date_trunc({unit}, {column})"
+        ).format(unit=sql.Literal(unit), column=column)
+    ]
+
+
+def construct_metric(metric: str, schema: DictSchema) -> Tuple[str, sql.Composable]:
+    """Reads a single metric (?metrics=count | [function]:[column]) of an aggregate request.
+
+    Args:
+        metric (str): The metric.
+        schema (DictSchema): The table's schema.
+
+    Raises:
+        ValueError: When the metric is unknown or does not suit its column.
+
+    Returns:
+        Tuple[str, sql.Composable]: The metric's name and expression.
+    """
+    if metric == "count":
+        return "count", sql.SQL("count(*)")
+
+    function_name, _, column_name = metric.partition(":")
+    if function_name not in AGGREGATE_DATATYPES:
+        raise ValueError(f'Unknown metric "{metric}".')
+    if column_name not in schema:
+        raise ValueError(f'Cannot aggregate unknown column "{column_name}".')
+    if schema[column_name]["datatype"] not in AGGREGATE_DATATYPES[function_name]:
+        raise ValueError(f'Cannot {function_name} column "{column_name}".')
+
+    return f"{function_name}_{column_name}", sql.SQL("{function}({column})").format(
+        function=sql.SQL(function_name),
+        column=sql.Identifier("entries", column_name),
+    )
+
+
+def construct_aggregate_query(
+    table_name: str,
+    schema: DictSchema,
+    params: Mapping[str, str],
+    tagging: bool = False,
+) -> Tuple[sql.Composed, dict[str, Any]]:
+    """Generates a GROUP BY query that makes PostgreSQL build the whole response document: {"columns": [...], "data": [[...], ...]}.
+
+    ?group_by=[grouping],... groups the rows by enum, bool or date columns ([column]), by truncated date or timestamp columns ([column]:hour|day|week|month|quarter|year) or by their tags (tag). Defaults to a single group.
+    ?metrics=[metric],... computes count or sum|avg|min|max:[column] of each group. Defaults to count.
+    Rows can be filtered in the same way as SELECT requests (see parse_select_filters).
+
+    Args:
+        table_name (str): The table to aggregate.
+        schema (DictSchema): The table's schema.
+        params (Mapping[str, str]): The query parameters.
+        tagging (bool, optional): Whether or not the table has tags. Defaults to False.
+
+    Raises:
+        ValueError: When a parameter is unknown or invalid.
+
+    Returns:
+        Tuple[sql.Composed, dict[str, Any]]: The query and its parameters.
+    """
+    for parameter_name in ("fields", "order"):
+        if parameter_name in params:
+            raise ValueError(f"Aggregates do not support {parameter_name}.")
+    filters = parse_select_filters(params, schema, tagging, AGGREGATE_PARAMETERS)
+    if filters["order_by"] is not None:
+        raise ValueError("Aggregates cannot be ordered by distance.")
+
+    group_names: List[str] = []
+    group_expressions: List[sql.Composable] = []
+    groups = [group for group in params.get("group_by", "").split(",") if group]
+    for group in groups:
+        names, expressions = construct_group(group, schema, tagging)
+        group_names.extend(names)
+        group_expressions.extend(expressions)
+
+    metric_names: List[str] = []
+    metric_expressions: List[sql.Composable] = []
+    for metric in params.get("metrics", "count").split(","):
+        name, expression = construct_metric(metric, schema)
+        metric_names.append(name)
+        metric_expressions.append(expression)
+
+    column_names = [*group_names, *metric_names]
+    if len(set(column_names)) != len(column_names):
+        raise ValueError("Every grouping and metric must be different.")
+    aliases = [sql.Identifier(f"column_{i}") for i in range(len(column_names))]
+
+    # filtering before joining keeps the filters' column names unambiguous
+    entries = sql.SQL("(SELECT * FROM {table_name} {conditions}) AS entries").format(
+        table_name=sql.Identifier(table_name),
+        conditions=(
+            sql.SQL("WHERE {conditions}").format(
+                conditions=sql.SQL(" AND ").join(filters["conditions"])
+            )
+            if filters["conditions"]
+            else sql.SQL("")
+        ),
+    )
+    if TAG_GROUP in groups:
+        entries = sql.SQL(
+            "{entries} INNER JOIN {tags} AS tags ON tags.entry_id = entries.id INNER JOIN {tag_names} AS tag_names ON tag_names.id = tags.tag_id"
+        ).format(
+            entries=entries,
+            tags=sql.Identifier(f"{table_name}_tags"),
+            tag_names=sql.Identifier(f"{table_name}_tag_names"),
+        )
+
+    query = sql.SQL("""
+        SELECT json_build_object(
+            'columns', {columns}::json,
+            'data', COALESCE(json_agg(json_build_array({aliases}) {order}), '[]'::json)
+        )::text
+        FROM (
+            SELECT {values}
+            FROM {entries}
+            {group_by}
+        ) AS groups
+        """).format(
+        columns=sql.Literal(json.dumps(column_names)),
+        aliases=sql.SQL(", ").join(
+            sql.SQL("groups.{alias}").format(alias=alias) for alias in aliases
+        ),
+        order=(
+            sql.SQL("ORDER BY {aliases}").format(
+                aliases=sql.SQL(", ").join(
+                    sql.SQL("groups.{alias}").format(alias=alias)
+                    for alias in aliases[: len(group_names)]
+                )
+            )
+            if group_names
+            else sql.SQL("")
+        ),
+        values=sql.SQL(", ").join(
+            sql.SQL("{expression} AS {alias}").format(
+                expression=expression, alias=alias
+            )
+            for expression, alias in zip(
+                [*group_expressions, *metric_expressions], aliases
+            )
+        ),
+        entries=entries,
+        group_by=(
+            sql.SQL("GROUP BY {expressions}").format(
+                expressions=sql.SQL(", ").join(group_expressions)
+            )
+            if group_expressions
+            else sql.SQL("")
+        ),
+    )
+
+    return query, filters["params"]
+
+
+def parse_bucket(value: str) -> datetime.timedelta:
+    """Reads the bucket width (?bucket=[number][s|m|h|d|w]) of a downsample request.
+
+    Args:
+        value (str): The bucket width, e.g. 15m.
+
+    Raises:
+        ValueError: When the width is malformed or not positive.
+
+    Returns:
+        datetime.timedelta: The bucket width.
+    """
+    matches = re.fullmatch(r"([0-9]+)([a-z])", value.strip().lower())
+    if matches is None or matches.group(2) not in BUCKET_UNITS:
+        raise ValueError(
+            f'"{value}" is not a bucket width. Expected [number][{"|".join(BUCKET_UNITS)}], e.g. 15m.'
+        )
+    bucket = int(matches.group(1)) * BUCKET_UNITS[matches.group(2)]
+    if bucket <= datetime.timedelta(0):
+        raise ValueError("Buckets must be wider than 0.")
+    return bucket
+
+
+def parse_bound(value: str | None, name: str, datatype: str) -> datetime.datetime:
+    """Reads a bound (?start= | ?end=) of a downsample request as a naive UTC timestamp.
+
+    Args:
+        value (str | None): The bound.
+        name (str): The name of the query parameter.
+        datatype (str): The datatype of the downsampled column.
+
+    Raises:
+        ValueError: When the bound is missing or malformed.
+
+    Returns:
+        datetime.datetime: The bound.
+    """
+    if value is None:
+        raise ValueError(f"Downsampling requires {name}.")
+    try:
+        match (datatype):
+            case "date":
+                date = datetime.date.fromisoformat(value)
+                return datetime.datetime(date.year, date.month, date.day)
+            case _:
+                bound = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} "{value}" is not a valid {datatype}.')
+
+    if bound.tzinfo is not None:
+        bound = bound.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return bound
+
+
+def construct_downsample_query(
+    table_name: str,
+    schema: DictSchema,
+    params: Mapping[str, str],
+    tagging: bool = False,
+) -> Tuple[sql.Composed, dict[str, Any]]:
+    """Generates a date_bin query that summarises a date or timestamp column in fixed-width buckets, so that charts cost O(buckets) to load: {"columns": ["bucket", ...], "data": [[...], ...]}.
+
+    ?column=[column] is the column to bucket along. Defaults to the table's only date or timestamp column.
+    ?bucket=[number][s|m|h|d|w] is the bucket width, e.g. 15m.
+    ?start=...&end=... bound the buckets (end is exclusive). Both are required, so that the rows can be found through an index on the column (e.g. brin) and the number of buckets is capped.
+    ?metrics=[metric],... computes count or sum|avg|min|max:[column] of each bucket. Defaults to count and the avg of every numeric column.
+    ?gaps=true|false fills buckets without rows with a count of 0 and nulls. Defaults to true.
+    Rows can be filtered in the same way as SELECT requests (see parse_select_filters).
+
+    Args:
+        table_name (str): The table to downsample.
+        schema (DictSchema): The table's schema.
+        params (Mapping[str, str]): The query parameters.
+        tagging (bool, optional): Whether or not the table has tags. Defaults to False.
+
+    Raises:
+        ValueError: When a parameter is unknown or invalid.
+
+    Returns:
+        Tuple[sql.Composed, dict[str, Any]]: The query and its parameters.
+    """
+    for parameter_name in ("fields", "order", "group_by"):
+        if parameter_name in params:
+            raise ValueError(f"Downsampling does not support {parameter_name}.")
+    filters = parse_select_filters(params, schema, tagging, DOWNSAMPLE_PARAMETERS)
+    if filters["order_by"] is not None:
+        raise ValueError("Downsampled buckets cannot be ordered by distance.")
+
+    # find the column to bucket along
+    if "column" in params:
+        column_name = params["column"]
+        if column_name not in schema:
+            raise ValueError(f'Cannot downsample unknown column "{column_name}".')
+        if schema[column_name]["datatype"] not in DOWNSAMPLE_DATATYPES:
+            raise ValueError(f'Column "{column_name}" is not a date or timestamp.')
+    else:
+        column_names = [
+            name
+            for name, column_schema in schema.items()
+            if column_schema["datatype"] in DOWNSAMPLE_DATATYPES
+        ]
+        if len(column_names) != 1:
+            raise ValueError(
+                "Downsampling requires column when a table does not have exactly one date or timestamp column."
+            )
+        column_name = column_names[0]
+    datatype = schema[column_name]["datatype"]
+
+    # find the buckets
+    bucket = parse_bucket(params.get("bucket", ""))
+    start = parse_bound(params.get("start"), "start", datatype)
+    end = parse_bound(params.get("end"), "end", datatype)
+    if start >= end:
+        raise ValueError("start must be before end.")
+    first_bucket = BUCKET_ORIGIN + ((start - BUCKET_ORIGIN) // bucket) * bucket
+    num_buckets = -(-(end - first_bucket) // bucket)
+    if num_buckets > MAX_DOWNSAMPLE_BUCKETS:
+        raise ValueError(
+            f"Cannot downsample into {num_buckets} buckets. At most {MAX_DOWNSAMPLE_BUCKETS} are allowed."
+        )
+    gaps = params.get("gaps", "true").lower() != "false"
+
+    # find the metrics
+    metrics = (
+        params["metrics"].split(",")
+        if "metrics" in params
+        else [
+            "count",
+            *(
+                f"avg:{name}"
+                for name, column_schema in schema.items()
+                if column_schema["datatype"] in AGGREGATE_DATATYPES["avg"]
+            ),
+        ]
+    )
+    metric_names: List[str] = []
+    metric_expressions: List[sql.Composable] = []
+    for metric in metrics:
+        name, expression = construct_metric(metric, schema)
+        metric_names.append(name)
+        metric_expressions.append(expression)
+    if len(set(metric_names)) != len(metric_names):
+        raise ValueError("Every metric must be different.")
+    aliases = [sql.Identifier(f"column_{i}") for i in range(len(metric_names))]
+
+    # the raw column is compared with the bounds, so that an index on it can be used
+    column = sql.Identifier("entries", column_name)
+    conditions: List[sql.Composable] = [
+        sql.SQL("{column} >= %(start)s AND {column} < %(end)s").format(column=column),
+        *filters["conditions"],
+    ]
+
+    query = sql.SQL("""
+        WITH buckets AS (
+            SELECT date_bin(%(bucket)s, {column}::timestamp, %(origin)s) AS bucket, {values}
+            FROM {table_name} AS entries
+            WHERE {conditions}
+            GROUP BY 1
+        )
+        SELECT json_build_object(
+            'columns', {columns}::json,
+            'data', COALESCE(json_agg(json_build_array(bucket, {metrics}) ORDER BY bucket), '[]'::json)
+        )::text
+        FROM {buckets}
+        """).format(
+        column=column,
+        values=sql.SQL(", ").join(
+            sql.SQL("{expression} AS {alias}").format(
+                expression=expression, alias=alias
+            )
+            for expression, alias in zip(metric_expressions, aliases)
+        ),
+        table_name=sql.Identifier(table_name),
+        conditions=sql.SQL(" AND ").join(conditions),
+        columns=sql.Literal(json.dumps(["bucket", *metric_names])),
+        # empty buckets have no rows to count
+        metrics=sql.SQL(", ").join(
+            (
+                sql.SQL("COALESCE({alias}, 0)").format(alias=alias)
+                if name == "count"
+                else alias
+            )
+            for name, alias in zip(metric_names, aliases)
+        ),
+        buckets=(
+            sql.SQL(
+                "generate_series(%(first_bucket)s, %(last_bucket)s, %(bucket)s) AS series(bucket) LEFT JOIN buckets USING (bucket)"
+            )
+            if gaps
+            else sql.SQL("buckets")
+        ),
+    )
+
+    return query, {
+        **filters["params"],
+        "bucket": bucket,
+        "origin": BUCKET_ORIGIN,
+        "start": start if datatype == "timestamp" else start.date(),
+        "end": end if datatype == "timestamp" else end.date(),
+        "first_bucket": first_bucket,
+        "last_bucket": first_bucket + (num_buckets - 1) * bucket,
+    }
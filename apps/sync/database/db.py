@@ -1,12 +1,25 @@
+import datetime
+import json
 import logging
+from decimal import Decimal
 import psycopg
 from psycopg import sql, Connection
-from typing import Any, List, TypedDict
+from typing import Any, Iterable, Iterator, List, Literal, Mapping, Sequence, Tuple, TypedDict
 from wywy_website_types import Entry, DictSchema
 from constants import CONN_CONFIG
+from utils import get_env_int
+from database.info import bump_table_version
 
 logger = logging.getLogger("database")
 
+# the number of rows that SELECT requests return by default, and the most that they may ask for
+SELECT_PAGE_SIZE: int = get_env_int("SELECT_PAGE_SIZE", 500)
+SELECT_MAX_PAGE_SIZE: int = get_env_int("SELECT_MAX_PAGE_SIZE", 5000)
+# the number of columns per jsonb_build_array call of a response row (see construct_row_array)
+ROW_ARRAY_CHUNK_SIZE = 50
+# the number of rows that streamed SELECT requests read from the database at once
+STREAM_ITERSIZE: int = get_env_int("STREAM_ITERSIZE", 2000)
+
 
 def get_remote_id(
     database_name: str, table_name: str, id: int | str
@@ -31,6 +44,45 @@ def get_remote_id(
         return output
 
 
+def get_local_ids(
+    info_conn: Connection, database_name: str, remote_ids: dict[str, Iterable[Any]]
+) -> dict[Tuple[str, str], str]:
+    """Translates IDs from the master database into local IDs through the sync_status table, using a single query.
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        database_name (str): The target database name.
+        remote_ids (dict[str, Iterable[Any]]): The remote IDs to translate, grouped by the name of the table that contains them.
+
+    Returns:
+        dict[Tuple[str, str], str]: The local IDs, keyed by table name and (stringified) remote ID. Remote IDs that are not known locally are left out.
+    """
+    table_names: List[str] = []
+    ids: List[str] = []
+    for table_name, table_remote_ids in remote_ids.items():
+        for remote_id in table_remote_ids:
+            table_names.append(table_name)
+            ids.append(str(remote_id))
+
+    if not ids:
+        return {}
+
+    with info_conn.execute(
+        """
+        SELECT sync_status.table_name, sync_status.remote_id, sync_status.entry_id
+        FROM sync_status
+        INNER JOIN unnest(%s::text[], %s::text[]) AS remote (table_name, remote_id)
+        ON sync_status.table_name = remote.table_name AND sync_status.remote_id = remote.remote_id
+        WHERE sync_status.database_name = %s;
+        """,
+        (table_names, ids, database_name),
+    ) as info_cur:
+        return {
+            (table_name, remote_id): entry_id
+            for table_name, remote_id, entry_id in info_cur
+        }
+
+
 def update_foreign_key(
     entry: Entry,
     database_name: str,
@@ -70,29 +122,50 @@ def update_foreign_key(
     entry[target] = remote_id
 
 
+GeometryFormat = Literal["wkt", "geojson", "wkb"]
+
+# how geodetic points are SELECTed for each geometry format
+GEOMETRY_FORMATS: dict[GeometryFormat, str] = {
+    "wkt": "ST_AsText({column_name}) AS {column_name}",
+    "geojson": "ST_AsGeoJSON({column_name})::json AS {column_name}",
+    # hex-encoded well-known binary: 42 characters per point
+    "wkb": "encode(ST_AsBinary({column_name}), 'hex') AS {column_name}",
+}
+
+
 def construct_select_all_query(
     table_name: str,
     schema: DictSchema,
     column_name_prefix: str = "",
     conditions: sql.Composable | sql.Composed = sql.SQL(""),
-    values: List[sql.Composable] = [],
+    values: List[sql.Composable] | None = None,
     tagging: bool = False,
+    order: sql.Composable | sql.Composed = sql.SQL(""),
+    limit: int | None = SELECT_PAGE_SIZE,
+    geometry_format: GeometryFormat = "wkt",
 ) -> sql.Composed:
     """Generates a SELECT query that contains all of the columns from the schema.
 
-    SELECT {values} FROM {table_name} {conditions} LIMIT 500;
+    SELECT {values} FROM {table_name} {conditions} {order} LIMIT {limit}
+
+    The query has no trailing semicolon so that it can be wrapped (e.g. by a server-side cursor).
 
     Args:
         table_name (str): _description_
         schema (DictSchema): _description_
         column_name_prefix (str, optional): The prefix to add to each column name except the primary_tag column. This argument is useful for JOINs. Defaults to an empty string.
         conditions (sql.Composable | sql.Composed, optional): The extra conditions or JOINs of the SELECT query. Defaults to an empty condition.
-        values (List[sql.Composable], optional): Any additional values to SELECT. Defaults to an empty list.
+        values (List[sql.Composable] | None, optional): Any additional values to SELECT. The list is not modified. Defaults to None.
         tagging (bool, optional): Whether or not to SELECT a primary_tag column. Defaults to False.
+        order (sql.Composable | sql.Composed, optional): The ORDER BY clause. Defaults to no ordering.
+        limit (int | None, optional): The maximum number of rows to SELECT, or None for no limit. Defaults to the SELECT_PAGE_SIZE environment variable or 500.
+        geometry_format (GeometryFormat, optional): How to SELECT geodetic points: as WKT text, as GeoJSON or as hex-encoded WKB. Defaults to "wkt".
 
     Returns:
         sql.Composed: _description_
     """
+    # copy the values so that neither the caller's list nor a shared default grows
+    values = [] if values is None else list(values)
 
     if tagging:
         values.append(sql.Identifier("primary_tag"))
@@ -101,7 +174,7 @@ def construct_select_all_query(
         match (schema[column_name]["datatype"]):
             case "geodetic point":
                 values.append(
-                    sql.SQL("ST_AsText({column_name}) AS {column_name}").format(
+                    sql.SQL(GEOMETRY_FORMATS[geometry_format]).format(
                         column_name=sql.Identifier(f"{column_name_prefix}{column_name}")
                     )
                 )
@@ -127,11 +200,636 @@ def construct_select_all_query(
         if schema[column_name].get("comments", False) is True:
             values.append(sql.Identifier(f"{column_name_prefix}{column_name}_comments"))
 
-    return sql.SQL("SELECT {values} FROM {table_name} {conditions} LIMIT 500;").format(
+    return sql.SQL(
+        "SELECT {values} FROM {table_name} {conditions} {order} {limit}"
+    ).format(
         values=sql.SQL(", ").join(values),
         table_name=sql.Identifier(table_name),
         conditions=conditions,
+        order=order,
+        limit=construct_limit_clause(limit),
+    )
+
+
+def construct_limit_clause(limit: int | None) -> sql.Composable:
+    return (
+        sql.SQL("")
+        if limit is None
+        else sql.SQL("LIMIT {limit}").format(limit=sql.Literal(limit))
+    )
+
+
+# the page size is bound as the limit parameter (see PageRequest). Pages select one extra row to find out whether or not there is another page.
+PAGE_LIMIT_CLAUSE = sql.SQL("LIMIT %(limit)s + 1")
+STREAM_LIMIT_CLAUSE = sql.SQL("LIMIT %(limit)s")
+
+
+class PageRequest(TypedDict):
+    limit: int
+    # keyset cursors: only rows with IDs strictly after / before these values are selected
+    after: Any
+    before: Any
+
+
+def parse_page_request(
+    params: Mapping[str, str], integer_ids: bool = True
+) -> PageRequest:
+    """Reads the keyset pagination parameters (?limit=[page size]&after=[ID]&before=[ID]) of a SELECT request.
+
+    Args:
+        params (Mapping[str, str]): The query parameters.
+        integer_ids (bool, optional): Whether or not the cursors must be integers. Defaults to True.
+
+    Raises:
+        ValueError: When a parameter is invalid.
+
+    Returns:
+        PageRequest: The page size and cursors.
+    """
+    page: PageRequest = {"limit": SELECT_PAGE_SIZE, "after": None, "before": None}
+
+    if "limit" in params:
+        try:
+            page["limit"] = int(params["limit"])
+        except ValueError:
+            raise ValueError("limit must be an integer.")
+        if not 1 <= page["limit"] <= SELECT_MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {SELECT_MAX_PAGE_SIZE}.")
+
+    for cursor_name in ("after", "before"):
+        if cursor_name not in params:
+            continue
+        if not integer_ids:
+            page[cursor_name] = params[cursor_name]
+            continue
+        try:
+            page[cursor_name] = int(params[cursor_name])
+        except ValueError:
+            raise ValueError(f"{cursor_name} must be an integer.")
+
+    return page
+
+
+def parse_id_list(value: str, integer_ids: bool = True) -> List[Any]:
+    """Reads the IDs of a batch SELECT request (?id=[ID],[ID],...). Repeated IDs are dropped, but still count towards the limit of SELECT_MAX_PAGE_SIZE IDs.
+
+    Args:
+        value (str): The comma-separated IDs.
+        integer_ids (bool, optional): Whether or not the IDs must be integers. Defaults to True.
+
+    Raises:
+        ValueError: When there are no IDs, too many IDs or an ID is invalid.
+
+    Returns:
+        List[Any]: The IDs, in the requested order.
+    """
+    id_values = value.split(",")
+    # long lists are rejected before any of their IDs are read
+    if len(id_values) > SELECT_MAX_PAGE_SIZE:
+        raise ValueError(f"At most {SELECT_MAX_PAGE_SIZE} IDs can be selected at once.")
+
+    ids: List[Any] = []
+    for id_value in id_values:
+        id_value = id_value.strip()
+        if integer_ids:
+            try:
+                id_value = int(id_value)
+            except ValueError:
+                raise ValueError(f'id "{id_value}" must be an integer.')
+        elif id_value == "":
+            raise ValueError("id must not be empty.")
+        ids.append(id_value)
+    # dict keys keep the position of their first occurrence
+    return list(dict.fromkeys(ids))
+
+
+def construct_id_list_clauses(
+    id_column: sql.Composable, integer_ids: bool = True
+) -> Tuple[List[sql.Composable], sql.Composable]:
+    """Generates the conditions and ORDER BY clause of a batch SELECT query, which selects the rows whose IDs are bound as the ids parameter (see parse_id_list) in the same order as the IDs.
+
+    Args:
+        id_column (sql.Composable): The ID column.
+        integer_ids (bool, optional): Whether or not the IDs are integers. Defaults to True.
+
+    Returns:
+        Tuple[List[sql.Composable], sql.Composable]: The conditions and the ORDER BY clause.
+    """
+    conditions: List[sql.Composable] = [
+        sql.SQL("{id_column} = ANY(%(ids)s)").format(id_column=id_column)
+    ]
+    order = sql.SQL("ORDER BY {position}").format(
+        position=construct_id_position(id_column, integer_ids)
+    )
+    return conditions, order
+
+
+def construct_id_position(
+    id_column: sql.Composable, integer_ids: bool = True
+) -> sql.Composed:
+    # array_position needs the array and the element to be of the same type
+    return sql.SQL(
+        "array_position(%(ids)s::{datatype}[], {id_column}::{datatype})"
+    ).format(datatype=sql.SQL("bigint" if integer_ids else "text"), id_column=id_column)
+
+
+def construct_page_clauses(
+    page: PageRequest, id_column: sql.Composable
+) -> Tuple[List[sql.Composable], sql.Composable]:
+    """Generates the conditions and ORDER BY clause of a keyset-paginated SELECT query. One extra row is selected to find out whether or not there is another page.
+
+    Rows are selected in descending order when only the before cursor is given (i.e. when paging backwards). Use finish_page to put them back in ascending order.
+
+    The cursors are bound as the after and before parameters, so the query should be executed with the page as its parameters.
+
+    Args:
+        page (PageRequest): The page to select.
+        id_column (sql.Composable): The (indexed) column to paginate on.
+
+    Returns:
+        Tuple[List[sql.Composable], sql.Composable]: The conditions, which should be joined with AND, and the ORDER BY clause.
+    """
+    conditions: List[sql.Composable] = []
+    if page["after"] is not None:
+        conditions.append(
+            sql.SQL("{id_column} > %(after)s").format(id_column=id_column)
+        )
+    if page["before"] is not None:
+        conditions.append(
+            sql.SQL("{id_column} < %(before)s").format(id_column=id_column)
+        )
+
+    direction = sql.SQL("DESC" if is_backward_page(page) else "ASC")
+    return conditions, sql.SQL("ORDER BY {id_column} {direction}").format(
+        id_column=id_column, direction=direction
+    )
+
+
+# the columns (or expressions, e.g. distances) to order by, and whether or not each is in descending order
+OrderBy = List[Tuple[str | sql.Composable, bool]]
+
+
+def construct_order_column(column: str | sql.Composable) -> sql.Composable:
+    return sql.Identifier(column) if isinstance(column, str) else column
+
+
+def construct_order_clause(order_by: OrderBy) -> sql.Composed:
+    """Generates the ORDER BY clause of a SELECT query in a custom order. Rows are ordered by ID last so that the order is stable.
+
+    Args:
+        order_by (OrderBy): The columns or expressions to order by, and whether or not each is in descending order.
+
+    Returns:
+        sql.Composed: The ORDER BY clause.
+    """
+    return sql.SQL("ORDER BY {columns}, id ASC").format(
+        columns=sql.SQL(", ").join(
+            sql.SQL("{column} {direction}").format(
+                column=construct_order_column(column),
+                direction=sql.SQL("DESC" if descending else "ASC"),
+            )
+            for column, descending in order_by
+        )
+    )
+
+
+def is_backward_page(page: PageRequest) -> bool:
+    return page["before"] is not None and page["after"] is None
+
+
+class PageCursors(TypedDict):
+    # pass as ?after= to fetch the next page, if there is one
+    next: Any
+    # pass as ?before= to fetch the previous page, if there is one
+    previous: Any
+
+
+def finish_page(
+    rows: List[List[Any]], page: PageRequest, id_column_index: int
+) -> PageCursors:
+    """Trims the extra row that construct_page_clauses selects, puts the rows in ascending order and finds the cursors of the neighbouring pages. Modifies rows in place.
+
+    Args:
+        rows (List[List[Any]]): The selected rows.
+        page (PageRequest): The page that was selected.
+        id_column_index (int): The index of the ID column within each row.
+
+    Returns:
+        PageCursors: The cursors of the next and previous pages.
+    """
+    has_more = len(rows) > page["limit"]
+    del rows[page["limit"] :]
+
+    if is_backward_page(page):
+        rows.reverse()
+        return {
+            "next": rows[-1][id_column_index] if rows else None,
+            "previous": rows[0][id_column_index] if has_more else None,
+        }
+
+    return {
+        "next": rows[-1][id_column_index] if has_more else None,
+        "previous": (
+            rows[0][id_column_index] if rows and page["after"] is not None else None
+        ),
+    }
+
+
+def estimate_row_count(conn: Connection, table_name: str) -> int | None:
+    """Estimates the number of rows in a table from the planner's statistics, without scanning it.
+
+    Args:
+        conn (psycopg.Connection): Connection to the database that contains the table.
+        table_name (str): The target table name.
+
+    Returns:
+        int | None: The estimated row count, or None if the table has never been analyzed.
+    """
+    row = conn.execute(
+        "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s);",
+        (sql.Identifier(table_name).as_string(conn),),
+    ).fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def construct_stream_query(
+    query: sql.Composable, page: PageRequest, id_column_name: str
+) -> sql.Composable:
+    """Puts the rows of a paginated SELECT query back in ascending order for streaming. Only pages that are selected backwards (see construct_page_clauses) need reordering.
+
+    Args:
+        query (sql.Composable): The paginated SELECT query, without a trailing semicolon.
+        page (PageRequest): The page that the query selects.
+        id_column_name (str): The name of the column that the query paginates on.
+
+    Returns:
+        sql.Composable: The query to stream.
+    """
+    if not is_backward_page(page):
+        return query
+
+    return sql.SQL("SELECT * FROM ({query}) AS page ORDER BY {id_column} ASC").format(
+        query=query, id_column=sql.Identifier(id_column_name)
+    )
+
+
+def construct_row_array(table_alias: str, column_names: List[str]) -> sql.Composed:
+    """Generates an expression that builds a JSON array out of the columns of a row. PostgreSQL functions take at most 100 arguments, so wide rows are built from several arrays of ROW_ARRAY_CHUNK_SIZE columns.
+
+    Args:
+        table_alias (str): The table (or alias) that the columns belong to.
+        column_names (List[str]): The columns, in order.
+
+    Returns:
+        sql.Composed: The jsonb expression.
+    """
+    return sql.SQL(" || ").join(
+        sql.SQL("jsonb_build_array({columns})").format(
+            columns=sql.SQL(", ").join(
+                sql.Identifier(table_alias, column_name)
+                for column_name in column_names[i : i + ROW_ARRAY_CHUNK_SIZE]
+            )
+        )
+        for i in range(0, len(column_names), ROW_ARRAY_CHUNK_SIZE)
+    )
+
+
+def construct_select_json_query(
+    table_name: str,
+    schema: DictSchema,
+    page: PageRequest,
+    conditions: List[sql.Composable],
+    tagging: bool = False,
+    geometry_format: GeometryFormat = "wkt",
+    select_query: sql.Composable | None = None,
+    order_by: OrderBy | None = None,
+    ids: bool = False,
+    included: Mapping[str, sql.Composable] | None = None,
+    extra_columns: List[str] | None = None,
+) -> sql.Composed:
+    """Generates a keyset-paginated SELECT query that makes PostgreSQL build the whole response document, so that the rows never become Python objects.
+
+    The query returns a single text value: {"columns": [...], "data": [[...], ...], "next": ..., "previous": ..., "estimated_count": ...}, in the same format as a paginated SELECT response. Dates and times are ISO formatted by PostgreSQL. The page is bound as parameters, so the query should be executed with the page (and the parameters of the conditions) as its parameters.
+
+    Args:
+        table_name (str): The table to SELECT from.
+        schema (DictSchema): The table's schema.
+        page (PageRequest): The page to select.
+        conditions (List[sql.Composable]): The conditions that rows must meet, excluding the page's conditions. They are joined with AND.
+        tagging (bool, optional): Whether or not to SELECT a primary_tag column. Defaults to False.
+        geometry_format (GeometryFormat, optional): How to return geodetic points: as WKT text, as GeoJSON objects or as hex-encoded WKB. Defaults to "wkt".
+        select_query (sql.Composable | None, optional): The compiled SELECT of the table's ID and columns in the given geometry format, without conditions (see database.queries). It is not used when ordering by other columns. Defaults to None (i.e. compile it now).
+        order_by (OrderBy | None, optional): The columns or expressions to order by before the ID, and whether or not each is in descending order. Pages in a custom order have no cursors. Defaults to None (i.e. order by ID).
+        ids (bool, optional): Whether or not to select the rows whose IDs are bound as the ids parameter, in the same order as the IDs, instead of a page (see parse_id_list). Batches are not limited and have no cursors. Defaults to False.
+        included (Mapping[str, sql.Composable] | None, optional): Related documents to embed under "included", keyed by name (see database.includes). Each is a subquery that returns a single JSON value and may read the IDs of the page's rows from page_ids (id). Defaults to None (i.e. no "included" key).
+        extra_columns (List[str] | None, optional): The columns to select between the ID and the schema's columns (e.g. the parent column of descriptors). select_query must select them too. Defaults to None.
+
+    Returns:
+        sql.Composed: The query.
+    """
+    id_column = sql.Identifier("id")
+    extra_columns = [] if extra_columns is None else extra_columns
+    extra_values: List[sql.Composable] = [
+        sql.Identifier(column_name) for column_name in extra_columns
+    ]
+    # the order that the rows are selected in, which page_row numbers them by
+    page_order: sql.Composable
+    if ids:
+        page_conditions, order = construct_id_list_clauses(id_column)
+        page_order = construct_id_position(sql.Identifier("selected", "id"))
+    elif order_by is None:
+        page_conditions, order = construct_page_clauses(page, id_column)
+        page_order = sql.SQL("selected.id {direction}").format(
+            direction=sql.SQL("DESC" if is_backward_page(page) else "ASC")
+        )
+    else:
+        page_conditions = []
+        order = construct_order_clause(order_by)
+        # the ordered columns might not be selected (or might be selected in another format), so they are selected again under other names
+        order_names = [f"page_order_{i}" for i in range(len(order_by))]
+        select_query = construct_select_all_query(
+            table_name,
+            schema,
+            values=[
+                id_column,
+                *extra_values,
+                *(
+                    sql.SQL("{column} AS {name}").format(
+                        column=construct_order_column(column),
+                        name=sql.Identifier(order_name),
+                    )
+                    for (column, _), order_name in zip(order_by, order_names)
+                ),
+            ],
+            tagging=tagging,
+            limit=None,
+            geometry_format=geometry_format,
+        )
+        page_order = sql.SQL(", ").join(
+            [
+                *(
+                    sql.SQL("{column} {direction}").format(
+                        column=sql.Identifier("selected", order_name),
+                        direction=sql.SQL("DESC" if descending else "ASC"),
+                    )
+                    for (_, descending), order_name in zip(order_by, order_names)
+                ),
+                sql.SQL("selected.id ASC"),
+            ]
+        )
+    all_conditions = [*conditions, *page_conditions]
+
+    if select_query is None:
+        select_query = construct_select_all_query(
+            table_name,
+            schema,
+            values=[id_column, *extra_values],
+            tagging=tagging,
+            limit=None,
+            geometry_format=geometry_format,
+        )
+
+    page_query = sql.SQL("{select_query} {conditions} {order} {limit}").format(
+        select_query=select_query,
+        conditions=(
+            sql.SQL("WHERE {conditions}").format(
+                conditions=sql.SQL(" AND ").join(all_conditions)
+            )
+            if all_conditions
+            else sql.SQL("")
+        ),
+        order=order,
+        # batches are as large as the number of IDs
+        limit=sql.SQL("") if ids else PAGE_LIMIT_CLAUSE,
+    )
+
+    column_names = ["id", *extra_columns, *get_column_names(schema, tagging=tagging)]
+    row = construct_row_array("page", column_names)
+    in_page = (
+        sql.SQL("") if ids else sql.SQL("FILTER (WHERE page.page_row <= %(limit)s)")
     )
+    has_more = sql.SQL("count(*) > %(limit)s")
+    first_id = sql.SQL("min(page.id) {in_page}").format(in_page=in_page)
+    last_id = sql.SQL("max(page.id) {in_page}").format(in_page=in_page)
+    if ids or order_by is not None:
+        next_cursor = sql.SQL("NULL::bigint")
+        previous_cursor = sql.SQL("NULL::bigint")
+    elif is_backward_page(page):
+        next_cursor = last_id
+        previous_cursor = sql.SQL("CASE WHEN {has_more} THEN {first_id} END").format(
+            has_more=has_more, first_id=first_id
+        )
+    else:
+        next_cursor = sql.SQL("CASE WHEN {has_more} THEN {last_id} END").format(
+            has_more=has_more, last_id=last_id
+        )
+        previous_cursor = (
+            first_id if page["after"] is not None else sql.SQL("NULL::bigint")
+        )
+
+    # the related documents are selected by the IDs of the rows inside the page
+    page_ids = sql.SQL("")
+    included_documents = sql.SQL("")
+    if included:
+        page_ids = sql.SQL(
+            ", page_ids AS (SELECT page.id FROM page {in_page_condition})"
+        ).format(
+            in_page_condition=(
+                sql.SQL("") if ids else sql.SQL("WHERE page.page_row <= %(limit)s")
+            )
+        )
+        included_documents = sql.SQL(
+            ", 'included', json_build_object({documents})"
+        ).format(
+            documents=sql.SQL(", ").join(
+                sql.SQL("{name}, ({document})").format(
+                    name=sql.Literal(name), document=document
+                )
+                for name, document in included.items()
+            )
+        )
+
+    return sql.SQL("""
+        WITH page AS (
+            SELECT selected.*, row_number() OVER (ORDER BY {page_order}) AS page_row
+            FROM ({page_query}) AS selected
+        ){page_ids}
+        SELECT json_build_object(
+            'columns', {columns}::json,
+            'data', COALESCE(json_agg({row} ORDER BY page.page_row {data_direction}) {in_page}, '[]'::json),
+            'next', {next_cursor},
+            'previous', {previous_cursor},
+            'estimated_count', (SELECT CASE WHEN reltuples < 0 THEN NULL ELSE reltuples::bigint END FROM pg_class WHERE oid = to_regclass({regclass})){included_documents}
+        )::text
+        FROM page
+        """).format(
+        page_ids=page_ids,
+        included_documents=included_documents,
+        page_order=page_order,
+        # pages that are selected backwards are returned in ascending order
+        data_direction=sql.SQL(
+            "DESC" if not ids and order_by is None and is_backward_page(page) else "ASC"
+        ),
+        columns=sql.Literal(json.dumps(column_names)),
+        row=row,
+        in_page=in_page,
+        next_cursor=next_cursor,
+        previous_cursor=previous_cursor,
+        regclass=sql.Literal(f'"{table_name.replace('"', '""')}"'),
+        page_query=page_query,
+    )
+
+
+def encode_json_value(value: Any) -> Any:
+    """Converts the values that json cannot encode (dates, times, decimals) in the same way as JsonResponse."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def stream_select(
+    database_name: str,
+    query: sql.Composable,
+    params: Mapping[str, Any] | None = None,
+    itersize: int = STREAM_ITERSIZE,
+) -> Iterator[bytes]:
+    """Runs a SELECT query through a server-side cursor and encodes the result as {"columns": [...], "data": [...]} JSON, one batch of rows at a time. Only one batch is held in memory at once.
+
+    Args:
+        database_name (str): The database to SELECT from.
+        query (sql.Composable): The SELECT query, without a trailing semicolon.
+        params (Mapping[str, Any] | None, optional): The query's parameters. Defaults to None.
+        itersize (int, optional): The number of rows to read from the database at once. Defaults to the STREAM_ITERSIZE environment variable or 2000.
+
+    Raises:
+        Psycopg.Error: When the query fails.
+
+    Yields:
+        Iterator[bytes]: The encoded JSON document, in pieces.
+    """
+    with psycopg.connect(**CONN_CONFIG, dbname=database_name) as conn:
+        with conn.cursor(name="stream_select") as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+
+            columns = (
+                []
+                if cur.description is None
+                else [column.name for column in cur.description]
+            )
+            # the first batch is read before anything is yielded, so that errors raised while reading rows (rather than while declaring the cursor) surface before the response starts (see open_stream_select)
+            rows = cur.fetchmany(itersize)
+            yield f'{{"columns": {json.dumps(columns)}, "data": ['.encode()
+
+            separator = ""
+            while rows:
+                yield (
+                    separator
+                    + ", ".join(
+                        json.dumps(row, default=encode_json_value) for row in rows
+                    )
+                ).encode()
+                separator = ", "
+                rows = cur.fetchmany(itersize)
+
+            yield b"]}"
+
+
+def open_stream_select(
+    database_name: str,
+    query: sql.Composable,
+    params: Mapping[str, Any] | None = None,
+    itersize: int = STREAM_ITERSIZE,
+) -> Iterator[bytes]:
+    """Starts stream_select right away: the query is run and its first batch is read before returning, so that a failing query raises here, while an error response can still be sent, rather than truncating a response that has already started.
+
+    Args:
+        database_name (str): The database to SELECT from.
+        query (sql.Composable): The SELECT query, without a trailing semicolon.
+        params (Mapping[str, Any] | None, optional): The query's parameters. Defaults to None.
+        itersize (int, optional): See stream_select. Defaults to the STREAM_ITERSIZE environment variable or 2000.
+
+    Raises:
+        Psycopg.Error: When the query fails.
+
+    Returns:
+        Iterator[bytes]: The encoded JSON document, in pieces (see stream_select).
+    """
+    chunks = stream_select(database_name, query, params, itersize)
+    first_chunk = next(chunks)
+
+    # a generator (rather than itertools.chain) so that closing the response closes the cursor
+    def resume() -> Iterator[bytes]:
+        yield first_chunk
+        yield from chunks
+
+    return resume()
+
+
+def get_column_names(schema: DictSchema, tagging: bool = False) -> List[str]:
+    """Lists the names of the columns that store a schema, in the same order as construct_select_all_query.
+
+    Args:
+        schema (DictSchema): The schema to list the columns of.
+        tagging (bool, optional): Whether or not to include the primary_tag column. Defaults to False.
+
+    Returns:
+        List[str]: The column names, excluding the ID column.
+    """
+    column_names: List[str] = []
+    if tagging:
+        column_names.append("primary_tag")
+
+    for column_name in schema:
+        column_names.append(column_name)
+        match (schema[column_name]["datatype"]):
+            case "geodetic point":
+                column_names.append(f"{column_name}_latlong_accuracy")
+                column_names.append(f"{column_name}_altitude")
+                column_names.append(f"{column_name}_altitude_accuracy")
+            case "polymorphic pointer" | "polypointer":
+                column_names.append(f"{column_name}_type")
+            case _:
+                pass
+
+        if schema[column_name].get("comments", False) is True:
+            column_names.append(f"{column_name}_comments")
+
+    return column_names
+
+
+# Records entries in sync_status. Local entries still need syncing (or need re-syncing if they were modified), while entries that came from the master database are already up to date.
+RECORD_SYNC_STATUS_QUERY = """
+    INSERT INTO sync_status (
+        table_name,
+        parent_table_name,
+        table_type,
+        database_name,
+        entry_id,
+        remote_id,
+        sync_timestamp,
+        status
+    )
+    SELECT
+        %s,
+        %s,
+        %s,
+        %s,
+        stored.entry_id,
+        stored.remote_id,
+        CASE WHEN stored.remote_id IS NULL THEN NULL ELSE NOW() END,
+        CASE WHEN stored.remote_id IS NULL THEN NULL ELSE 'updated' END
+    FROM unnest(%s::text[], %s::text[]) AS stored (entry_id, remote_id)
+    ON CONFLICT (table_name, database_name, entry_id)
+    DO UPDATE SET
+        remote_id = COALESCE(EXCLUDED.remote_id, sync_status.remote_id),
+        sync_timestamp = EXCLUDED.sync_timestamp,
+        status = COALESCE(EXCLUDED.status, 'modified')
+"""
 
 
 class DecomposedEntry(TypedDict):
@@ -192,7 +890,13 @@ def decompose_entry(
                     values.append(item[column_name])
                     values_shapes.append(sql.Placeholder())
         elif schema[column_name].get("optional", False) is True:
-            values_shapes.append(sql.SQL("NULL"))
+            # bound as NULL so that every entry of a schema has the same statement shape
+            values.append(None)
+            values_shapes.append(
+                sql.SQL("ST_GeographyFromText(%s)")
+                if schema[column_name]["datatype"] == "geodetic point"
+                else sql.Placeholder()
+            )
         else:
             raise ValueError(f"Column name {column_name} is not within the schema.")
 
@@ -210,6 +914,47 @@ def decompose_entry(
     return {"columns": columns, "values_shapes": values_shapes, "values": values}
 
 
+def construct_upsert_query(
+    table_name: str,
+    columns: List[str],
+    id_column_name: str = "id",
+    values_shapes: List[sql.Composable] | None = None,
+) -> sql.Composed:
+    """Generates the INSERT ... ON CONFLICT statement that store_entry uses. The values are bound positionally, in the same order as the columns.
+
+    Args:
+        table_name (str): The target table name.
+        columns (List[str]): The column names to enter.
+        id_column_name (str, optional): The name of the ID column (PRIMARY KEY). Defaults to "id".
+        values_shapes (List[sql.Composable] | None, optional): The structure of the VALUES part of the query. Defaults to None (i.e. one placeholder per column).
+
+    Returns:
+        sql.Composed: The statement, which returns the stored entry's ID.
+    """
+    values_shape: sql.Composable
+    if values_shapes is None:
+        values_shape = sql.SQL(", ").join(sql.Placeholder() * len(columns))
+    else:
+        values_shape = sql.SQL(", ").join(values_shapes)
+
+    return sql.SQL(
+        "INSERT INTO {table} ({fields}) VALUES({values}) ON CONFLICT ({id_column}) DO UPDATE SET {update_shape} RETURNING {id_column};"
+    ).format(
+        table=sql.Identifier(table_name),
+        fields=sql.SQL(", ").join(map(sql.Identifier, columns)),
+        values=values_shape,
+        update_shape=sql.SQL(", ").join(
+            map(
+                lambda column_name: sql.SQL(
+                    "{column_name} = EXCLUDED.{column_name}"
+                ).format(column_name=sql.Identifier(column_name)),
+                columns,
+            )
+        ),
+        id_column=sql.Identifier(id_column_name),
+    )
+
+
 def store_entry(
     data_conn: Connection,
     info_conn: Connection,
@@ -221,6 +966,8 @@ def store_entry(
     values: List[Any],
     id_column_name: str = "id",
     values_shapes: List[sql.Composable] | None = None,
+    remote_id: int | str | None = None,
+    query: sql.Composable | None = None,
 ) -> int | str | None:
     """Stores an entry, assuming that item is valid, does not contain extra columns, and is not missing any columns.
 
@@ -235,6 +982,8 @@ def store_entry(
         target_table_type (str): The target table's type.
         id_column_name (str, optional): The name of the ID column (PRIMARY KEY). Defaults to "id".
         values_shapes (List[sql.Composable] | None, optional): The structure of the VALUES part of the INSERT INTO query. Defaults to None.
+        remote_id (int | str | None, optional): The entry's ID inside the master database if the entry came from the master database, in which case it is recorded as already synced. Defaults to None (i.e. a local entry that needs syncing).
+        query (sql.Composable | None, optional): The compiled upsert statement for these columns (see database.queries). Defaults to None (i.e. compile it now).
     Raises:
         Psycopg.Error: When storing the entry fails. store_entry should be encapsulated in a try-catch to rollback when necessary.
 
@@ -244,64 +993,201 @@ def store_entry(
 
     id: int | str | None = None
 
-    values_shape: sql.Composable
-
-    if values_shapes is None:
-        values_shape = sql.SQL(", ").join(sql.Placeholder() * len(values))
-    else:
-        values_shape = sql.SQL(", ").join(values_shapes)
+    if query is None:
+        query = construct_upsert_query(
+            target_table_name, columns, id_column_name, values_shapes
+        )
 
-    data_cur = data_conn.execute(
-        sql.SQL(
-            "INSERT INTO {table} ({fields}) VALUES({values}) ON CONFLICT ({id_column}) DO UPDATE SET {update_shape} RETURNING {id_column};"
-        ).format(
-            table=sql.Identifier(target_table_name),
-            fields=sql.SQL(", ").join(map(sql.Identifier, columns)),
-            values=values_shape,
-            update_shape=sql.SQL(", ").join(
-                map(
-                    lambda column_name: sql.SQL(
-                        "{column_name} = EXCLUDED.{column_name}"
-                    ).format(column_name=sql.Identifier(column_name)),
-                    columns,
-                )
-            ),
-            id_column=sql.Identifier(id_column_name),
-        ),
-        (*values,),
-    )
+    data_cur = data_conn.execute(query, (*values,))
     id = next(data_cur)[0]
     info_conn.execute(
-        """
-        INSERT INTO sync_status (
-            table_name,
-            parent_table_name,
-            table_type,
-            database_name,
-            entry_id,
-            sync_timestamp,
-            status
-        ) VALUES (
-            %s,
-            %s,
-            %s,
-            %s,
-            %s,
-            NULL,
-            NULL
-        )
-        ON CONFLICT (table_name, database_name, entry_id)
-        DO UPDATE SET
-            sync_timestamp = NULL,
-            status = 'modified'
-        """,
+        RECORD_SYNC_STATUS_QUERY,
         (
             target_table_name,
             target_parent_table_name,
             target_table_type,
             target_database_name,
-            id,
+            [str(id)],
+            [None if remote_id is None else str(remote_id)],
         ),
     ).close()
+    bump_table_version(info_conn, target_database_name, target_table_name)
     data_cur.close()
     return id
+
+
+def store_entries(
+    data_conn: Connection,
+    info_conn: Connection,
+    target_database_name: str,
+    target_table_name: str,
+    target_parent_table_name: str,
+    target_table_type: str,
+    columns: List[str],
+    rows: Iterable[Sequence[Any]],
+    id_column_name: str = "id",
+    remote_ids: Sequence[int | str | None] | None = None,
+) -> List[int | str]:
+    """Stores many entries at once, assuming that every row is valid, does not contain extra columns, and is not missing any columns.
+
+    The rows are COPYed into a temporary staging table and merged into the target table with a single MERGE. The related sync_status rows are recorded with a single statement as well.
+
+    Args:
+        data_conn (psycopg.Connection): Connection to the target database.
+        info_conn (psycopg.Connection): Connection to the info database.
+        target_database_name (str): The name of the target database.
+        target_table_name (str): The name of the target table.
+        target_parent_table_name (str): The name of the target table's parent.
+        target_table_type (str): The target table's type.
+        columns (List[str]): The column names to enter.
+        rows (Iterable[Sequence[Any]]): The rows to insert. Each row is an ordered list of values. Rows whose ID is None are given a new ID.
+        id_column_name (str, optional): The name of the ID column (PRIMARY KEY). Defaults to "id".
+        remote_ids (Sequence[int | str | None] | None, optional): The IDs of the rows inside the master database, in the same order as the rows. Rows with a remote ID came from the master database and are recorded as already synced. Rows that would overwrite local changes waiting to be synced are skipped. Defaults to None (i.e. local rows that need syncing).
+    Raises:
+        Psycopg.Error: When storing the entries fails. store_entries should be encapsulated in a try-catch to rollback when necessary.
+
+    Returns:
+        List[int | str]: The IDs (PRIMARY KEYs) that were pushed to the data table.
+    """
+    staging_table = sql.Identifier(f"{target_table_name}_staging")
+    fields = sql.SQL(", ").join(map(sql.Identifier, columns))
+    non_id_columns = [
+        column_name for column_name in columns if column_name != id_column_name
+    ]
+
+    def source_fields(column_names: List[str]) -> sql.Composable:
+        return sql.SQL(", ").join(
+            map(
+                lambda column_name: sql.SQL("source.{column_name}").format(
+                    column_name=sql.Identifier(column_name)
+                ),
+                column_names,
+            )
+        )
+
+    with data_conn.cursor() as data_cur:
+        data_cur.execute(
+            sql.SQL("DROP TABLE IF EXISTS pg_temp.{staging_table};").format(
+                staging_table=staging_table
+            )
+        )
+        data_cur.execute(
+            sql.SQL(
+                "CREATE TEMPORARY TABLE {staging_table} ON COMMIT DROP AS SELECT {fields}, NULL::text AS remote_id FROM {table} WITH NO DATA;"
+            ).format(
+                staging_table=staging_table,
+                fields=fields,
+                table=sql.Identifier(target_table_name),
+            )
+        )
+
+        with data_cur.copy(
+            sql.SQL("COPY {staging_table} ({fields}, remote_id) FROM STDIN").format(
+                staging_table=staging_table, fields=fields
+            )
+        ) as copy:
+            for i, row in enumerate(rows):
+                remote_id = None if remote_ids is None else remote_ids[i]
+                copy.write_row(
+                    (*row, None if remote_id is None else str(remote_id))
+                )
+
+        # pulled rows leave local changes that are waiting to be synced alone. Otherwise, the changes would be overwritten and marked as synced, and never reach the master database.
+        if remote_ids is not None and id_column_name in columns:
+            staged_ids = [
+                row[0]
+                for row in data_cur.execute(
+                    sql.SQL(
+                        "SELECT {id_column}::text FROM {staging_table} WHERE {id_column} IS NOT NULL;"
+                    ).format(
+                        id_column=sql.Identifier(id_column_name),
+                        staging_table=staging_table,
+                    )
+                )
+            ]
+            pending_ids = [
+                row[0]
+                for row in info_conn.execute(
+                    "SELECT entry_id FROM sync_status WHERE database_name = %s AND table_name = %s AND entry_id = ANY(%s) AND (status IS NULL OR status IN ('modified', 'failed'));",
+                    (target_database_name, target_table_name, staged_ids),
+                )
+            ]
+            if pending_ids:
+                logger.info(
+                    f"Kept {len(pending_ids)} entries of {target_database_name}/{target_table_name} that have local changes waiting to be synced."
+                )
+                data_cur.execute(
+                    sql.SQL(
+                        "DELETE FROM {staging_table} WHERE {id_column}::text = ANY(%s);"
+                    ).format(
+                        id_column=sql.Identifier(id_column_name),
+                        staging_table=staging_table,
+                    ),
+                    (pending_ids,),
+                )
+
+        # MERGE (rather than INSERT ... ON CONFLICT) can return the remote ID of each row alongside its new ID.
+        data_cur.execute(
+            sql.SQL(
+                """
+                MERGE INTO {table} AS target
+                USING {staging_table} AS source
+                ON {match}
+                WHEN MATCHED THEN UPDATE SET {update_shape}
+                {insert_without_id}
+                WHEN NOT MATCHED THEN INSERT ({fields}) VALUES ({source_fields})
+                RETURNING target.{id_column}, source.remote_id;
+                """
+            ).format(
+                table=sql.Identifier(target_table_name),
+                staging_table=staging_table,
+                match=(
+                    sql.SQL("target.{id_column} = source.{id_column}").format(
+                        id_column=sql.Identifier(id_column_name)
+                    )
+                    if id_column_name in columns
+                    else sql.SQL("FALSE")
+                ),
+                update_shape=sql.SQL(", ").join(
+                    map(
+                        lambda column_name: sql.SQL(
+                            "{column_name} = source.{column_name}"
+                        ).format(column_name=sql.Identifier(column_name)),
+                        columns,
+                    )
+                ),
+                # rows without an ID are new and take the ID column's default
+                insert_without_id=(
+                    sql.SQL(
+                        "WHEN NOT MATCHED AND source.{id_column} IS NULL THEN INSERT ({fields}) VALUES ({source_fields})"
+                    ).format(
+                        id_column=sql.Identifier(id_column_name),
+                        fields=sql.SQL(", ").join(
+                            map(sql.Identifier, non_id_columns),
+                        ),
+                        source_fields=source_fields(non_id_columns),
+                    )
+                    if id_column_name in columns
+                    else sql.SQL("")
+                ),
+                fields=fields,
+                source_fields=source_fields(columns),
+                id_column=sql.Identifier(id_column_name),
+            )
+        )
+        stored: List[Tuple[int | str, str | None]] = data_cur.fetchall()
+
+    info_conn.execute(
+        RECORD_SYNC_STATUS_QUERY,
+        (
+            target_table_name,
+            target_parent_table_name,
+            target_table_type,
+            target_database_name,
+            [str(id) for id, _ in stored],
+            [remote_id for _, remote_id in stored],
+        ),
+    ).close()
+    # one bump for the whole batch
+    bump_table_version(info_conn, target_database_name, target_table_name)
+    return [id for id, _ in stored]
@@ -0,0 +1,107 @@
+import logging
+from typing import Any, List
+import psycopg
+from psycopg import sql
+
+from constants import CONN_CONFIG
+from database.schema import DESCRIPTOR_PARENT_COLUMN_NAME, get_tables
+from database.indexes import get_index_name
+from database.db import DecomposedEntry
+
+logger = logging.getLogger("database")
+
+
+def construct_parent_column_statements(
+    table_name: str, parent_table_name: str
+) -> List[sql.Composed]:
+    """Generates the statements that add the parent column (and its index) to a descriptor table. They do nothing when the column already exists.
+
+    Descriptors are not deleted with their entries. Their parent column is cleared instead.
+
+    Args:
+        table_name (str): The descriptor table.
+        parent_table_name (str): The data table that the descriptors describe.
+
+    Returns:
+        List[sql.Composed]: The statements.
+    """
+    column_name = sql.Identifier(DESCRIPTOR_PARENT_COLUMN_NAME)
+    return [
+        sql.SQL(
+            "ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {column_name} INTEGER REFERENCES {parent_table_name} (id) ON DELETE SET NULL;"
+        ).format(
+            table_name=sql.Identifier(table_name),
+            column_name=column_name,
+            parent_table_name=sql.Identifier(parent_table_name),
+        ),
+        sql.SQL(
+            "CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({column_name});"
+        ).format(
+            index_name=sql.Identifier(
+                get_index_name(table_name, DESCRIPTOR_PARENT_COLUMN_NAME, "btree")
+            ),
+            table_name=sql.Identifier(table_name),
+            column_name=column_name,
+        ),
+    ]
+
+
+def link_descriptor_tables(database_name: str, dry_run: bool = False) -> List[str]:
+    """Adds the parent column to the descriptor tables of a database that do not have it yet (see the link_descriptors command).
+
+    Altering a descriptor table locks it and its parent table, so this runs before the server starts rather than while requests are handled.
+
+    Args:
+        database_name (str): The target database.
+        dry_run (bool, optional): Only find the tables without the column. Defaults to False.
+
+    Raises:
+        psycopg.Error: When a descriptor table cannot be altered (e.g. it does not exist yet).
+
+    Returns:
+        List[str]: The descriptor tables that did not have the column.
+    """
+    descriptor_tables = [
+        table
+        for table in get_tables(database_name)
+        if table["table_type"] == "descriptors"
+    ]
+    if not descriptor_tables:
+        return []
+
+    with psycopg.connect(**CONN_CONFIG, dbname=database_name) as conn:
+        linked_table_names = {
+            row[0]
+            for row in conn.execute(
+                "SELECT table_name FROM information_schema.columns WHERE table_schema = current_schema() AND column_name = %s;",
+                (DESCRIPTOR_PARENT_COLUMN_NAME,),
+            ).fetchall()
+        }
+        unlinked_tables = [
+            table
+            for table in descriptor_tables
+            if table["table_name"] not in linked_table_names
+        ]
+        if dry_run:
+            return [table["table_name"] for table in unlinked_tables]
+
+        for table in unlinked_tables:
+            for statement in construct_parent_column_statements(
+                table["table_name"], table["parent_table_name"]
+            ):
+                conn.execute(statement).close()
+            logger.info(f"Linked descriptors of {database_name}/{table["table_name"]}.")
+
+    return [table["table_name"] for table in unlinked_tables]
+
+
+def link_descriptor(decomposed_descriptor: DecomposedEntry, parent_id: Any) -> None:
+    """Stores the entry that a descriptor describes along with it. Modifies the decomposed descriptor (see decompose_entry) in place.
+
+    Args:
+        decomposed_descriptor (DecomposedEntry): The decomposed descriptor.
+        parent_id (Any): The local ID of the entry.
+    """
+    decomposed_descriptor["columns"].append(DESCRIPTOR_PARENT_COLUMN_NAME)
+    decomposed_descriptor["values_shapes"].append(sql.Placeholder())
+    decomposed_descriptor["values"].append(parent_id)
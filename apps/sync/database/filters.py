@@ -0,0 +1,375 @@
+import datetime
+import math
+from typing import Any, Callable, Collection, List, Mapping, Tuple, TypedDict
+from psycopg import sql
+from wywy_website_types import DictSchema
+
+# the query parameters of a SELECT request that are not filters. Other endpoints reserve their own parameters (see parse_select_filters).
+RESERVED_PARAMETERS: set[str] = {
+    "limit",
+    "after",
+    "before",
+    "stream",
+    "geometry",
+    "fields",
+    "order",
+    "parent_id",
+    "include",
+}
+
+# ?[column name]__[operator]=[value]. Equality has no suffix.
+COMPARISON_OPERATORS: dict[str, str] = {
+    "": "=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+
+
+def parse_bool(value: str) -> bool:
+    match (value.lower()):
+        case "true":
+            return True
+        case "false":
+            return False
+        case _:
+            raise ValueError(f'"{value}" is not a boolean.')
+
+
+# converts query parameter values into the Python type of each datatype, so that they are bound with the right type
+FILTER_PARSERS: dict[str, Callable[[str], Any]] = {
+    "int": int,
+    "integer": int,
+    "pointer": int,
+    "polymorphic pointer": int,
+    "polypointer": int,
+    "float": float,
+    "number": float,
+    "string": str,
+    "str": str,
+    "text": str,
+    "enum": str,
+    "bool": parse_bool,
+    "boolean": parse_bool,
+    "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+    "timestamp": datetime.datetime.fromisoformat,
+}
+
+# datatypes that can be filtered by range (e.g. ?date__gte=2024-01-01)
+RANGE_DATATYPES: set[str] = {
+    "int",
+    "integer",
+    "float",
+    "number",
+    "date",
+    "time",
+    "timestamp",
+}
+
+
+# ?[column]__bbox|within|nearest=... filters and orders geodetic point columns (see parse_spatial_filter). Each can use a GiST index on the column.
+SPATIAL_OPERATORS: set[str] = {"bbox", "within", "nearest"}
+
+
+def parse_coordinates(value: str, count: int) -> List[float]:
+    """Reads comma-separated numbers (e.g. longitude,latitude) of a spatial filter.
+
+    Args:
+        value (str): The comma-separated numbers.
+        count (int): The number of numbers to expect.
+
+    Raises:
+        ValueError: When there are not exactly count numbers.
+
+    Returns:
+        List[float]: The numbers.
+    """
+    try:
+        numbers = [float(number) for number in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count:
+        raise ValueError(f'"{value}" is not a list of {count} numbers.')
+    return numbers
+
+
+def check_point(longitude: float, latitude: float) -> None:
+    if not (-180 <= longitude <= 180 and -90 <= latitude <= 90):
+        raise ValueError(f"({longitude}, {latitude}) is not a longitude and latitude.")
+
+
+def construct_envelope(
+    west: sql.Composable,
+    south: sql.Composable,
+    east: sql.Composable,
+    north: sql.Composable,
+) -> sql.Composable:
+    """Generates a geography box between two longitudes and two latitudes. The edges of a geography follow great circles, so they are split up every degree to follow their latitude instead.
+
+    Args:
+        west (sql.Composable): The western longitude.
+        south (sql.Composable): The southern latitude.
+        east (sql.Composable): The eastern longitude.
+        north (sql.Composable): The northern latitude.
+
+    Returns:
+        sql.Composable: The box.
+    """
+    return sql.SQL(
+        "ST_Segmentize(ST_MakeEnvelope({west}, {south}, {east}, {north}, 4326), 1)::geography"
+    ).format(west=west, south=south, east=east, north=north)
+
+
+def parse_spatial_filter(
+    column: sql.Composable, operator: str, value: str, placeholder_name: str
+) -> Tuple[sql.Composable, dict[str, Any]]:
+    """Reads a spatial filter on a geodetic point column. Points are bound as EWKT.
+
+    ?[column]__bbox=[min longitude],[min latitude],[max longitude],[max latitude] matches the points inside a box, whose edges follow their longitude and latitude (as with tiles).
+    ?[column]__within=[longitude],[latitude],[metres] matches the points within a distance of a point.
+    ?[column]__nearest=[longitude],[latitude] orders the rows by their distance from a point.
+
+    Args:
+        column (sql.Composable): The column.
+        operator (str): bbox, within or nearest.
+        value (str): The query parameter.
+        placeholder_name (str): The name of the bound shape. Other values are bound under names that start with it.
+
+    Raises:
+        ValueError: When the value is invalid.
+
+    Returns:
+        Tuple[sql.Composable, dict[str, Any]]: The condition (or, for nearest, the expression to order by) and the values to bind.
+    """
+    shape = sql.SQL("ST_GeographyFromText({placeholder})").format(
+        placeholder=sql.Placeholder(placeholder_name)
+    )
+    match (operator):
+        case "bbox":
+            min_x, min_y, max_x, max_y = parse_coordinates(value, 4)
+            check_point(min_x, min_y)
+            check_point(max_x, max_y)
+            if min_x >= max_x or min_y >= max_y:
+                raise ValueError(f'"{value}" is not a bounding box.')
+            bound_names = [
+                f"{placeholder_name}_{bound}"
+                for bound in ("west", "south", "east", "north")
+            ]
+            condition = sql.SQL("ST_Intersects({column}, {envelope})").format(
+                column=column,
+                envelope=construct_envelope(*map(sql.Placeholder, bound_names)),
+            )
+            return condition, dict(zip(bound_names, (min_x, min_y, max_x, max_y)))
+        case "within":
+            x, y, distance = parse_coordinates(value, 3)
+            check_point(x, y)
+            if not 0 < distance < math.inf:
+                raise ValueError("The distance must be a positive number of metres.")
+            distance_name = f"{placeholder_name}_distance"
+            condition = sql.SQL("ST_DWithin({column}, {shape}, {distance})").format(
+                column=column,
+                shape=shape,
+                distance=sql.Placeholder(distance_name),
+            )
+            return condition, {
+                placeholder_name: f"SRID=4326;POINT({x} {y})",
+                distance_name: distance,
+            }
+        case _:
+            x, y = parse_coordinates(value, 2)
+            check_point(x, y)
+            # the <-> operator lets a GiST index return the nearest points first
+            order_expression = sql.SQL("{column} <-> {shape}").format(
+                column=column, shape=shape
+            )
+            return order_expression, {placeholder_name: f"SRID=4326;POINT({x} {y})"}
+
+
+class SelectFilters(TypedDict):
+    # joined with AND
+    conditions: List[sql.Composable]
+    # the values of the conditions, bound by name
+    params: dict[str, Any]
+    # the columns to SELECT (a subset of the schema when the request asks for specific fields)
+    schema: DictSchema
+    tagging: bool
+    # whether or not the request asked for specific fields
+    projected: bool
+    # the columns to order by before the ID, and whether or not each is in descending order. None orders by ID.
+    order_by: List[Tuple[str | sql.Composable, bool]] | None
+
+
+def get_filter_datatypes(schema: DictSchema, tagging: bool = False) -> dict[str, str]:
+    """Lists the columns that SELECT requests may filter and order by, and their datatypes.
+
+    Args:
+        schema (DictSchema): The table's schema.
+        tagging (bool, optional): Whether or not the table has a primary_tag column. Defaults to False.
+
+    Returns:
+        dict[str, str]: The datatype of each filterable column.
+    """
+    datatypes: dict[str, str] = {"id": "int"}
+    if tagging:
+        datatypes["primary_tag"] = "int"
+    for column_name in schema:
+        datatype = schema[column_name]["datatype"]
+        if datatype in FILTER_PARSERS or datatype == "geodetic point":
+            datatypes[column_name] = datatype
+    return datatypes
+
+
+def parse_filter_value(value: str, datatype: str) -> Any:
+    """Converts a query parameter into a value of a column's datatype.
+
+    Args:
+        value (str): The query parameter.
+        datatype (str): The column's datatype.
+
+    Raises:
+        ValueError: When the value does not fit the datatype.
+
+    Returns:
+        Any: The converted value.
+    """
+    try:
+        return FILTER_PARSERS[datatype](value)
+    except ValueError:
+        raise ValueError(f'"{value}" is not a valid {datatype}.')
+
+
+def construct_filter_column(column_name: str, datatype: str) -> sql.Composable:
+    # enums are compared as text because their values are bound as text
+    if datatype == "enum":
+        return sql.SQL("{column}::text").format(column=sql.Identifier(column_name))
+    return sql.Identifier(column_name)
+
+
+def parse_select_filters(
+    params: Mapping[str, str],
+    schema: DictSchema,
+    tagging: bool = False,
+    reserved_parameters: Collection[str] = (),
+) -> SelectFilters:
+    """Reads the filtering, projection and ordering parameters of a SELECT request.
+
+    ?[column]=[value] and ?[column]__gt|gte|lt|lte=[value] compare a column with a value. Ranges are only supported on numeric, date, time and timestamp columns.
+    ?[column]__in=[value],[value],... matches any of the values.
+    ?[column]__bbox|within|nearest=... filters geodetic point columns by area, or orders rows by their distance from a point (see parse_spatial_filter).
+    ?fields=[column],[column],... only SELECTs the given columns (and the ID).
+    ?order=[column],-[column],... orders by the given columns (descending when prefixed with -), then by ID.
+
+    Args:
+        params (Mapping[str, str]): The query parameters.
+        schema (DictSchema): The table's schema.
+        tagging (bool, optional): Whether or not the table has a primary_tag column. Defaults to False.
+        reserved_parameters (Collection[str], optional): The parameters of the calling endpoint that are not filters either, on top of RESERVED_PARAMETERS. Defaults to none.
+
+    Raises:
+        ValueError: When a parameter is unknown or invalid.
+
+    Returns:
+        SelectFilters: The conditions, their parameters, the columns to SELECT and the order.
+    """
+    datatypes = get_filter_datatypes(schema, tagging)
+    filters: SelectFilters = {
+        "conditions": [],
+        "params": {},
+        "schema": schema,
+        "tagging": tagging,
+        "projected": False,
+        "order_by": None,
+    }
+    # ?[column]__nearest= orders rows before ?order= does
+    nearest: List[Tuple[str | sql.Composable, bool]] = []
+
+    for parameter in params:
+        if parameter in RESERVED_PARAMETERS or parameter in reserved_parameters:
+            continue
+
+        column_name, _, operator = parameter.partition("__")
+        if column_name not in datatypes:
+            raise ValueError(f'Unknown query parameter "{parameter}".')
+        datatype = datatypes[column_name]
+        column = construct_filter_column(column_name, datatype)
+        placeholder_name = f"filter_{len(filters['params'])}"
+
+        if datatype == "geodetic point":
+            if operator not in SPATIAL_OPERATORS:
+                raise ValueError(
+                    f'Column "{column_name}" can only be filtered by {", ".join(sorted(SPATIAL_OPERATORS))}.'
+                )
+            expression, values = parse_spatial_filter(
+                column, operator, params[parameter], placeholder_name
+            )
+            if operator == "nearest":
+                if nearest:
+                    raise ValueError("Rows can only be ordered by one nearest point.")
+                nearest.append((expression, False))
+            else:
+                filters["conditions"].append(expression)
+            filters["params"].update(values)
+        elif operator == "in":
+            filters["conditions"].append(
+                sql.SQL("{column} = ANY({values})").format(
+                    column=column, values=sql.Placeholder(placeholder_name)
+                )
+            )
+            filters["params"][placeholder_name] = [
+                parse_filter_value(value, datatype)
+                for value in params[parameter].split(",")
+            ]
+        elif operator in COMPARISON_OPERATORS:
+            if operator != "" and datatype not in RANGE_DATATYPES:
+                raise ValueError(f'Column "{column_name}" cannot be filtered by range.')
+            filters["conditions"].append(
+                sql.SQL("{column} {operator} {value}").format(
+                    column=column,
+                    operator=sql.SQL(COMPARISON_OPERATORS[operator]),
+                    value=sql.Placeholder(placeholder_name),
+                )
+            )
+            filters["params"][placeholder_name] = parse_filter_value(
+                params[parameter], datatype
+            )
+        else:
+            raise ValueError(f'Unknown filter "{operator}" on column "{column_name}".')
+
+    if "fields" in params:
+        field_names = [field for field in params["fields"].split(",") if field]
+        for field_name in field_names:
+            if (
+                field_name not in schema
+                and not (tagging and field_name == "primary_tag")
+                and field_name != "id"
+            ):
+                raise ValueError(f'Unknown field "{field_name}".')
+        filters["schema"] = {
+            column_name: schema[column_name]
+            for column_name in schema
+            if column_name in field_names
+        }
+        filters["tagging"] = tagging and "primary_tag" in field_names
+        filters["projected"] = True
+
+    if "order" in params:
+        order_by: List[Tuple[str | sql.Composable, bool]] = []
+        for field_name in params["order"].split(","):
+            descending = field_name.startswith("-")
+            column_name = field_name.removeprefix("-")
+            if (
+                column_name not in datatypes
+                or datatypes[column_name] == "geodetic point"
+            ):
+                raise ValueError(f'Cannot order by "{column_name}".')
+            order_by.append((column_name, descending))
+        # ordering by ID alone is the default
+        if order_by and order_by != [("id", False)]:
+            filters["order_by"] = order_by
+
+    if nearest:
+        filters["order_by"] = [*nearest, *(filters["order_by"] or [])]
+
+    return filters
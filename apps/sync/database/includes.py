@@ -0,0 +1,174 @@
+import json
+from typing import List
+from psycopg import sql
+from wywy_website_types import DictSchema
+
+from database.schema import DESCRIPTOR_PARENT_COLUMN_NAME, databases
+from database.db import (
+    GeometryFormat,
+    construct_row_array,
+    construct_select_all_query,
+    get_column_names,
+)
+from database.queries import TAG_COLUMNS
+
+# the related documents that data SELECT requests can embed (?include=...)
+INCLUDE_OPTIONS: List[str] = ["tags", "tag_names", "descriptors"]
+
+
+def parse_includes(value: str, tagging: bool, has_descriptors: bool) -> List[str]:
+    """Reads the related documents that a data SELECT request asks for (?include=[document],...).
+
+    Args:
+        value (str): The comma-separated documents.
+        tagging (bool): Whether or not the table has tags.
+        has_descriptors (bool): Whether or not the table has descriptors.
+
+    Raises:
+        ValueError: When a document is unknown or the table does not have it.
+
+    Returns:
+        List[str]: The documents, without repeats.
+    """
+    includes: List[str] = []
+    for include in value.split(","):
+        include = include.strip()
+        if include not in INCLUDE_OPTIONS:
+            raise ValueError(
+                f'Cannot include "{include}". Expected one of {", ".join(INCLUDE_OPTIONS)}.'
+            )
+        if include == "descriptors":
+            if not has_descriptors:
+                raise ValueError("This table has no descriptors to include.")
+        elif not tagging:
+            raise ValueError("This table has no tags to include.")
+        if include not in includes:
+            includes.append(include)
+    return includes
+
+
+def construct_document_query(
+    source: sql.Composable, column_names: List[str], conditions: sql.Composable
+) -> sql.Composed:
+    """Generates a subquery that builds a {"columns": [...], "data": [[...], ...]} document out of the matching rows of a table, ordered by ID.
+
+    Args:
+        source (sql.Composable): The table or subquery to SELECT from. It is aliased as related.
+        column_names (List[str]): The columns to SELECT, starting with the ID.
+        conditions (sql.Composable): The conditions that rows must meet.
+
+    Returns:
+        sql.Composed: The subquery.
+    """
+    return sql.SQL("""
+        SELECT json_build_object(
+            'columns', {columns}::json,
+            'data', COALESCE(json_agg({row} ORDER BY related.id), '[]'::json)
+        )
+        FROM {source} AS related
+        WHERE {conditions}
+        """).format(
+        columns=sql.Literal(json.dumps(column_names)),
+        row=construct_row_array("related", column_names),
+        source=source,
+        conditions=conditions,
+    )
+
+
+def construct_include_queries(
+    database_name: str,
+    table_name: str,
+    includes: List[str],
+    geometry_format: GeometryFormat = "wkt",
+) -> dict[str, sql.Composable]:
+    """Generates the subqueries of the related documents that a data SELECT request embeds (see construct_select_json_query), so that the page and everything that renders it are selected in one round trip.
+
+    tags: the tags of the page's entries.
+    tag_names: the names of those tags and of the entries' primary tags.
+    descriptors: the descriptors of the page's entries, keyed by descriptor name.
+
+    Args:
+        database_name (str): The database containing the data table.
+        table_name (str): The data table.
+        includes (List[str]): The documents to embed (see parse_includes).
+        geometry_format (GeometryFormat, optional): How to SELECT the descriptors' geodetic points. Defaults to "wkt".
+
+    Returns:
+        dict[str, sql.Composable]: The subquery of each document.
+    """
+    tags_table_name = sql.Identifier(f"{table_name}_tags")
+    included: dict[str, sql.Composable] = {}
+    for include in includes:
+        match (include):
+            case "tags":
+                included[include] = construct_document_query(
+                    tags_table_name,
+                    ["id", *TAG_COLUMNS["tags"]],
+                    sql.SQL("related.entry_id IN (SELECT id FROM page_ids)"),
+                )
+            case "tag_names":
+                included[include] = construct_document_query(
+                    sql.Identifier(f"{table_name}_tag_names"),
+                    ["id", *TAG_COLUMNS["tag_names"]],
+                    sql.SQL(
+                        "related.id IN (SELECT tag_id FROM {tags} WHERE entry_id IN (SELECT id FROM page_ids)) OR related.id IN (SELECT primary_tag FROM {table_name} WHERE id IN (SELECT id FROM page_ids))"
+                    ).format(
+                        tags=tags_table_name, table_name=sql.Identifier(table_name)
+                    ),
+                )
+            case "descriptors":
+                included[include] = sql.SQL(
+                    "SELECT json_build_object({documents})"
+                ).format(
+                    documents=sql.SQL(", ").join(
+                        sql.SQL("{descriptor_name}, ({document})").format(
+                            descriptor_name=sql.Literal(descriptor_name),
+                            document=construct_descriptor_document_query(
+                                table_name,
+                                descriptor_name,
+                                descriptor_info["schema"],
+                                geometry_format,
+                            ),
+                        )
+                        for descriptor_name, descriptor_info in databases[
+                            database_name
+                        ][table_name]["descriptors"].items()
+                    )
+                )
+    return included
+
+
+def construct_descriptor_document_query(
+    table_name: str,
+    descriptor_name: str,
+    schema: DictSchema,
+    geometry_format: GeometryFormat = "wkt",
+) -> sql.Composed:
+    """Generates a subquery that builds the document of the descriptors of the page's entries (see construct_include_queries). The descriptors are found through the index on their parent column.
+
+    Args:
+        table_name (str): The data table.
+        descriptor_name (str): The descriptor.
+        schema (DictSchema): The descriptor's schema.
+        geometry_format (GeometryFormat, optional): How to SELECT geodetic points. Defaults to "wkt".
+
+    Returns:
+        sql.Composed: The subquery.
+    """
+    parent_column = sql.Identifier(DESCRIPTOR_PARENT_COLUMN_NAME)
+    return construct_document_query(
+        sql.SQL("({descriptors})").format(
+            descriptors=construct_select_all_query(
+                f"{table_name}_{descriptor_name}_descriptors",
+                schema,
+                values=[sql.Identifier("id"), parent_column],
+                conditions=sql.SQL(
+                    "WHERE {parent_column} IN (SELECT id FROM page_ids)"
+                ).format(parent_column=parent_column),
+                limit=None,
+                geometry_format=geometry_format,
+            )
+        ),
+        ["id", DESCRIPTOR_PARENT_COLUMN_NAME, *get_column_names(schema)],
+        sql.SQL("TRUE"),
+    )
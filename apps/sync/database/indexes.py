@@ -0,0 +1,239 @@
+import logging
+from hashlib import md5
+from typing import Any, List, Literal, TypedDict, cast
+import psycopg
+from psycopg import sql
+
+from constants import CONN_CONFIG
+from database.schema import get_tables
+from database.queries import get_table_schema
+
+logger = logging.getLogger("database")
+
+IndexMethod = Literal["btree", "brin", "gin", "gist"]
+
+# the expression that each index method indexes a column with
+# brin: append-only columns that grow with the physical row order (e.g. timestamps)
+# gin: full text search on text columns
+# gist: geodetic points
+INDEX_EXPRESSIONS: dict[IndexMethod, str] = {
+    "btree": "{column}",
+    "brin": "{column}",
+    "gin": "to_tsvector('simple', {column})",
+    "gist": "{column}",
+}
+
+# the datatypes that each index method suits. btree suits every datatype.
+INDEX_DATATYPES: dict[IndexMethod, set[str]] = {
+    "brin": {"int", "integer", "float", "number", "date", "time", "timestamp"},
+    "gin": {"text", "str", "string"},
+    "gist": {"geodetic point"},
+}
+
+# PostgreSQL truncates longer identifiers
+MAX_IDENTIFIER_LENGTH = 63
+
+
+class IndexSpec(TypedDict):
+    index_name: str
+    table_name: str
+    column_name: str
+    method: IndexMethod
+
+
+class IndexDiff(TypedDict):
+    # indexes that do not exist yet
+    missing: List[IndexSpec]
+    # indexes that exist but are unusable (e.g. after a failed concurrent build)
+    invalid: List[IndexSpec]
+
+
+def get_index_name(table_name: str, column_name: str, method: IndexMethod) -> str:
+    """Names the index of a column. Names that are too long for PostgreSQL are shortened with a hash so that they stay unique.
+
+    Args:
+        table_name (str): The target table name.
+        column_name (str): The indexed column.
+        method (IndexMethod): The index method.
+
+    Returns:
+        str: The index name.
+    """
+    index_name = f"{table_name}_{column_name}_{method}_idx"
+    if len(index_name) <= MAX_IDENTIFIER_LENGTH:
+        return index_name
+
+    digest = md5(index_name.encode()).hexdigest()[:8]
+    return f"{index_name[: MAX_IDENTIFIER_LENGTH - len(digest) - 5]}_{digest}_idx"
+
+
+def parse_index_hint(hint: Any, datatype: str) -> IndexMethod | None:
+    """Reads the index hint (index: ...) of a column in config.yml.
+
+    Args:
+        hint (Any): The hint. true picks the default method of the column's datatype.
+        datatype (str): The column's datatype.
+
+    Raises:
+        ValueError: When the hint is not a known index method, or when the method does not suit the column's datatype.
+
+    Returns:
+        IndexMethod | None: The index method, or None if the column should not be indexed.
+    """
+    if hint is None or hint is False:
+        return None
+    if hint is True:
+        return "gist" if datatype == "geodetic point" else "btree"
+    if hint not in INDEX_EXPRESSIONS:
+        raise ValueError(
+            f'"{hint}" is not an index method. Expected one of {", ".join(INDEX_EXPRESSIONS)}.'
+        )
+    method = cast(IndexMethod, hint)
+    # checked here rather than when building, so that a dry run catches it before any index is built
+    if method in INDEX_DATATYPES and datatype not in INDEX_DATATYPES[method]:
+        raise ValueError(
+            f'"{method}" indexes do not suit {datatype} columns. Expected one of {", ".join(sorted(INDEX_DATATYPES[method]))}.'
+        )
+    return method
+
+
+def get_desired_indexes(database_name: str) -> List[IndexSpec]:
+    """Lists the secondary indexes that config.yml asks for on the data and descriptor tables of a database.
+
+    Args:
+        database_name (str): The target database.
+
+    Raises:
+        ValueError: When an index hint is invalid.
+
+    Returns:
+        List[IndexSpec]: The indexes.
+    """
+    indexes: List[IndexSpec] = []
+    for table in get_tables(database_name):
+        schema = get_table_schema(database_name, table)
+        if schema is None:
+            continue
+
+        for column_name, column_schema in schema.items():
+            try:
+                method = parse_index_hint(
+                    column_schema.get("index"), column_schema["datatype"]
+                )
+            except ValueError as e:
+                raise ValueError(f"{table['table_name']}.{column_name}: {e}")
+            if method is None:
+                continue
+
+            indexes.append(
+                {
+                    "index_name": get_index_name(
+                        table["table_name"], column_name, method
+                    ),
+                    "table_name": table["table_name"],
+                    "column_name": column_name,
+                    "method": method,
+                }
+            )
+
+    return indexes
+
+
+def diff_indexes(conn: psycopg.Connection, indexes: List[IndexSpec]) -> IndexDiff:
+    """Compares the desired indexes with the indexes that exist (pg_indexes). Indexes of tables that do not exist yet are skipped.
+
+    Args:
+        conn (psycopg.Connection): Connection to the target database.
+        indexes (List[IndexSpec]): The desired indexes.
+
+    Returns:
+        IndexDiff: The indexes that are missing or invalid.
+    """
+    table_names = list({index["table_name"] for index in indexes})
+    existing_tables = {
+        table_name
+        for (table_name,) in conn.execute(
+            "SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename = ANY(%s);",
+            (table_names,),
+        )
+    }
+    existing_indexes: dict[str, bool] = {
+        index_name: valid
+        for index_name, valid in conn.execute(
+            """
+            SELECT pg_indexes.indexname, pg_index.indisvalid
+            FROM pg_indexes
+            INNER JOIN pg_index ON pg_index.indexrelid = format('%%I.%%I', pg_indexes.schemaname, pg_indexes.indexname)::regclass
+            WHERE pg_indexes.schemaname = current_schema() AND pg_indexes.tablename = ANY(%s);
+            """,
+            (table_names,),
+        )
+    }
+
+    diff: IndexDiff = {"missing": [], "invalid": []}
+    for index in indexes:
+        if index["table_name"] not in existing_tables:
+            continue
+        if index["index_name"] not in existing_indexes:
+            diff["missing"].append(index)
+        elif not existing_indexes[index["index_name"]]:
+            diff["invalid"].append(index)
+
+    return diff
+
+
+def build_index(conn: psycopg.Connection, index: IndexSpec) -> None:
+    """Builds an index without blocking writes to its table (CREATE INDEX CONCURRENTLY). An invalid index of the same name is dropped first.
+
+    Args:
+        conn (psycopg.Connection): An autocommit connection to the target database. Concurrent builds cannot run inside a transaction.
+
+    Raises:
+        Psycopg.Error: When the build fails. The index may be left invalid, in which case it is rebuilt next time.
+    """
+    index_name = sql.Identifier(index["index_name"])
+    conn.execute(
+        sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {index_name};").format(
+            index_name=index_name
+        )
+    ).close()
+    conn.execute(
+        sql.SQL(
+            "CREATE INDEX CONCURRENTLY {index_name} ON {table_name} USING {method} ({expression});"
+        ).format(
+            index_name=index_name,
+            table_name=sql.Identifier(index["table_name"]),
+            method=sql.SQL(index["method"]),
+            expression=sql.SQL(INDEX_EXPRESSIONS[index["method"]]).format(
+                column=sql.Identifier(index["column_name"])
+            ),
+        )
+    ).close()
+    logger.info(f"Built index {index['index_name']}.")
+
+
+def build_indexes(database_name: str, dry_run: bool = False) -> IndexDiff:
+    """Builds the indexes of a database that config.yml asks for but that are missing or invalid.
+
+    Args:
+        database_name (str): The target database.
+        dry_run (bool, optional): Whether or not to only report the differences. Defaults to False.
+
+    Raises:
+        ValueError: When an index hint is invalid.
+        Psycopg.Error: When an index cannot be built.
+
+    Returns:
+        IndexDiff: The indexes that were (or, on a dry run, would be) built.
+    """
+    indexes = get_desired_indexes(database_name)
+    if not indexes:
+        return {"missing": [], "invalid": []}
+
+    with psycopg.connect(**CONN_CONFIG, dbname=database_name, autocommit=True) as conn:
+        diff = diff_indexes(conn, indexes)
+        if not dry_run:
+            for index in [*diff["invalid"], *diff["missing"]]:
+                build_index(conn, index)
+
+    return diff
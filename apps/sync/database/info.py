@@ -0,0 +1,249 @@
+import logging
+import threading
+from typing import List, Tuple
+from psycopg import Connection
+from constants import CONN_CONFIG
+import psycopg
+
+logger = logging.getLogger("database")
+
+# Tables and indexes inside the info database that belong to the cache itself (i.e. not created by create_tables).
+INFO_TABLES: list[str] = [
+    """
+    CREATE TABLE IF NOT EXISTS pull_watermarks (
+        database_name TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        table_type TEXT NOT NULL,
+        watermark TEXT NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (database_name, table_name, table_type)
+    );
+    """,
+    # bumped whenever a table's entries change, so that cached responses can be told apart
+    """
+    CREATE TABLE IF NOT EXISTS table_versions (
+        database_name TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        version BIGINT NOT NULL,
+        PRIMARY KEY (database_name, table_name)
+    );
+    """,
+    # ranges of remote IDs that differ from the master database (see sync.reconcile) and are pulled again by the next pull of their table
+    """
+    CREATE TABLE IF NOT EXISTS repull_ranges (
+        database_name TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        table_type TEXT NOT NULL,
+        lo BIGINT NOT NULL,
+        hi BIGINT NOT NULL,
+        PRIMARY KEY (database_name, table_name, table_type, lo, hi)
+    );
+    """,
+    # translating remote IDs into local IDs (e.g. while pulling)
+    """
+    CREATE INDEX IF NOT EXISTS sync_status_remote_id_idx
+    ON sync_status (database_name, table_name, remote_id);
+    """,
+]
+
+info_tables_ready: bool = False
+info_tables_lock: threading.Lock = threading.Lock()
+
+
+def ensure_info_tables() -> None:
+    """Creates the info tables and indexes that belong to the cache if they do not exist yet. Only does work on the first call."""
+    global info_tables_ready
+
+    if info_tables_ready:
+        return
+
+    with info_tables_lock:
+        if info_tables_ready:
+            return
+
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            for statement in INFO_TABLES:
+                info_conn.execute(statement).close()
+
+        logger.debug("Info tables are ready.")
+        info_tables_ready = True
+
+
+def get_watermark(
+    info_conn: Connection, database_name: str, table_name: str, table_type: str
+) -> str | None:
+    """Fetches the pull watermark (i.e. the last remote ID that was pulled) of a table.
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        database_name (str): The target database name.
+        table_name (str): The target table name.
+        table_type (str): The target table's type.
+
+    Returns:
+        str | None: The watermark, or None if the table has never been pulled.
+    """
+    ensure_info_tables()
+    row = info_conn.execute(
+        "SELECT watermark FROM pull_watermarks WHERE database_name = %s AND table_name = %s AND table_type = %s;",
+        (database_name, table_name, table_type),
+    ).fetchone()
+    return None if row is None else row[0]
+
+
+def set_watermark(
+    info_conn: Connection,
+    database_name: str,
+    table_name: str,
+    table_type: str,
+    watermark: str | None,
+) -> None:
+    """Records (or clears) the pull watermark of a table. The watermark is committed along with the rest of info_conn's transaction.
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        database_name (str): The target database name.
+        table_name (str): The target table name.
+        table_type (str): The target table's type.
+        watermark (str | None): The last remote ID that was pulled. Passing None clears the watermark.
+    """
+    ensure_info_tables()
+    if watermark is None:
+        info_conn.execute(
+            "DELETE FROM pull_watermarks WHERE database_name = %s AND table_name = %s AND table_type = %s;",
+            (database_name, table_name, table_type),
+        ).close()
+        return
+
+    info_conn.execute(
+        """
+        INSERT INTO pull_watermarks (database_name, table_name, table_type, watermark)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (database_name, table_name, table_type)
+        DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = NOW();
+        """,
+        (database_name, table_name, table_type, watermark),
+    ).close()
+
+
+def queue_repull_ranges(
+    info_conn: Connection,
+    database_name: str,
+    table_name: str,
+    table_type: str,
+    ranges: List[Tuple[int, int]],
+) -> None:
+    """Queues ranges of remote IDs to be pulled again. The ranges are committed along with the rest of info_conn's transaction.
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        database_name (str): The target database name.
+        table_name (str): The target table name.
+        table_type (str): The target table's type.
+        ranges (List[Tuple[int, int]]): The inclusive ranges of remote IDs.
+    """
+    ensure_info_tables()
+    with info_conn.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO repull_ranges (database_name, table_name, table_type, lo, hi) VALUES (%s, %s, %s, %s, %s) ON CONFLICT DO NOTHING;",
+            [(database_name, table_name, table_type, lo, hi) for lo, hi in ranges],
+        )
+
+
+def get_repull_ranges(
+    info_conn: Connection, database_name: str, table_name: str, table_type: str
+) -> List[Tuple[int, int]]:
+    """Fetches the queued ranges of remote IDs of a table (see queue_repull_ranges).
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        database_name (str): The target database name.
+        table_name (str): The target table name.
+        table_type (str): The target table's type.
+
+    Returns:
+        List[Tuple[int, int]]: The inclusive ranges, in order.
+    """
+    ensure_info_tables()
+    return [
+        (lo, hi)
+        for lo, hi in info_conn.execute(
+            "SELECT lo, hi FROM repull_ranges WHERE database_name = %s AND table_name = %s AND table_type = %s ORDER BY lo, hi;",
+            (database_name, table_name, table_type),
+        )
+    ]
+
+
+def remove_repull_ranges(
+    info_conn: Connection,
+    database_name: str,
+    table_name: str,
+    table_type: str,
+    id_range: Tuple[int, int] | None = None,
+) -> None:
+    """Removes queued ranges of remote IDs once they have been pulled again. The removal is committed along with the rest of info_conn's transaction.
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        database_name (str): The target database name.
+        table_name (str): The target table name.
+        table_type (str): The target table's type.
+        id_range (Tuple[int, int] | None, optional): The range to remove. Defaults to None (i.e. every range of the table, e.g. after a full pull).
+    """
+    ensure_info_tables()
+    if id_range is None:
+        info_conn.execute(
+            "DELETE FROM repull_ranges WHERE database_name = %s AND table_name = %s AND table_type = %s;",
+            (database_name, table_name, table_type),
+        ).close()
+        return
+
+    info_conn.execute(
+        "DELETE FROM repull_ranges WHERE database_name = %s AND table_name = %s AND table_type = %s AND lo = %s AND hi = %s;",
+        (database_name, table_name, table_type, *id_range),
+    ).close()
+
+
+def bump_table_version(
+    info_conn: Connection, database_name: str, table_name: str
+) -> None:
+    """Marks a table as changed. The new version is committed along with the rest of info_conn's transaction (i.e. along with the sync_status rows of the entries that changed).
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        database_name (str): The target database name.
+        table_name (str): The target table name.
+    """
+    ensure_info_tables()
+    info_conn.execute(
+        """
+        INSERT INTO table_versions (database_name, table_name, version)
+        VALUES (%s, %s, 1)
+        ON CONFLICT (database_name, table_name)
+        DO UPDATE SET version = table_versions.version + 1;
+        """,
+        (database_name, table_name),
+    ).close()
+
+
+def get_table_versions(
+    info_conn: Connection, database_name: str, table_names: List[str]
+) -> List[int]:
+    """Fetches the versions of several tables at once.
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        database_name (str): The target database name.
+        table_names (List[str]): The target table names.
+
+    Returns:
+        List[int]: The version of each table, in the same order. Tables that have never changed are at version 0.
+    """
+    ensure_info_tables()
+    versions: dict[str, int] = dict(
+        info_conn.execute(
+            "SELECT table_name, version FROM table_versions WHERE database_name = %s AND table_name = ANY(%s);",
+            (database_name, table_names),
+        ).fetchall()
+    )
+    return [versions.get(table_name, 0) for table_name in table_names]
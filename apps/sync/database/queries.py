@@ -0,0 +1,339 @@
+import logging
+from types import MappingProxyType
+from typing import List, Literal, Mapping, Tuple
+from psycopg import sql
+from wywy_website_types import DictSchema
+
+from database.schema import (
+    DESCRIPTOR_PARENT_COLUMN_NAME,
+    databases,
+    get_tables,
+    TableInfo,
+)
+from database.db import (
+    GEOMETRY_FORMATS,
+    GeometryFormat,
+    construct_select_all_query,
+    construct_upsert_query,
+)
+
+logger = logging.getLogger("database")
+
+# select: the ID and every column of a table, without conditions (geodetic points as WKT)
+# select_geojson: the same as select, with geodetic points as GeoJSON
+# select_wkb: the same as select, with geodetic points as hex-encoded WKB
+# extract: a single entry, in the shape that the master database expects (bound as the only parameter)
+StatementName = Literal["select", "select_geojson", "select_wkb", "extract"]
+StatementKey = Tuple[str, str, StatementName]
+UpsertKey = Tuple[str, str, Tuple[str, ...]]
+
+SELECT_STATEMENT_NAMES: dict[GeometryFormat, StatementName] = {
+    "wkt": "select",
+    "geojson": "select_geojson",
+    "wkb": "select_wkb",
+}
+
+# the columns that the cache itself stores in each tag table type, in the order that it stores them in
+TAG_COLUMNS: dict[str, List[str]] = {
+    "tags": ["entry_id", "tag_id"],
+    "tag_names": ["tag_name"],
+    "tag_aliases": ["alias", "tag_id"],
+    "tag_groups": ["group_name", "tag_id"],
+}
+
+
+def freeze(query: sql.Composable) -> sql.SQL:
+    """Renders a statement once so that it is not composed again whenever it is executed. The result is immutable and can be shared between threads.
+
+    Args:
+        query (sql.Composable): The statement. Request values must be placeholders, not literals.
+
+    Returns:
+        sql.SQL: The rendered statement.
+    """
+    return sql.SQL(query.as_string())  # type: ignore[arg-type]
+
+
+def get_table_schema(database_name: str, table: TableInfo) -> DictSchema | None:
+    """Finds the schema of a data or descriptor table.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        table (TableInfo): The target table.
+
+    Returns:
+        DictSchema | None: The table's schema, or None if the table is a tag table.
+    """
+    table_info = databases[database_name][table["parent_table_name"]]
+    match (table["table_type"]):
+        case "data":
+            return table_info["schema"]
+        case "descriptors":
+            descriptor_name = (
+                table["table_name"]
+                .removeprefix(f"{table['parent_table_name']}_")
+                .removesuffix("_descriptors")
+            )
+            return table_info.get("descriptors", {})[descriptor_name]["schema"]
+        case _:
+            return None
+
+
+def get_entry_shape(
+    schema: DictSchema, tagging: bool = False
+) -> Tuple[List[str], List[sql.Composable]]:
+    """Lists the columns and VALUES shapes that decompose_entry produces for every entry of a schema (without an ID).
+
+    Args:
+        schema (DictSchema): The schema that the entries conform to.
+        tagging (bool, optional): Whether or not tagging is enabled. Defaults to False.
+
+    Returns:
+        Tuple[List[str], List[sql.Composable]]: The column names and the values_shapes.
+    """
+    columns: List[str] = []
+    values_shapes: List[sql.Composable] = []
+
+    if tagging:
+        columns.append("primary_tag")
+        values_shapes.append(sql.Placeholder())
+
+    for column_name in schema:
+        columns.append(column_name)
+        values_shapes.append(
+            sql.SQL("ST_GeographyFromText(%s)")
+            if schema[column_name]["datatype"] == "geodetic point"
+            else sql.Placeholder()
+        )
+
+        if schema[column_name].get("datatype") in (
+            "polymorphic pointer",
+            "polypointer",
+        ):
+            columns.append(f"{column_name}_type")
+            values_shapes.append(sql.Placeholder())
+
+        if schema[column_name].get("comments", False):
+            columns.append(f"{column_name}_comments")
+            values_shapes.append(sql.Placeholder())
+
+    return columns, values_shapes
+
+
+def construct_extract_query(database_name: str, table: TableInfo) -> sql.Composed:
+    """Generates the SELECT query that reads a single entry before it is sent to the master database. The entry's ID is bound as the only parameter.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        table (TableInfo): The target table.
+
+    Returns:
+        sql.Composed: The query.
+    """
+    table_name = table["table_name"]
+    parent_table_name = table["parent_table_name"]
+    id_column = sql.Identifier(table_name, table["id_column_name"])
+    schema = get_table_schema(database_name, table)
+
+    match (table["table_type"]):
+        case "data":
+            assert schema is not None
+            # add ID column to the SELECT query. There is no need to account for the edge case where the ID column is a part of the schema.
+            values: List[sql.Composable] = [id_column]
+            conditions: List[sql.Composable] = []
+
+            if databases[database_name][parent_table_name].get("tagging", False):
+                conditions.append(
+                    sql.SQL(
+                        "INNER JOIN sync_status ON sync_status.database_name={database_name} AND sync_status.table_name={tagging_table_name} AND {primary_tag_column}=sync_status.entry_id::integer "
+                    ).format(
+                        database_name=sql.Literal(database_name),
+                        tagging_table_name=sql.Literal(f"{table_name}_tag_names"),
+                        primary_tag_column=sql.Identifier(
+                            parent_table_name, "primary_tag"
+                        ),
+                    )
+                )
+                values.append(sql.SQL("sync_status.remote_id::integer AS primary_tag"))
+
+            conditions.append(
+                sql.SQL("WHERE {id_column} = %s").format(id_column=id_column)
+            )
+            return construct_select_all_query(
+                table_name,
+                schema,
+                values=values,
+                conditions=sql.Composed(conditions),
+                limit=None,
+            )
+        case "descriptors":
+            assert schema is not None
+            return construct_select_all_query(
+                table_name,
+                schema,
+                conditions=sql.SQL("WHERE {id_column} = %s").format(
+                    id_column=id_column
+                ),
+                limit=None,
+            )
+        case _:
+            return sql.SQL("SELECT * FROM {table_name} WHERE {id_column} = %s").format(
+                table_name=sql.Identifier(table_name), id_column=id_column
+            )
+
+
+def compile_statements() -> (
+    Tuple[Mapping[StatementKey, sql.SQL], Mapping[UpsertKey, sql.SQL]]
+):
+    """Compiles the SELECT, sync extraction and upsert statements of every table of every database.
+
+    Upserts are compiled for the columns that the cache stores for each table, with and without an ID. Requests whose values are bound as parameters reuse the same statement text, so PostgreSQL can reuse their plans.
+
+    Returns:
+        Tuple[Mapping[StatementKey, sql.SQL], Mapping[UpsertKey, sql.SQL]]: The statements and upsert statements, keyed by database name, table name and statement name (or column names).
+    """
+    statements: dict[StatementKey, sql.SQL] = {}
+    upserts: dict[UpsertKey, sql.SQL] = {}
+
+    for database_name in databases:
+        for table in get_tables(database_name):
+            table_name = table["table_name"]
+            id_column_name = table["id_column_name"]
+            schema = get_table_schema(database_name, table)
+
+            statements[(database_name, table_name, "extract")] = freeze(
+                construct_extract_query(database_name, table)
+            )
+
+            columns: List[str]
+            values_shapes: List[sql.Composable]
+            if schema is None:
+                statements[(database_name, table_name, "select")] = freeze(
+                    sql.SQL("SELECT * FROM {table_name}").format(
+                        table_name=sql.Identifier(table_name)
+                    )
+                )
+                columns = TAG_COLUMNS[table["table_type"]]
+                values_shapes = [sql.Placeholder() for _ in columns]
+            else:
+                tagging = table["table_type"] == "data" and databases[database_name][
+                    table["parent_table_name"]
+                ].get("tagging", False)
+                # descriptors are selected with the entry that they describe
+                parent_values: List[sql.Composable] = (
+                    [sql.Identifier(DESCRIPTOR_PARENT_COLUMN_NAME)]
+                    if table["table_type"] == "descriptors"
+                    else []
+                )
+                for geometry_format in GEOMETRY_FORMATS:
+                    statements[
+                        (
+                            database_name,
+                            table_name,
+                            SELECT_STATEMENT_NAMES[geometry_format],
+                        )
+                    ] = freeze(
+                        construct_select_all_query(
+                            table_name,
+                            schema,
+                            values=[sql.Identifier(id_column_name), *parent_values],
+                            tagging=tagging,
+                            limit=None,
+                            geometry_format=geometry_format,
+                        )
+                    )
+                columns, values_shapes = get_entry_shape(schema, tagging=tagging)
+
+            shapes: List[Tuple[List[str], List[sql.Composable]]] = [
+                (columns, values_shapes)
+            ]
+            # descriptors that are stored with their entry
+            if table["table_type"] == "descriptors":
+                shapes.append(
+                    (
+                        [*columns, DESCRIPTOR_PARENT_COLUMN_NAME],
+                        [*values_shapes, sql.Placeholder()],
+                    )
+                )
+            for shape_columns, shape_values in shapes:
+                upserts[(database_name, table_name, tuple(shape_columns))] = freeze(
+                    construct_upsert_query(
+                        table_name, shape_columns, id_column_name, shape_values
+                    )
+                )
+                # entries that already have an ID (e.g. updates)
+                if id_column_name not in shape_columns:
+                    upserts[
+                        (database_name, table_name, (id_column_name, *shape_columns))
+                    ] = freeze(
+                        construct_upsert_query(
+                            table_name,
+                            [id_column_name, *shape_columns],
+                            id_column_name,
+                            [sql.Placeholder(), *shape_values],
+                        )
+                    )
+
+    logger.debug(
+        f"Compiled {len(statements)} statements and {len(upserts)} upsert statements."
+    )
+    return MappingProxyType(statements), MappingProxyType(upserts)
+
+
+STATEMENTS, UPSERT_STATEMENTS = compile_statements()
+
+
+def get_statement(
+    database_name: str, table_name: str, statement_name: StatementName
+) -> sql.SQL:
+    """Looks up a compiled statement.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        table_name (str): The target table name.
+        statement_name (StatementName): The statement to look up.
+
+    Raises:
+        KeyError: When the table (or the statement) does not exist.
+
+    Returns:
+        sql.SQL: The statement.
+    """
+    return STATEMENTS[(database_name, table_name, statement_name)]
+
+
+def get_select_statement(
+    database_name: str, table_name: str, geometry_format: GeometryFormat = "wkt"
+) -> sql.SQL:
+    """Looks up the compiled SELECT of a table's ID and columns. Conditions, ordering and limits can be appended to it.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        table_name (str): The target table name.
+        geometry_format (GeometryFormat, optional): How to SELECT geodetic points. Tag tables ignore this. Defaults to "wkt".
+
+    Raises:
+        KeyError: When the table does not exist.
+
+    Returns:
+        sql.SQL: The statement.
+    """
+    return STATEMENTS.get(
+        (database_name, table_name, SELECT_STATEMENT_NAMES[geometry_format])
+    ) or get_statement(database_name, table_name, "select")
+
+
+def get_upsert_statement(
+    database_name: str, table_name: str, columns: List[str]
+) -> sql.SQL | None:
+    """Looks up the compiled upsert statement (see store_entry) for a set of columns.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        table_name (str): The target table name.
+        columns (List[str]): The column names to enter, in order.
+
+    Returns:
+        sql.SQL | None: The statement, or None if no statement was compiled for these columns (store_entry compiles one itself).
+    """
+    return UPSERT_STATEMENTS.get((database_name, table_name, tuple(columns)))
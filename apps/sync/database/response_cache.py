@@ -0,0 +1,197 @@
+import functools
+import threading
+from collections import OrderedDict
+from hashlib import md5
+from typing import Callable, List, Mapping, Tuple
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+import psycopg
+
+from constants import CONN_CONFIG
+from utils import chunkify_url, get_env_int, to_lower_snake_case
+from database.schema import databases
+from database.info import get_table_versions
+
+# the number of serialised SELECT responses to keep. 0 disables the cache.
+RESPONSE_CACHE_SIZE: int = get_env_int("RESPONSE_CACHE_SIZE", 256)
+# larger responses are not cached
+RESPONSE_CACHE_MAX_ENTRY_BYTES: int = get_env_int(
+    "RESPONSE_CACHE_MAX_ENTRY_BYTES", 1024 * 1024
+)
+# the number of vector tiles to keep. They are cached apart from other responses, since maps request many of them at once. 0 disables the cache.
+TILE_CACHE_SIZE: int = get_env_int("TILE_CACHE_SIZE", 1024)
+
+CacheKey = Tuple[str, str, Tuple[int, ...]]
+
+# endpoints that read the same tables as SELECT requests: .../[endpoint]/[database name]/[table name]/...
+ANALYTICS_ENDPOINTS: set[str] = {"aggregate", "downsample", "tiles"}
+
+
+class ResponseCache:
+    """A thread-safe, bounded LRU cache of serialised responses of a single content type."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_entry_bytes: int,
+        content_type: str = "application/json",
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.content_type = content_type
+        self.entries: OrderedDict[CacheKey, bytes] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> bytes | None:
+        with self.lock:
+            content = self.entries.get(key)
+            if content is not None:
+                self.entries.move_to_end(key)
+            return content
+
+    def put(self, key: CacheKey, content: bytes) -> None:
+        if self.max_entries <= 0 or len(content) > self.max_entry_bytes:
+            return
+
+        with self.lock:
+            self.entries[key] = content
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+RESPONSE_CACHE: ResponseCache = ResponseCache(
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MAX_ENTRY_BYTES
+)
+TILE_CACHE: ResponseCache = ResponseCache(
+    TILE_CACHE_SIZE,
+    RESPONSE_CACHE_MAX_ENTRY_BYTES,
+    "application/vnd.mapbox-vector-tile",
+)
+
+
+def get_select_tables(
+    path: str, params: Mapping[str, str] | None = None
+) -> Tuple[str, List[str]] | None:
+    """Finds the tables that a SELECT request reads from.
+
+    Args:
+        path (str): The request path (.../[analytics endpoint]?/[database name]/[table name]/[table type]/[descriptor name]?/[z/x/y of tiles]?).
+        params (Mapping[str, str] | None, optional): The query parameters. Requests that include related documents (?include=...) read their tables too. Defaults to None.
+
+    Returns:
+        Tuple[str, List[str]] | None: The database name and table names, or None if the path does not point to a table.
+    """
+    url_chunks = chunkify_url(path)
+    analytics = len(url_chunks) > 1 and url_chunks[1] in ANALYTICS_ENDPOINTS
+    if analytics:
+        # tiles read the same tables whichever tile they render
+        if url_chunks[1] == "tiles":
+            del url_chunks[-3:]
+        del url_chunks[1]
+    if len(url_chunks) not in (4, 5):
+        return None
+
+    database_name = to_lower_snake_case(url_chunks[1])
+    table_name = to_lower_snake_case(url_chunks[2])
+    table_type = to_lower_snake_case(url_chunks[3])
+    if database_name not in databases or table_name not in databases[database_name]:
+        return None
+
+    match (table_type):
+        case "data" if len(url_chunks) == 4:
+            table_names = [table_name]
+            includes = params is not None and "include" in params
+            # analytics can group data by its tags, and pages can include them
+            if (analytics or includes) and databases[database_name][table_name].get(
+                "tagging", False
+            ):
+                table_names.extend([f"{table_name}_tags", f"{table_name}_tag_names"])
+            # pages can include their descriptors
+            if includes:
+                table_names.extend(
+                    f"{table_name}_{descriptor_name}_descriptors"
+                    for descriptor_name in databases[database_name][table_name].get(
+                        "descriptors", {}
+                    )
+                )
+            return database_name, table_names
+        case "tags" | "tag_names" | "tag_aliases" | "tag_groups" if (
+            len(url_chunks) == 4
+        ):
+            return database_name, [f"{table_name}_{table_type}"]
+        case "descriptors" if len(url_chunks) == 5:
+            return database_name, [f"{table_name}_{url_chunks[4]}_descriptors"]
+        case _:
+            return None
+
+
+def cache_select_response(
+    view: Callable[[HttpRequest], HttpResponse],
+    cache: ResponseCache = RESPONSE_CACHE,
+) -> Callable[[HttpRequest], HttpResponse]:
+    """Caches the responses of a SELECT view by table version, and answers conditional requests (If-None-Match) with 304 Not Modified.
+
+    Responses are keyed by path, query parameters and the versions of the tables that they read, so they stay valid until one of those tables changes. Streamed responses and errors are not cached.
+
+    Args:
+        view (Callable[[HttpRequest], HttpResponse]): The SELECT view.
+        cache (ResponseCache, optional): The cache to keep the responses in. Defaults to RESPONSE_CACHE.
+
+    Returns:
+        Callable[[HttpRequest], HttpResponse]: The cached view.
+    """
+
+    @functools.wraps(view)
+    def cached_view(request: HttpRequest) -> HttpResponse:
+        if request.GET.get("stream", "false").lower() == "true":
+            return view(request)
+
+        target = get_select_tables(request.path, request.GET)
+        if target is None:
+            return view(request)
+        database_name, table_names = target
+
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            versions = tuple(get_table_versions(info_conn, database_name, table_names))
+
+        query = request.GET.urlencode()
+        key: CacheKey = (request.path, query, versions)
+        etag = f'"{"-".join(map(str, versions))}-{md5(f"{request.path}?{query}".encode()).hexdigest()[:16]}"'
+
+        if_none_match = request.headers.get("If-None-Match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")]:
+            response: HttpResponse = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        content = cache.get(key)
+        if content is None:
+            response = view(request)
+            if response.status_code != 200 or response.streaming:
+                return response
+            cache.put(key, response.content)
+        else:
+            response = HttpResponse(content, content_type=cache.content_type)
+
+        response["ETag"] = etag
+        return response
+
+    return cached_view
+
+
+def cache_tile_response(
+    view: Callable[[HttpRequest], HttpResponse],
+) -> Callable[[HttpRequest], HttpResponse]:
+    """Caches the responses of a vector tile view in TILE_CACHE (see cache_select_response).
+
+    Args:
+        view (Callable[[HttpRequest], HttpResponse]): The tile view.
+
+    Returns:
+        Callable[[HttpRequest], HttpResponse]: The cached view.
+    """
+    return cache_select_response(view, TILE_CACHE)
@@ -13,7 +13,7 @@ from wywy_website_types import (
     DictSchema,
 )
 from config import CONFIG
-from typing import Callable, Any, List
+from typing import Callable, Any, List, TypedDict
 import psycopg
 from psycopg import sql
 
@@ -124,6 +124,102 @@ for db in CONFIG["data"]:
     databases[db_name] = tables
 
 
+def get_foreign_keys(
+    database_name: str, parent_table_name: str, table_type: str
+) -> dict[str, str]:
+    """Finds the foreign key columns of a table and the tables that they reference.
+
+    Only these columns are translated between local and master database IDs. Pointer and polymorphic pointer columns are not foreign keys here: they are pulled and synced as they are, so pulled pointers hold the master database's IDs.
+
+    Args:
+        database_name (str): The database of the target table.
+        parent_table_name (str): The name of the parent table, or the table name if the table has no parent.
+        table_type (str): The type of the target table.
+
+    Returns:
+        dict[str, str]: The foreign key column names mapped to the names of the tables that they reference.
+    """
+    tag_names_table_name = f"{parent_table_name}_tag_names"
+    match (table_type):
+        case "data":
+            if databases[database_name][parent_table_name].get("tagging", False):
+                return {"primary_tag": tag_names_table_name}
+            return {}
+        case "tags":
+            return {"tag_id": tag_names_table_name, "entry_id": parent_table_name}
+        case "tag_aliases" | "tag_groups":
+            return {"tag_id": tag_names_table_name}
+        case _:
+            return {}
+
+
+# descriptors reference the entry that they describe through this column. It belongs to the cache (see database.descriptors) and is not synced.
+DESCRIPTOR_PARENT_COLUMN_NAME = "parent_id"
+
+
+class TableInfo(TypedDict):
+    table_name: str
+    parent_table_name: str
+    table_type: str
+    id_column_name: str
+
+
+def get_tables(database_name: str) -> List[TableInfo]:
+    """Lists every table that the cache stores for a database, including the tag tables and descriptors. Parents come before their children.
+
+    Args:
+        database_name (str): The target database.
+
+    Returns:
+        List[TableInfo]: The tables' names, parent table names, types and ID column names.
+    """
+    tables: List[TableInfo] = []
+    for parent_table_name, table_info in databases[database_name].items():
+        if table_info.get("tagging", False):
+            tables.append(
+                {
+                    "table_name": f"{parent_table_name}_tag_names",
+                    "parent_table_name": parent_table_name,
+                    "table_type": "tag_names",
+                    "id_column_name": "id",
+                }
+            )
+
+        tables.append(
+            {
+                "table_name": parent_table_name,
+                "parent_table_name": parent_table_name,
+                "table_type": "data",
+                "id_column_name": "id",
+            }
+        )
+
+        if table_info.get("tagging", False):
+            for table_type in ("tags", "tag_aliases", "tag_groups"):
+                tables.append(
+                    {
+                        "table_name": f"{parent_table_name}_{table_type}",
+                        "parent_table_name": parent_table_name,
+                        "table_type": table_type,
+                        "id_column_name": (
+                            "alias" if table_type == "tag_aliases" else "id"
+                        ),
+                    }
+                )
+
+        for descriptor_name in table_info.get("descriptors", {}):
+            tables.append(
+                {
+                    "table_name": f"{parent_table_name}_{descriptor_name}_descriptors",
+                    "parent_table_name": parent_table_name,
+                    "table_type": "descriptors",
+                    "id_column_name": "id",
+                }
+            )
+
+    return tables
+
+
 def get_all_tags(database_name: str, parent_table_name: str) -> list[int]:
     """Get all the related tags. Expects the target table to have tagged enabled.
 
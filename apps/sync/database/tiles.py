@@ -0,0 +1,210 @@
+import math
+from typing import Any, List, Mapping, Tuple
+from psycopg import sql
+from wywy_website_types import DictSchema
+
+from utils import get_env_int
+from database.filters import construct_envelope, parse_select_filters
+
+# the largest zoom level that tiles can be requested at
+TILE_MAX_ZOOM: int = get_env_int("TILE_MAX_ZOOM", 22)
+# points are clustered below this zoom level
+TILE_CLUSTER_MAX_ZOOM: int = get_env_int("TILE_CLUSTER_MAX_ZOOM", 14)
+# the number of clustering cells along each side of a tile
+TILE_CLUSTER_GRID: int = get_env_int("TILE_CLUSTER_GRID", 64)
+
+# the size of tiles in tile coordinates, and the margin around them that features are kept in (so that symbols on the edge of a tile are not cut off)
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+# web mercator (EPSG:3857) spans [-WEB_MERCATOR_BOUND, WEB_MERCATOR_BOUND] along both axes
+WEB_MERCATOR_BOUND = 20037508.342789244
+
+# the query parameters of tile requests that are not filters (see parse_select_filters)
+TILE_PARAMETERS: set[str] = {"column"}
+
+Tile = Tuple[int, int, int]
+
+
+def parse_tile(url_chunks: List[str]) -> Tile:
+    """Reads the coordinates of a tile (.../[z]/[x]/[y], where y may end with .mvt or .pbf).
+
+    Args:
+        url_chunks (List[str]): The last three URL chunks.
+
+    Raises:
+        ValueError: When the coordinates are not a tile.
+
+    Returns:
+        Tile: The zoom level, column and row of the tile.
+    """
+    if len(url_chunks) != 3:
+        raise ValueError("Expected a tile: .../[z]/[x]/[y].")
+    z, x, y = url_chunks
+    y = y.removesuffix(".mvt").removesuffix(".pbf")
+    if not all(chunk.isdigit() for chunk in (z, x, y)):
+        raise ValueError(f"{z}/{x}/{y} is not a tile.")
+
+    tile = (int(z), int(x), int(y))
+    if tile[0] > TILE_MAX_ZOOM:
+        raise ValueError(f"Tiles go up to zoom level {TILE_MAX_ZOOM}.")
+    if tile[1] >= 2 ** tile[0] or tile[2] >= 2 ** tile[0]:
+        raise ValueError(f"{z}/{x}/{y} is outside of the map.")
+    return tile
+
+
+def get_tile_bounds(tile: Tile, margin: float = 0) -> Tuple[float, float, float, float]:
+    """Finds the longitudes and latitudes that bound a tile.
+
+    Args:
+        tile (Tile): The tile.
+        margin (float, optional): How far to extend the bounds, as a fraction of the tile's size. They never extend beyond the map. Defaults to 0.
+
+    Returns:
+        Tuple[float, float, float, float]: The west, south, east and north bounds.
+    """
+    z, x, y = tile
+    num_tiles = 2**z
+
+    def get_longitude(column: float) -> float:
+        return min(max(column / num_tiles * 360 - 180, -180), 180)
+
+    def get_latitude(row: float) -> float:
+        row = min(max(row, 0), num_tiles)
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / num_tiles))))
+
+    return (
+        get_longitude(x - margin),
+        get_latitude(y + 1 + margin),
+        get_longitude(x + 1 + margin),
+        get_latitude(y - margin),
+    )
+
+
+def construct_tile_query(
+    tile: Tile,
+    table_name: str,
+    schema: DictSchema,
+    params: Mapping[str, str],
+    tagging: bool = False,
+) -> Tuple[sql.Composed, dict[str, Any]]:
+    """Generates a query that renders the geodetic points of a table inside a tile as a Mapbox vector tile, so that maps cost O(features per tile) to draw however many rows the table has.
+
+    Each feature's ID is the ID of its row. Below zoom level TILE_CLUSTER_MAX_ZOOM, the points are clustered on a grid of TILE_CLUSTER_GRID cells along each side of the tile: a cluster has the ID of its first row and sits at the centre of its points. Every feature has a point_count property.
+
+    ?column=[column] is the geodetic point column to render. Defaults to the table's only geodetic point column.
+    Rows can be filtered in the same way as SELECT requests (see parse_select_filters).
+
+    Args:
+        tile (Tile): The tile to render (see parse_tile).
+        table_name (str): The table to render.
+        schema (DictSchema): The table's schema.
+        params (Mapping[str, str]): The query parameters.
+        tagging (bool, optional): Whether or not the table has tags. Defaults to False.
+
+    Raises:
+        ValueError: When a parameter is unknown or invalid.
+
+    Returns:
+        Tuple[sql.Composed, dict[str, Any]]: The query (which returns the tile as bytes) and its parameters.
+    """
+    for parameter_name in ("fields", "order"):
+        if parameter_name in params:
+            raise ValueError(f"Tiles do not support {parameter_name}.")
+    filters = parse_select_filters(params, schema, tagging, TILE_PARAMETERS)
+    if filters["order_by"] is not None:
+        raise ValueError("Tiles cannot be ordered by distance.")
+
+    # find the column to render
+    if "column" in params:
+        column_name = params["column"]
+        if column_name not in schema:
+            raise ValueError(f'Cannot render unknown column "{column_name}".')
+        if schema[column_name]["datatype"] != "geodetic point":
+            raise ValueError(f'Column "{column_name}" is not a geodetic point.')
+    else:
+        column_names = [
+            name
+            for name, column_schema in schema.items()
+            if column_schema["datatype"] == "geodetic point"
+        ]
+        if len(column_names) != 1:
+            raise ValueError(
+                "Tiles require column when a table does not have exactly one geodetic point column."
+            )
+        column_name = column_names[0]
+    column = sql.Identifier(column_name)
+
+    z, x, y = tile
+    west, south, east, north = get_tile_bounds(tile, TILE_BUFFER / TILE_EXTENT)
+    if z == 0:
+        # the tile is the whole map, which ends short of the poles (at tile_north)
+        tile_condition = sql.SQL(
+            "abs(ST_Y({column}::geometry)) <= %(tile_north)s"
+        ).format(column=column)
+    else:
+        # the raw column is compared with the bounds, so that its GiST index can be used
+        tile_condition = sql.SQL("ST_Intersects({column}, {envelope})").format(
+            column=column,
+            envelope=construct_envelope(
+                *(
+                    sql.Placeholder(f"tile_{bound}")
+                    for bound in ("west", "south", "east", "north")
+                )
+            ),
+        )
+
+    envelope = sql.SQL("ST_TileEnvelope(%(tile_z)s, %(tile_x)s, %(tile_y)s)")
+    if z < TILE_CLUSTER_MAX_ZOOM:
+        features = sql.SQL("""
+            SELECT min(id) AS id, count(*) AS point_count,
+                ST_AsMVTGeom(ST_Centroid(ST_Collect(geom)), {envelope}, {extent}, {buffer}) AS geom
+            FROM points
+            GROUP BY ST_SnapToGrid(geom, {origin}, {origin}, %(cluster_size)s, %(cluster_size)s)
+            """).format(
+            envelope=envelope,
+            extent=sql.Literal(TILE_EXTENT),
+            buffer=sql.Literal(TILE_BUFFER),
+            origin=sql.Literal(-WEB_MERCATOR_BOUND),
+        )
+    else:
+        features = sql.SQL("""
+            SELECT id, 1 AS point_count, ST_AsMVTGeom(geom, {envelope}, {extent}, {buffer}) AS geom
+            FROM points
+            """).format(
+            envelope=envelope,
+            extent=sql.Literal(TILE_EXTENT),
+            buffer=sql.Literal(TILE_BUFFER),
+        )
+
+    query = sql.SQL("""
+        WITH points AS (
+            SELECT id, ST_Transform({column}::geometry, 3857) AS geom
+            FROM {table_name}
+            WHERE {conditions}
+        ), features AS (
+            {features}
+        )
+        SELECT COALESCE(ST_AsMVT(features, %(tile_layer)s, {extent}, 'geom', 'id'), ''::bytea)
+        FROM features
+        WHERE geom IS NOT NULL
+        """).format(
+        column=column,
+        table_name=sql.Identifier(table_name),
+        conditions=sql.SQL(" AND ").join([tile_condition, *filters["conditions"]]),
+        features=features,
+        extent=sql.Literal(TILE_EXTENT),
+    )
+
+    return query, {
+        **filters["params"],
+        "tile_z": z,
+        "tile_x": x,
+        "tile_y": y,
+        "tile_west": west,
+        "tile_south": south,
+        "tile_east": east,
+        "tile_north": north,
+        "tile_layer": table_name,
+        "cluster_size": 2 * WEB_MERCATOR_BOUND / 2**z / TILE_CLUSTER_GRID,
+    }
@@ -0,0 +1,128 @@
+import functools
+import logging
+from django.http import (
+    HttpResponse,
+    HttpRequest,
+    HttpResponseBadRequest,
+    HttpResponseNotAllowed,
+    HttpResponseServerError,
+)
+from typing import Any, Callable, List, Mapping, Tuple
+from wywy_website_types import DictSchema
+import psycopg
+from psycopg import sql
+from constants import CONN_CONFIG
+
+from utils import chunkify_url
+from database.response_cache import (
+    TILE_CACHE,
+    cache_select_response,
+    cache_tile_response,
+)
+from database.aggregates import (
+    construct_aggregate_query,
+    construct_downsample_query,
+)
+from database.tiles import construct_tile_query, parse_tile
+from main.views import find_select_target
+
+logger = logging.getLogger("database")
+
+
+AnalyticsQueryConstructor = Callable[
+    [str, DictSchema, Mapping[str, str], bool], Tuple[sql.Composed, dict[str, Any]]
+]
+
+
+def handle_analytics_request(
+    request: HttpRequest,
+    construct_query: AnalyticsQueryConstructor,
+    target_url_chunks: List[str] | None = None,
+    content_type: str = "application/json",
+) -> HttpResponse:
+    """Handle a request that summarises a data or descriptor table inside the database, so that only the summary is sent to the client.
+
+    Args:
+        request (HttpRequest): The request to handle.
+        construct_query (AnalyticsQueryConstructor): Generates the query that builds the response document.
+        target_url_chunks (List[str] | None, optional): The URL chunks that point to the table (see find_select_target). Defaults to every chunk after the endpoint.
+        content_type (str, optional): The content type of the response document. Defaults to "application/json".
+
+    Returns:
+        HttpResponse: The response to the client.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    # .../main/[endpoint]/[database_name]/[table_name]/[table_type]/[descriptor_name]?
+    if target_url_chunks is None:
+        target_url_chunks = chunkify_url(request.path)[2:]
+    target = find_select_target(target_url_chunks)
+    if isinstance(target, HttpResponse):
+        return target
+
+    try:
+        query, params = construct_query(
+            target["table_name"], target["schema"], request.GET, target["tagging"]
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    with psycopg.connect(**CONN_CONFIG, dbname=target["database_name"]) as conn:
+        row = conn.execute(query, params).fetchone()
+
+    if row is None:
+        return HttpResponseServerError("Could not build the response.")
+
+    return HttpResponse(row[0], content_type=content_type)
+
+
+@cache_select_response
+def aggregate(request: HttpRequest) -> HttpResponse:
+    """Group and summarise a table (see construct_aggregate_query).
+
+    Args:
+        request (HttpRequest): The request to handle.
+
+    Returns:
+        HttpResponse: The response to the client.
+    """
+    return handle_analytics_request(request, construct_aggregate_query)
+
+
+@cache_select_response
+def downsample(request: HttpRequest) -> HttpResponse:
+    """Summarise a table in fixed-width time buckets (see construct_downsample_query).
+
+    Args:
+        request (HttpRequest): The request to handle.
+
+    Returns:
+        HttpResponse: The response to the client.
+    """
+    return handle_analytics_request(request, construct_downsample_query)
+
+
+@cache_tile_response
+def tiles(request: HttpRequest) -> HttpResponse:
+    """Render the geodetic points of a table as a vector tile (see construct_tile_query).
+
+    Args:
+        request (HttpRequest): The request to handle.
+
+    Returns:
+        HttpResponse: The response to the client.
+    """
+    # .../main/tiles/[database_name]/[table_name]/[table_type]/[descriptor_name]?/[z]/[x]/[y]
+    url_chunks: List[str] = chunkify_url(request.path)
+    try:
+        tile = parse_tile(url_chunks[-3:])
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    return handle_analytics_request(
+        request,
+        functools.partial(construct_tile_query, tile),
+        url_chunks[2:-3],
+        TILE_CACHE.content_type,
+    )
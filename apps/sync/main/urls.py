@@ -1,7 +1,10 @@
 from django.urls import re_path
 
-from . import views
+from . import analytics, views
 
 urlpatterns = [
+    re_path(r"^aggregate/.*$", analytics.aggregate, name="aggregate"),
+    re_path(r"^downsample/.*$", analytics.downsample, name="downsample"),
+    re_path(r"^tiles/.*$", analytics.tiles, name="tiles"),
     re_path(r"^.*$", views.index, name="index"),
 ]
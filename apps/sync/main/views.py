@@ -7,25 +7,50 @@ from django.http import (
     HttpResponseServerError,
     HttpResponseForbidden,
     HttpResponseNotAllowed,
+    StreamingHttpResponse,
 )
-from typing import List, Any, cast
+from typing import List, Any, TypedDict, cast
 from wywy_website_types import (
     DictTableInfo,
     DictDescriptorInfo,
     Entry,
-    EntryTableData,
     DictSchema,
 )
 import json
 import psycopg
 from psycopg import sql
 from constants import CONN_CONFIG
-import datetime
 
 from utils import to_lower_snake_case, chunkify_url
-from database.schema import check_entry, check_item, check_tags, databases
-from sync.sync import queue_sync
-from database.db import construct_select_all_query, store_entry, decompose_entry
+from database.schema import (
+    DESCRIPTOR_PARENT_COLUMN_NAME,
+    check_entry,
+    check_item,
+    check_tags,
+    databases,
+)
+from database.descriptors import link_descriptor
+from sync.sync import queue_sync, write_through
+from database.response_cache import cache_select_response
+from database.queries import get_select_statement, get_upsert_statement
+from database.filters import parse_select_filters
+from database.includes import construct_include_queries, parse_includes
+from database.db import (
+    GEOMETRY_FORMATS,
+    STREAM_LIMIT_CLAUSE,
+    GeometryFormat,
+    construct_id_list_clauses,
+    construct_order_clause,
+    construct_select_all_query,
+    construct_select_json_query,
+    construct_page_clauses,
+    construct_stream_query,
+    parse_id_list,
+    parse_page_request,
+    store_entry,
+    open_stream_select,
+    decompose_entry,
+)
 
 from tags.views import (
     handle_select_request as handle_tags_select_request,
@@ -35,24 +60,33 @@ from tags.views import (
 logger = logging.getLogger("database")
 
 
-def handle_select_request(request: HttpRequest) -> HttpResponse:
-    """Handle a database SELECT request.
+class SelectTarget(TypedDict):
+    database_name: str
+    # the parent table name (i.e. the table name inside the URL)
+    parent_table_name: str
+    table_name: str
+    table_type: str
+    schema: DictSchema
+    tagging: bool
+    # the columns that are selected between the ID and the schema's columns
+    extra_columns: List[str]
+
+
+def find_select_target(url_chunks: List[str]) -> SelectTarget | HttpResponse:
+    """Finds the data or descriptor table that a request reads from.
 
     Args:
-        request (HttpRequest): The request to handle.
+        url_chunks (List[str]): The URL chunks after the endpoint: [database name, table name, table type, descriptor name?].
 
     Returns:
-        HttpResponse: The response to the client.
+        SelectTarget | HttpResponse: The target table, or the response to the client if the target is invalid.
     """
-    # .../main/[database_name]/[table_name]/[table_type]/[descriptor_name]?
-    url_chunks: List[str] = chunkify_url(request.path)
-
-    if len(url_chunks) < 4:
+    if len(url_chunks) < 3:
         return HttpResponseBadRequest("Bad GET URL.")
 
-    database_name = to_lower_snake_case(url_chunks[1])
-    table_name = to_lower_snake_case(url_chunks[2])
-    table_type = to_lower_snake_case(url_chunks[3])
+    database_name = to_lower_snake_case(url_chunks[0])
+    table_name = to_lower_snake_case(url_chunks[1])
+    table_type = to_lower_snake_case(url_chunks[2])
 
     # validate database name
     if database_name not in databases:
@@ -64,32 +98,31 @@ def handle_select_request(request: HttpRequest) -> HttpResponse:
         )
     table_info = databases[database_name][table_name]
 
-    select_query: sql.SQL | sql.Composed
-    target_schema: DictSchema
-    target_table_name: str
-    tagging: bool
+    target: SelectTarget
     match (table_type):
-        case "data":  # .../main/[database_name]/[table_name]/data
-            if len(url_chunks) != 4:
+        case "data":  # .../[database_name]/[table_name]/data
+            if len(url_chunks) != 3:
                 return HttpResponseBadRequest("Bad GET URL.")
 
-            target_table_name = table_name
-            target_schema = table_info["schema"]
-            tagging = table_info.get("tagging", False)
-        case (
-            "tags" | "tag_aliases" | "tag_groups" | "tag_names"
-        ):  # .../main/[database_name]/[table_name]/[table_type]
-            return handle_tags_select_request(request)
+            target = {
+                "database_name": database_name,
+                "parent_table_name": table_name,
+                "table_name": table_name,
+                "table_type": table_type,
+                "schema": table_info["schema"],
+                "tagging": table_info.get("tagging", False),
+                "extra_columns": [],
+            }
         case (
             "descriptors"
-        ):  # .../main/[database_name]/[table_name]/descriptors/[descriptor_name]
-            if len(url_chunks) != 5:
+        ):  # .../[database_name]/[table_name]/descriptors/[descriptor_name]
+            if len(url_chunks) != 4:
                 return HttpResponseBadRequest("Bad GET URL.")
 
             if "descriptors" not in table_info:
                 return HttpResponseBadRequest("This table has no descriptors.")
 
-            descriptor_name = url_chunks[4]
+            descriptor_name = url_chunks[3]
 
             if descriptor_name not in table_info["descriptors"]:
                 return HttpResponseBadRequest(
@@ -98,84 +131,212 @@ def handle_select_request(request: HttpRequest) -> HttpResponse:
 
             descriptor_info = table_info["descriptors"][descriptor_name]
 
-            target_table_name = f"{table_name}_{descriptor_name}_descriptors"
-            target_schema = descriptor_info["schema"]
-            tagging = False
+            target = {
+                "database_name": database_name,
+                "parent_table_name": table_name,
+                "table_name": f"{table_name}_{descriptor_name}_descriptors",
+                "table_type": table_type,
+                "schema": descriptor_info["schema"],
+                "tagging": False,
+                "extra_columns": [DESCRIPTOR_PARENT_COLUMN_NAME],
+            }
         case _:
             return HttpResponseBadRequest(f'"{table_type}" is not a valid table type.')
 
-    conditions: list[sql.Composable | sql.Composed] = []
+    # check if the target table has read permissions
+    if not table_info["read"]:
+        return HttpResponseForbidden(
+            f"{database_name}/{table_name} does not have read permissions."
+        )
+
+    return target
+
+
+@cache_select_response
+def handle_select_request(request: HttpRequest) -> HttpResponse:
+    """Handle a database SELECT request.
+
+    Args:
+        request (HttpRequest): The request to handle.
+
+    Returns:
+        HttpResponse: The response to the client.
+    """
+    # .../main/[database_name]/[table_name]/[table_type]/[descriptor_name]?
+    url_chunks: List[str] = chunkify_url(request.path)
+
+    if len(url_chunks) >= 4 and to_lower_snake_case(url_chunks[3]) in (
+        "tags",
+        "tag_aliases",
+        "tag_groups",
+        "tag_names",
+    ):  # .../main/[database_name]/[table_name]/[table_type]
+        return handle_tags_select_request(request)
+
+    target = find_select_target(url_chunks[1:])
+    if isinstance(target, HttpResponse):
+        return target
+    database_name = target["database_name"]
+    target_table_name = target["table_name"]
+    table_type = target["table_type"]
+    target_schema = target["schema"]
+    tagging = target["tagging"]
+
+    try:
+        page = parse_page_request(request.GET)
+        # ?id=[ID],[ID],... selects a batch of rows in the requested order instead of a page
+        select_ids = parse_id_list(request.GET["id"]) if "id" in request.GET else None
+        filters = parse_select_filters(
+            {key: value for key, value in request.GET.items() if key != "id"},
+            target_schema,
+            tagging,
+        )
+        # ?include=[document],... embeds the documents that render the rows (e.g. their tags)
+        includes = (
+            parse_includes(
+                request.GET["include"],
+                tagging,
+                table_type == "data"
+                and bool(
+                    databases[database_name][target["parent_table_name"]].get(
+                        "descriptors"
+                    )
+                ),
+            )
+            if "include" in request.GET
+            else []
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    if filters["order_by"] is not None and (
+        page["after"] is not None or page["before"] is not None
+    ):
+        return HttpResponseBadRequest(
+            "Pages in a custom order cannot be selected with after or before."
+        )
+    if select_ids is not None and (
+        filters["order_by"] is not None
+        or page["after"] is not None
+        or page["before"] is not None
+    ):
+        return HttpResponseBadRequest(
+            "A batch of IDs cannot be selected with after, before or order."
+        )
+    stream = request.GET.get("stream", "false").lower() == "true"
+    if includes and stream:
+        return HttpResponseBadRequest("Streamed responses cannot include documents.")
+    geometry_format = cast(GeometryFormat, request.GET.get("geometry", "wkt").lower())
+    if geometry_format not in GEOMETRY_FORMATS:
+        return HttpResponseBadRequest(
+            f'"{geometry_format}" is not a valid geometry format.'
+        )
+
+    conditions = filters["conditions"]
+    # the page and the conditions' values are bound as parameters
+    params: dict[str, Any] = {**page, **filters["params"], "ids": select_ids}
 
-    select_id = request.GET.get("id")
-    parent_id = request.GET.get("parent_id")
-    if select_id is not None:
-        conditions.append(sql.SQL("WHERE id={id}").format(id=sql.Literal(select_id)))
-    elif parent_id is not None:
+    # ?parent_id=[ID],[ID],... selects the descriptors of one or more entries
+    if "parent_id" in request.GET:
         match (table_type):
             case "data":
                 return HttpResponseBadRequest(f"Main tables do not have parent tables.")
-            case "descriptors":
-                return HttpResponseBadRequest(
-                    "Not implemented yet. Descriptors currently do not have relationships with their original entries."
-                )
             case _:
-                logger.critical(
-                    f"Unexpected table type found while constructing SELECT query: {table_type}"
-                )
-        conditions.append(sql.SQL("WHERE "))
-
-    select_query = construct_select_all_query(
-        target_table_name,
-        target_schema,
-        values=[sql.Identifier("id")],
-        conditions=sql.SQL(" ").join(conditions),
-        tagging=tagging,
+                try:
+                    params["parent_ids"] = parse_id_list(request.GET["parent_id"])
+                except ValueError as e:
+                    return HttpResponseBadRequest(str(e))
+                conditions = [
+                    *conditions,
+                    sql.SQL("{parent_column} = ANY(%(parent_ids)s)").format(
+                        parent_column=sql.Identifier(DESCRIPTOR_PARENT_COLUMN_NAME)
+                    ),
+                ]
+    # only the requested columns leave the database
+    select_query: sql.Composable = (
+        construct_select_all_query(
+            target_table_name,
+            filters["schema"],
+            values=[
+                sql.Identifier("id"),
+                *(
+                    sql.Identifier(column_name)
+                    for column_name in target["extra_columns"]
+                ),
+            ],
+            tagging=filters["tagging"],
+            limit=None,
+            geometry_format=geometry_format,
+        )
+        if filters["projected"]
+        else get_select_statement(database_name, target_table_name, geometry_format)
     )
 
-    # check if the target table has read permissions
-    if not databases[database_name][table_name]["read"]:
-        return HttpResponseForbidden(
-            f"{database_name}/{table_name} does not have read permissions."
+    if stream:
+        if select_ids is not None:
+            page_conditions, order = construct_id_list_clauses(sql.Identifier("id"))
+            conditions = [*conditions, *page_conditions]
+        elif filters["order_by"] is None:
+            page_conditions, order = construct_page_clauses(page, sql.Identifier("id"))
+            conditions = [*conditions, *page_conditions]
+        else:
+            order = construct_order_clause(filters["order_by"])
+
+        select_query = sql.SQL("{select_query} {conditions} {order} {limit}").format(
+            select_query=select_query,
+            conditions=(
+                sql.SQL("WHERE {conditions}").format(
+                    conditions=sql.SQL(" AND ").join(conditions)
+                )
+                if conditions
+                else sql.SQL("")
+            ),
+            order=order,
+            # streamed responses are unbounded unless a limit is given
+            limit=STREAM_LIMIT_CLAUSE if "limit" in request.GET else sql.SQL(""),
         )
 
-    # fetch data
-    with psycopg.connect(**CONN_CONFIG, dbname=database_name) as conn:
-        with conn.cursor() as cur:
-            # @TODO change to tag_aliases
-            # @TODO LIMIT
-            cur.execute(select_query)
-
-            if cur.description is None:
-                return HttpResponseServerError(
-                    "Could not fetch the column schema from the database."
-                )
+        # the query runs before the response starts, so that failures are reported with an error status
+        try:
+            chunks = open_stream_select(
+                database_name,
+                construct_stream_query(select_query, page, "id"),
+                params,
+            )
+        except psycopg.DataError as e:
+            return HttpResponseBadRequest(f"Invalid query: {e}")
+        except psycopg.Error as e:
+            logger.error(e)
+            return HttpResponseServerError(
+                "Could not fetch the rows from the database."
+            )
 
-            output: EntryTableData = {
-                "columns": [column.name for column in cur.description],
-                "data": [list(row) for row in cur.fetchall()],
-            }
+        return StreamingHttpResponse(chunks, content_type="application/json")
 
-    # format the data
-    date_columns: List[int] = []
-    # string_columns: List[int] = []
-    if len(output["data"]) > 0:
-        for i in range(len(output["data"][0])):
-            item = output["data"][0][i]
-            if (
-                isinstance(item, datetime.datetime)
-                or isinstance(item, datetime.date)
-                or isinstance(item, datetime.time)
-            ):
-                date_columns.append(i)
-            # elif isinstance(item, str):
-            # string_columns.append(i)
+    # the response document is built by PostgreSQL
+    with psycopg.connect(**CONN_CONFIG, dbname=database_name) as conn:
+        row = conn.execute(
+            construct_select_json_query(
+                target_table_name,
+                filters["schema"],
+                page,
+                conditions,
+                tagging=filters["tagging"],
+                geometry_format=geometry_format,
+                select_query=select_query,
+                order_by=filters["order_by"],
+                ids=select_ids is not None,
+                included=construct_include_queries(
+                    database_name, target_table_name, includes, geometry_format
+                ),
+                extra_columns=target["extra_columns"],
+            ),
+            params,
+        ).fetchone()
 
-        for row in output["data"]:
-            for date_index in date_columns:
-                row[date_index] = row[date_index].isoformat()
+    if row is None:
+        return HttpResponseServerError("Could not build the response.")
 
-    # return the data
-    return JsonResponse(output)
+    return HttpResponse(row[0], content_type="application/json")
 
 
 def handle_insert_request(request: HttpRequest) -> HttpResponse:
@@ -288,52 +449,65 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
 
             tags = cast(list[str], data["tags"])
 
-            if "descriptors" in data:
-                descriptors = {}
-                data_descriptors = data["descriptors"]
-                if not "descriptors" in table:
-                    return HttpResponseBadRequest("This table has no descriptors.")
+        if "descriptors" in data:
+            descriptors = {}
+            data_descriptors = data["descriptors"]
+            if not "descriptors" in table:
+                return HttpResponseBadRequest("This table has no descriptors.")
+
+            if not isinstance(data_descriptors, dict):
+                return HttpResponseBadRequest(
+                    "Descriptors must be supplied in a JSON object with the key as the descriptor type and the value as an array of descriptors of the corresponding type. The arrays may be empty."
+                )
+
+            data_descriptors = cast(dict[str, Any], data_descriptors)
+            for descriptor_type, descriptor_array in data_descriptors.items():
+                if not isinstance(descriptor_array, list):
+                    return HttpResponseBadRequest(
+                        "Descriptors must be supplied in arrays."
+                    )
+
+                descriptor_name = to_lower_snake_case(descriptor_type)
 
-                if not isinstance(data_descriptors, dict):
+                if descriptor_name not in table["descriptors"]:
                     return HttpResponseBadRequest(
-                        "Descriptors must be supplied in a JSON object with the key as the descriptor type and the value as an array of descriptors of the corresponding type. The arrays may be empty."
+                        f"Descriptor type {descriptor_name} was not found."
                     )
 
-                data_descriptors = cast(dict[str, Any], data_descriptors)
-                for descriptor_type, descriptor_array in data_descriptors.items():
-                    if not isinstance(descriptor_array, list):
+                for descriptor_entry in cast(list[Any], descriptor_array):
+                    if not isinstance(descriptor_entry, dict):
                         return HttpResponseBadRequest(
-                            "Descriptors must be supplied in arrays."
+                            "Descriptor entries must be JSON objects."
                         )
 
-                    descriptor_name = to_lower_snake_case(descriptor_type)
-
-                    if descriptor_name not in table["descriptors"]:
+                    if not check_item(
+                        cast(dict[str, Any], descriptor_entry),
+                        database_name,
+                        table["descriptors"][descriptor_name]["schema"],
+                    ):
                         return HttpResponseBadRequest(
-                            f"Descriptor type {descriptor_name} was not found."
+                            "A descriptor inside the given entry does not conform to the schema."
                         )
 
-                    for descriptor_entry in cast(list[Any], descriptor_array):
-                        if not isinstance(descriptor_entry, dict):
-                            return HttpResponseBadRequest(
-                                "Descriptor entries must be JSON objects."
-                            )
-
-                        if not check_item(
-                            cast(dict[str, Any], descriptor_entry),
-                            database_name,
-                            table["descriptors"][descriptor_name]["schema"],
-                        ):
-                            return HttpResponseBadRequest(
-                                "A descriptor inside the given entry does not conform to the schema."
-                            )
-
-                    descriptors[to_lower_snake_case(descriptor_type)] = cast(
-                        list[dict[str, Any]], descriptor_array
-                    )
+                descriptors[to_lower_snake_case(descriptor_type)] = cast(
+                    list[dict[str, Any]], descriptor_array
+                )
     else:
         entry = data
 
+    # descriptors that are posted on their own may reference their entry
+    parent_id: Any = None
+    if table_type == "descriptors" and DESCRIPTOR_PARENT_COLUMN_NAME in entry:
+        parent_id = entry.pop(DESCRIPTOR_PARENT_COLUMN_NAME)
+        if (
+            not isinstance(parent_id, int)
+            or isinstance(parent_id, bool)
+            or parent_id <= 0
+        ):
+            return HttpResponseBadRequest(
+                f"{DESCRIPTOR_PARENT_COLUMN_NAME} must be a positive integer."
+            )
+
     if not check_entry(entry, database_name, entry_info):
         return HttpResponseBadRequest("The given entry does not conform to the schema.")
     # END - validate schema
@@ -347,6 +521,14 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
         try:
             # @TODO atomicity
             # main entry
+            decomposed_entry = decompose_entry(
+                entry,
+                entry_info["schema"],
+                tagging=entry_info.get("tagging", False),
+                id_column_name="id",
+            )
+            if parent_id is not None:
+                link_descriptor(decomposed_entry, parent_id)
             entry_id = store_entry(
                 data_conn,
                 info_conn,
@@ -354,11 +536,9 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
                 target_table_name,
                 table_name,
                 table_type,
-                **decompose_entry(
-                    entry,
-                    entry_info["schema"],
-                    tagging=entry_info.get("tagging", False),
-                    id_column_name="id",
+                **decomposed_entry,
+                query=get_upsert_statement(
+                    database_name, target_table_name, decomposed_entry["columns"]
                 ),
             )
 
@@ -374,6 +554,11 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
                         "tags",
                         ["entry_id", "tag_id"],
                         [entry_id, tag_id],
+                        query=get_upsert_statement(
+                            database_name,
+                            f"{table_name}_tags",
+                            ["entry_id", "tag_id"],
+                        ),
                     )
 
             # descriptors
@@ -381,19 +566,33 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
                 for descriptor_name, descriptor_array in descriptors.items():
                     if "descriptors" not in table:
                         raise ValueError("Descriptors not in table?")
+                    descriptor_table_name = (
+                        f"{table_name}_{descriptor_name}_descriptors"
+                    )
                     for descriptor_entry in descriptor_array:
+                        decomposed_descriptor = decompose_entry(
+                            descriptor_entry,
+                            table["descriptors"][descriptor_name]["schema"],
+                        )
+                        link_descriptor(decomposed_descriptor, entry_id)
                         store_entry(
                             data_conn,
                             info_conn,
                             database_name,
-                            f"{table_name}_{descriptor_name}_descriptors",
+                            descriptor_table_name,
                             table_name,
                             "descriptors",
-                            **decompose_entry(
-                                descriptor_entry,
-                                table["descriptors"][descriptor_name]["schema"],
+                            **decomposed_descriptor,
+                            query=get_upsert_statement(
+                                database_name,
+                                descriptor_table_name,
+                                decomposed_descriptor["columns"],
                             ),
                         )
+
+            # the entry is committed before its table's new version, so that a response cached under the new version always contains it (as in sync.pull)
+            data_conn.commit()
+            info_conn.commit()
         except (psycopg.Error, ValueError) as e:
             logger.error(e)
             data_conn.rollback()
@@ -404,9 +603,33 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
 
     # @TODO recovery
 
-    # queue a sync
+    # write-through tables (or requests) wait for the entry to reach the master database
+    remote_id: str | None = None
+    write_through_enabled = (
+        table.get("writeThrough", False) is True
+        or request.GET.get("write_through", "false").lower() == "true"
+    )
+    if write_through_enabled:
+        remote_id = write_through(
+            {
+                "database_name": database_name,
+                "table_name": target_table_name,
+                "entry_ids": [str(entry_id)],
+            }
+        )
+
+    # queue a sync for everything else (e.g. tags and descriptors)
     queue_sync()
 
+    if write_through_enabled:
+        return JsonResponse(
+            {
+                "id": entry_id,
+                "remote_id": remote_id,
+                "status": "pending" if remote_id is None else "synced",
+            }
+        )
+
     return HttpResponse(entry_id)
 
 
@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, Tuple, TypedDict
+
+from requests import HTTPError
+import psycopg
+
+from utils import get_env_int
+from sync.sync import pull_table
+
+logger = logging.getLogger("sync")
+
+# the number of tables that may be pulled in parallel
+REFRESH_WORKERS: int = get_env_int("REFRESH_WORKERS", 4)
+# the number of finished jobs to remember for status requests
+REFRESH_JOB_HISTORY: int = get_env_int("REFRESH_JOB_HISTORY", 256)
+
+JobState = Literal["queued", "running", "done", "failed"]
+
+
+class RefreshJob(TypedDict):
+    id: str
+    database_name: str
+    table_name: str
+    # None refreshes every table type of the table
+    table_type: str | None
+    full: bool
+    state: JobState
+    rows_fetched: int
+    rows_stored: int
+    queued_at: float
+    started_at: float | None
+    finished_at: float | None
+    error: str | None
+
+
+class RefreshJobStatus(RefreshJob):
+    elapsed: float
+
+
+# jobs are keyed by their target and whether or not they are full, so that a full refresh is not answered by an incremental one
+JobKey = Tuple[str, str, str | None, bool]
+
+JOBS: OrderedDict[str, RefreshJob] = OrderedDict()
+# the job that is currently queued or running for each target
+ACTIVE_JOBS: dict[JobKey, str] = {}
+JOBS_LOCK: threading.Lock = threading.Lock()
+
+EXECUTOR: ThreadPoolExecutor = ThreadPoolExecutor(
+    max_workers=max(REFRESH_WORKERS, 1), thread_name_prefix="refresh"
+)
+
+
+def submit_refresh(
+    database_name: str,
+    table_name: str,
+    table_type: str | None = None,
+    full: bool = False,
+) -> Tuple[RefreshJob, bool]:
+    """Queues a refresh of a table in the background. Refreshes of a target that is already queued or running are not queued again.
+
+    Jobs whose targets overlap (e.g. a refresh of a whole table and a refresh of one of its table types) pull each table type one at a time (see sync.sync.hold_pull_slot).
+
+    Args:
+        database_name (str): The database containing the respective table.
+        table_name (str): The parent table name, or the table name if the table has no parent.
+        table_type (str | None, optional): The table type to refresh. Passing in None refreshes every table type in dependency order. Defaults to None.
+        full (bool, optional): Whether or not to ignore the watermarks and pull every entry. Defaults to False.
+
+    Returns:
+        Tuple[RefreshJob, bool]: The job that refreshes the target, and whether or not it was newly queued.
+    """
+    key: JobKey = (database_name, table_name, table_type, full)
+
+    with JOBS_LOCK:
+        if key in ACTIVE_JOBS:
+            return JOBS[ACTIVE_JOBS[key]], False
+
+        job: RefreshJob = {
+            "id": uuid.uuid4().hex,
+            "database_name": database_name,
+            "table_name": table_name,
+            "table_type": table_type,
+            "full": full,
+            "state": "queued",
+            "rows_fetched": 0,
+            "rows_stored": 0,
+            "queued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        JOBS[job["id"]] = job
+        ACTIVE_JOBS[key] = job["id"]
+
+    EXECUTOR.submit(run_refresh, job)
+    return job, True
+
+
+def run_refresh(job: RefreshJob) -> None:
+    """Runs a queued refresh job and records its progress.
+
+    Args:
+        job (RefreshJob): The job to run.
+    """
+
+    def on_page(num_fetched: int, num_stored: int) -> None:
+        with JOBS_LOCK:
+            job["rows_fetched"] += num_fetched
+            job["rows_stored"] += num_stored
+
+    with JOBS_LOCK:
+        job["state"] = "running"
+        job["started_at"] = time.time()
+
+    state: JobState = "done"
+    error: str | None = None
+    try:
+        pull_table(
+            job["database_name"],
+            job["table_name"],
+            full=job["full"],
+            on_page=on_page,
+            table_types=None if job["table_type"] is None else [job["table_type"]],
+        )
+    except (HTTPError, psycopg.Error, ValueError, RuntimeError) as e:
+        logger.error(
+            f"Refresh of {job["database_name"]}/{job["table_name"]} failed: {e}"
+        )
+        state = "failed"
+        error = str(e)
+    except Exception as e:
+        logger.exception(
+            f"Refresh of {job["database_name"]}/{job["table_name"]} failed unexpectedly."
+        )
+        state = "failed"
+        error = str(e)
+
+    with JOBS_LOCK:
+        job["state"] = state
+        job["error"] = error
+        job["finished_at"] = time.time()
+        del ACTIVE_JOBS[
+            (job["database_name"], job["table_name"], job["table_type"], job["full"])
+        ]
+
+        # forget the oldest finished jobs
+        finished_job_ids = [
+            job_id
+            for job_id, other_job in JOBS.items()
+            if other_job["state"] in ("done", "failed")
+        ]
+        for job_id in finished_job_ids[
+            : max(len(finished_job_ids) - REFRESH_JOB_HISTORY, 0)
+        ]:
+            del JOBS[job_id]
+
+
+def get_job_status(job_id: str) -> RefreshJobStatus | None:
+    """Fetches a snapshot of a refresh job's progress.
+
+    Args:
+        job_id (str): The job's ID.
+
+    Returns:
+        RefreshJobStatus | None: The job's status, or None if the job does not exist (or has been forgotten).
+    """
+    with JOBS_LOCK:
+        if job_id not in JOBS:
+            return None
+        job = JOBS[job_id]
+
+        elapsed: float = 0
+        if job["started_at"] is not None:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+
+        return {**job, "elapsed": elapsed}
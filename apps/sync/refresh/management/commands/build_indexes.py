@@ -0,0 +1,65 @@
+from typing import Any, List
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+import psycopg
+
+from utils import to_lower_snake_case
+from database.schema import databases
+from database.indexes import build_indexes, get_desired_indexes
+
+
+class Command(BaseCommand):
+    help = "Builds the secondary indexes that config.yml asks for (index: btree | brin | gin | gist) and that do not exist yet, without blocking writes."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--database",
+            action="append",
+            default=None,
+            help="Only build the indexes of this database. May be given more than once.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the missing and invalid indexes.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        database_names: List[str] = (
+            list(databases)
+            if options["database"] is None
+            else [to_lower_snake_case(name) for name in options["database"]]
+        )
+        for database_name in database_names:
+            if database_name not in databases:
+                raise CommandError(f'Database "{database_name}" was not found.')
+
+        # check every index hint before building any index
+        for database_name in database_names:
+            try:
+                get_desired_indexes(database_name)
+            except ValueError as e:
+                raise CommandError(f"{database_name}: {e}")
+
+        num_indexes = 0
+        for database_name in database_names:
+            try:
+                diff = build_indexes(database_name, dry_run=options["dry_run"])
+            except (psycopg.Error, ValueError) as e:
+                raise CommandError(f"{database_name}: {e}")
+
+            for state in ("missing", "invalid"):
+                for index in diff[state]:
+                    num_indexes += 1
+                    self.stdout.write(
+                        f"{database_name}/{index["table_name"]}: {index["index_name"]} ({index["method"]} on {index["column_name"]}) was {state}."
+                    )
+
+        if num_indexes == 0:
+            self.stdout.write(self.style.SUCCESS("Every index is up to date."))
+        elif options["dry_run"]:
+            self.stdout.write(
+                f"Found {num_indexes} indexes to build. Run again without --dry-run to build them."
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Built {num_indexes} indexes."))
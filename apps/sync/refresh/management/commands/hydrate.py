@@ -0,0 +1,87 @@
+import time
+from typing import Any, List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from utils import to_lower_snake_case
+from database.schema import databases
+from sync.sync import PULL_PAGE_SIZE
+from refresh.jobs import REFRESH_WORKERS, get_job_status, submit_refresh
+
+# how often (in seconds) to check on the refresh jobs
+POLL_INTERVAL: float = 0.5
+
+
+class Command(BaseCommand):
+    help = "Pulls every configured table (data, tags and descriptors) from the master database. Interrupted runs resume from the last committed page unless --full is given. Tables are pulled as refresh jobs, REFRESH_WORKERS at a time. Pointer columns keep the master database's IDs."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--database",
+            action="append",
+            default=None,
+            help="Only hydrate this database. May be given more than once.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignore the watermarks and pull every entry again.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        database_names: List[str] = (
+            list(databases)
+            if options["database"] is None
+            else [to_lower_snake_case(name) for name in options["database"]]
+        )
+        for database_name in database_names:
+            if database_name not in databases:
+                raise CommandError(f'Database "{database_name}" was not found.')
+
+        # tables are pulled in parallel: the only foreign keys that are translated (see database.schema.get_foreign_keys) are within a table and its tag tables, which each table pulls in dependency order. Each table type waits for any other pull of it (e.g. a refresh requested from the server).
+        # pointer and polymorphic pointer columns reference other tables, but they are not translated (by pulls or by the sync), so hydrated pointers hold the master database's IDs whatever order the tables are pulled in.
+        self.stdout.write(
+            f"Hydrating tables with {REFRESH_WORKERS} workers (page size {PULL_PAGE_SIZE})."
+        )
+        start = time.monotonic()
+        jobs: dict[str, Tuple[str, str]] = {
+            submit_refresh(database_name, table_name, full=options["full"])[0]["id"]: (
+                database_name,
+                table_name,
+            )
+            for database_name in database_names
+            for table_name in databases[database_name]
+        }
+        num_tables = len(jobs)
+
+        num_failures = 0
+        while jobs:
+            time.sleep(POLL_INTERVAL)
+            for job_id, (database_name, table_name) in list(jobs.items()):
+                status = get_job_status(job_id)
+                if status is not None and status["state"] not in ("done", "failed"):
+                    continue
+
+                del jobs[job_id]
+                # finished jobs are forgotten after REFRESH_JOB_HISTORY other jobs finish
+                if status is None:
+                    self.stdout.write(f"{database_name}/{table_name}: finished.")
+                elif status["state"] == "failed":
+                    num_failures += 1
+                    self.stderr.write(
+                        f"{database_name}/{table_name}: failed ({status["error"]})."
+                    )
+                else:
+                    self.stdout.write(
+                        f"{database_name}/{table_name}: stored {status["rows_stored"]} entries."
+                    )
+
+        elapsed = time.monotonic() - start
+        if num_failures:
+            raise CommandError(
+                f"{num_failures} of {num_tables} tables failed after {elapsed:.1f}s. Run the command again to resume."
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Hydrated {num_tables} tables in {elapsed:.1f}s.")
+        )
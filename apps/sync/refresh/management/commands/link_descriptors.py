@@ -0,0 +1,61 @@
+from typing import Any, List
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+import psycopg
+
+from utils import to_lower_snake_case
+from database.schema import databases
+from database.descriptors import link_descriptor_tables
+
+
+class Command(BaseCommand):
+    help = "Adds the parent column (and its index) that links descriptors to their entries to every descriptor table that does not have it yet. Run it before the server starts: it locks the descriptor tables and their parents."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--database",
+            action="append",
+            default=None,
+            help="Only link the descriptors of this database. May be given more than once.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the descriptor tables without the column.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        database_names: List[str] = (
+            list(databases)
+            if options["database"] is None
+            else [to_lower_snake_case(name) for name in options["database"]]
+        )
+        for database_name in database_names:
+            if database_name not in databases:
+                raise CommandError(f'Database "{database_name}" was not found.')
+
+        num_tables = 0
+        for database_name in database_names:
+            try:
+                table_names = link_descriptor_tables(
+                    database_name, dry_run=options["dry_run"]
+                )
+            except psycopg.Error as e:
+                raise CommandError(f"{database_name}: {e}")
+
+            for table_name in table_names:
+                num_tables += 1
+                self.stdout.write(
+                    f"{database_name}/{table_name} did not have a parent column."
+                )
+
+        if num_tables == 0:
+            self.stdout.write(self.style.SUCCESS("Every descriptor table is linked."))
+        elif options["dry_run"]:
+            self.stdout.write(
+                f"Found {num_tables} descriptor tables to link. Run again without --dry-run to link them."
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Linked {num_tables} descriptor tables.")
+            )
@@ -0,0 +1,59 @@
+from typing import Any, List
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+import psycopg
+
+from utils import to_lower_snake_case
+from database.schema import databases
+from sync.rebuild import rebuild_sync_status
+
+
+class Command(BaseCommand):
+    help = "Compares sync_status with the stored entries of every table and reports (or, with --apply, fixes) the differences."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--database",
+            action="append",
+            default=None,
+            help="Only rebuild this database. May be given more than once.",
+        )
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Add the missing rows, delete the orphaned rows and fix the misfiled rows.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        database_names: List[str] = (
+            list(databases)
+            if options["database"] is None
+            else [to_lower_snake_case(name) for name in options["database"]]
+        )
+        for database_name in database_names:
+            if database_name not in databases:
+                raise CommandError(f'Database "{database_name}" was not found.')
+
+        num_differences = 0
+        for database_name in database_names:
+            try:
+                diffs = rebuild_sync_status(database_name, apply=options["apply"])
+            except psycopg.Error as e:
+                raise CommandError(f"{database_name}: {e}")
+
+            for diff in diffs:
+                num_differences += diff["missing"] + diff["orphaned"] + diff["misfiled"]
+                self.stdout.write(
+                    f"{database_name}/{diff["table_name"]}: {diff["missing"]} missing, {diff["orphaned"]} orphaned, {diff["misfiled"]} misfiled."
+                )
+
+        if num_differences == 0:
+            self.stdout.write(self.style.SUCCESS("sync_status is up to date."))
+        elif options["apply"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"Fixed {num_differences} sync_status rows.")
+            )
+        else:
+            self.stdout.write(
+                f"Found {num_differences} differences. Run again with --apply to fix them."
+            )
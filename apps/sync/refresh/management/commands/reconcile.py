@@ -0,0 +1,65 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from requests import HTTPError
+import psycopg
+
+from utils import to_lower_snake_case
+from database.schema import databases
+from sync.reconcile import RECONCILE_CHUNKS, RECONCILE_LEAF_SIZE, reconcile
+
+
+class Command(BaseCommand):
+    help = "Compares a table with the master database using range digests, marks the rows that differ as mismatched and queues their ranges to be pulled again by the next pull of the table."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("database", help="The database containing the table.")
+        parser.add_argument("table", help="The (parent) table name.")
+        parser.add_argument(
+            "--table-type",
+            default="data",
+            help='The table type to reconcile. Defaults to "data".',
+        )
+        parser.add_argument(
+            "--descriptor",
+            default=None,
+            help='The descriptor to reconcile when the table type is "descriptors".',
+        )
+        parser.add_argument("--chunks", type=int, default=RECONCILE_CHUNKS)
+        parser.add_argument("--leaf-size", type=int, default=RECONCILE_LEAF_SIZE)
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Pull the ranges that differ from the master database again now, rather than on the next pull.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        database_name = to_lower_snake_case(options["database"])
+        table_name = to_lower_snake_case(options["table"])
+        if database_name not in databases or table_name not in databases[database_name]:
+            raise CommandError(f'Table "{database_name}/{table_name}" was not found.')
+
+        try:
+            result = reconcile(
+                database_name,
+                table_name,
+                table_type=to_lower_snake_case(options["table_type"]),
+                descriptor_name=(
+                    None
+                    if options["descriptor"] is None
+                    else to_lower_snake_case(options["descriptor"])
+                ),
+                chunks=max(options["chunks"], 2),
+                leaf_size=max(options["leaf_size"], 1),
+                repair=options["repair"],
+            )
+        except (HTTPError, psycopg.Error, ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Compared {result["ranges_compared"]} ranges and {result["rows_compared"]} rows."
+        )
+        self.stdout.write(f"Mismatched rows (remote IDs): {result["mismatched"]}")
+        self.stdout.write(f"Missing rows (remote IDs): {result["missing"]}")
+        if options["repair"]:
+            self.stdout.write(f"Pulled {result["repaired"]} rows again.")
@@ -1,7 +1,8 @@
-from django.urls import re_path
+from django.urls import re_path, path
 
 from . import views
 
 urlpatterns = [
+    path("/jobs/<str:job_id>", views.job_status, name="job_status"),
     re_path(r"^.*$", views.index, name="index"),
 ]
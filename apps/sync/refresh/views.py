@@ -2,29 +2,57 @@ from django.http import (
     HttpResponse,
     HttpRequest,
     HttpResponseBadRequest,
-    HttpResponseServerError,
     HttpResponseForbidden,
+    HttpResponseNotFound,
+    JsonResponse,
 )
-from requests import HTTPError
 from typing import List
 from wywy_website_types import DictTableInfo
-import psycopg
 
 from utils import to_lower_snake_case, chunkify_url
 from database.schema import databases
-from sync.sync import pull
+from sync.sync import PULL_ORDER
+from refresh.jobs import RefreshJob, submit_refresh, get_job_status
 
 
 def index(request: HttpRequest) -> HttpResponse:
+    """Queues refresh jobs in the background.
+
+    POST /refresh/[database name] refreshes every writable table in the database in parallel.
+    POST /refresh/[database name]/[table name] refreshes every table type of a table in dependency order.
+    POST /refresh/[database name]/[table name]/[table type] refreshes a single table type.
+
+    Args:
+        request (HttpRequest): The request to handle.
+
+    Returns:
+        HttpResponse: 202 with the queued jobs, which can be polled at /refresh/jobs/[job id].
+    """
     # client requests
     if request.method == "POST":
         # look for the target table
         url_chunks: List[str] = chunkify_url(request.path)
-        if len(url_chunks) != 4:
+        if len(url_chunks) not in (2, 3, 4):
             return HttpResponseBadRequest("Bad POST URL.")
         database_name = to_lower_snake_case(url_chunks[1])
+        if not database_name in databases:
+            return HttpResponseBadRequest(f'Database "{database_name}" was not found.')
+        full = request.GET.get("full", "false").lower() == "true"
+
+        # fan out across every table in the database
+        if len(url_chunks) == 2:
+            jobs: List[RefreshJob] = [
+                submit_refresh(database_name, table_name, full=full)[0]
+                for table_name, table in databases[database_name].items()
+                if table.get("write", False) is True
+            ]
+            return JsonResponse(
+                {"jobs": [job["id"] for job in jobs]},
+                status=202,
+            )
+
         table_name = to_lower_snake_case(url_chunks[2])
-        if not database_name in databases or not table_name in databases[database_name]:
+        if not table_name in databases[database_name]:
             return HttpResponseBadRequest(f'Database "{database_name}" was not found.')
         table: DictTableInfo = databases[database_name][table_name]
 
@@ -32,16 +60,36 @@ def index(request: HttpRequest) -> HttpResponse:
         if "write" not in table or table["write"] != True:
             return HttpResponseForbidden(f"Write is not enabled on table {table_name}")
 
-        table_type = to_lower_snake_case(url_chunks[3])
+        table_type: str | None = None
+        if len(url_chunks) == 4:
+            table_type = to_lower_snake_case(url_chunks[3])
+            if table_type not in PULL_ORDER:
+                return HttpResponseBadRequest(
+                    f"Table type {table_type} not supported for pulling."
+                )
 
-        try:
-            pull(database_name, table_name, table_type=table_type)
-        except ValueError as e:
-            # @TODO fix ValueError implying both 400 and 500
-            return HttpResponseBadRequest(str(e))
-        except (HTTPError, psycopg.Error, RuntimeError) as e:
-            return HttpResponseServerError(str(e))
+        job, queued = submit_refresh(database_name, table_name, table_type, full=full)
 
-        return HttpResponse()
+        return JsonResponse({"job": job["id"], "queued": queued}, status=202)
 
     return HttpResponseBadRequest("POST requests only.")
+
+
+def job_status(request: HttpRequest, job_id: str) -> HttpResponse:
+    """Reports the progress of a refresh job.
+
+    Args:
+        request (HttpRequest): The request to handle.
+        job_id (str): The job's ID.
+
+    Returns:
+        HttpResponse: The job's state, number of rows fetched and stored, and elapsed time in seconds.
+    """
+    if request.method != "GET":
+        return HttpResponseBadRequest("GET requests only.")
+
+    status = get_job_status(job_id)
+    if status is None:
+        return HttpResponseNotFound(f'Job "{job_id}" was not found.')
+
+    return JsonResponse(status)
@@ -0,0 +1,193 @@
+import logging
+import psycopg
+from psycopg import sql
+from typing import List, TypedDict
+
+from constants import CONN_CONFIG
+from database.schema import get_tables
+
+logger = logging.getLogger("sync")
+
+# sync_status rows that should exist (i.e. one per stored entry) but do not. They are added as not synced yet.
+MISSING_QUERY = """
+    SELECT expected.table_name, count(*)
+    FROM expected_sync_status AS expected
+    WHERE NOT EXISTS (
+        SELECT 1 FROM sync_status
+        WHERE sync_status.database_name = %(database_name)s
+        AND sync_status.table_name = expected.table_name
+        AND sync_status.entry_id = expected.entry_id
+    )
+    GROUP BY expected.table_name;
+"""
+
+INSERT_MISSING_QUERY = """
+    INSERT INTO sync_status (table_name, parent_table_name, table_type, database_name, entry_id)
+    SELECT expected.table_name, expected.parent_table_name, expected.table_type, %(database_name)s, expected.entry_id
+    FROM expected_sync_status AS expected
+    WHERE NOT EXISTS (
+        SELECT 1 FROM sync_status
+        WHERE sync_status.database_name = %(database_name)s
+        AND sync_status.table_name = expected.table_name
+        AND sync_status.entry_id = expected.entry_id
+    );
+"""
+
+# sync_status rows whose entries no longer exist
+ORPHANED_QUERY = """
+    SELECT sync_status.table_name, count(*)
+    FROM sync_status
+    WHERE sync_status.database_name = %(database_name)s
+    AND sync_status.table_name = ANY(%(table_names)s)
+    AND NOT EXISTS (
+        SELECT 1 FROM expected_sync_status AS expected
+        WHERE expected.table_name = sync_status.table_name
+        AND expected.entry_id = sync_status.entry_id
+    )
+    GROUP BY sync_status.table_name;
+"""
+
+DELETE_ORPHANED_QUERY = """
+    DELETE FROM sync_status
+    WHERE sync_status.database_name = %(database_name)s
+    AND sync_status.table_name = ANY(%(table_names)s)
+    AND NOT EXISTS (
+        SELECT 1 FROM expected_sync_status AS expected
+        WHERE expected.table_name = sync_status.table_name
+        AND expected.entry_id = sync_status.entry_id
+    );
+"""
+
+# sync_status rows that exist but record the wrong parent table or table type
+MISFILED_QUERY = """
+    SELECT sync_status.table_name, count(*)
+    FROM sync_status
+    INNER JOIN expected_sync_status AS expected
+    ON expected.table_name = sync_status.table_name AND expected.entry_id = sync_status.entry_id
+    WHERE sync_status.database_name = %(database_name)s
+    AND (sync_status.parent_table_name IS DISTINCT FROM expected.parent_table_name OR sync_status.table_type IS DISTINCT FROM expected.table_type)
+    GROUP BY sync_status.table_name;
+"""
+
+UPDATE_MISFILED_QUERY = """
+    UPDATE sync_status
+    SET parent_table_name = expected.parent_table_name, table_type = expected.table_type
+    FROM expected_sync_status AS expected
+    WHERE sync_status.database_name = %(database_name)s
+    AND expected.table_name = sync_status.table_name
+    AND expected.entry_id = sync_status.entry_id
+    AND (sync_status.parent_table_name IS DISTINCT FROM expected.parent_table_name OR sync_status.table_type IS DISTINCT FROM expected.table_type);
+"""
+
+
+class SyncStatusDiff(TypedDict):
+    table_name: str
+    # entries without a sync_status row
+    missing: int
+    # sync_status rows without an entry
+    orphaned: int
+    # sync_status rows with the wrong parent table name or table type
+    misfiled: int
+
+
+def rebuild_sync_status(
+    database_name: str, apply: bool = False
+) -> List[SyncStatusDiff]:
+    """Compares the sync_status rows of a database with the entries that are actually stored, and optionally fixes them.
+
+    Every entry ID is streamed from the target database into a temporary table in the info database with COPY, and the differences are found (and fixed) with anti-joins. Missing rows are added as not synced yet; orphaned rows are deleted.
+
+    Args:
+        database_name (str): The target database.
+        apply (bool, optional): Whether or not to fix the differences. Defaults to False (i.e. only report them).
+
+    Raises:
+        Psycopg.Error: When reading the entries or updating sync_status fails.
+
+    Returns:
+        List[SyncStatusDiff]: The differences of every table that has any.
+    """
+    tables = get_tables(database_name)
+    diffs: dict[str, SyncStatusDiff] = {}
+
+    with (
+        psycopg.connect(**CONN_CONFIG, dbname=database_name) as data_conn,
+        psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn,
+    ):
+        info_conn.execute("""
+            CREATE TEMPORARY TABLE expected_sync_status (
+                table_name TEXT NOT NULL,
+                parent_table_name TEXT NOT NULL,
+                table_type TEXT NOT NULL,
+                entry_id TEXT NOT NULL
+            ) ON COMMIT DROP;
+            """).close()
+
+        table_names: List[str] = []
+        for table in tables:
+            # tables that have not been created yet have no entries
+            exists = data_conn.execute(
+                "SELECT to_regclass(%s) IS NOT NULL;",
+                (sql.Identifier(table["table_name"]).as_string(data_conn),),
+            ).fetchone()
+            if exists is None or not exists[0]:
+                continue
+            table_names.append(table["table_name"])
+
+            with (
+                data_conn.cursor().copy(
+                    sql.SQL(
+                        "COPY (SELECT {table_name_value}, {parent_table_name}, {table_type}, {id_column}::text FROM {table_name}) TO STDOUT"
+                    ).format(
+                        table_name_value=sql.Literal(table["table_name"]),
+                        parent_table_name=sql.Literal(table["parent_table_name"]),
+                        table_type=sql.Literal(table["table_type"]),
+                        id_column=sql.Identifier(table["id_column_name"]),
+                        table_name=sql.Identifier(table["table_name"]),
+                    )
+                ) as copy_out,
+                info_conn.cursor().copy(
+                    "COPY expected_sync_status FROM STDIN"
+                ) as copy_in,
+            ):
+                for block in copy_out:
+                    copy_in.write(block)
+
+        info_conn.execute(
+            "CREATE INDEX ON expected_sync_status (table_name, entry_id);"
+        ).close()
+        info_conn.execute("ANALYZE expected_sync_status;").close()
+
+        params = {"database_name": database_name, "table_names": table_names}
+        for key, query in (
+            ("missing", MISSING_QUERY),
+            ("orphaned", ORPHANED_QUERY),
+            ("misfiled", MISFILED_QUERY),
+        ):
+            for table_name, count in info_conn.execute(query, params):
+                diff = diffs.setdefault(
+                    table_name,
+                    {
+                        "table_name": table_name,
+                        "missing": 0,
+                        "orphaned": 0,
+                        "misfiled": 0,
+                    },
+                )
+                diff[key] = count
+
+        if apply and diffs:
+            for query in (
+                INSERT_MISSING_QUERY,
+                DELETE_ORPHANED_QUERY,
+                UPDATE_MISFILED_QUERY,
+            ):
+                info_conn.execute(query, params).close()
+            info_conn.commit()
+            logger.info(f"Rebuilt sync_status for {database_name}.")
+        else:
+            info_conn.rollback()
+
+    return [
+        diffs[table["table_name"]] for table in tables if table["table_name"] in diffs
+    ]
@@ -0,0 +1,362 @@
+import logging
+import psycopg
+from psycopg import Connection, sql
+from typing import List, Tuple, TypedDict
+
+from constants import CONN_CONFIG
+from utils import get_env_int
+from database.schema import databases, get_foreign_keys
+from database.info import queue_repull_ranges
+from sync.sync import get_from_master, get_pull_target, pull_repull_ranges
+
+logger = logging.getLogger("sync")
+
+# the number of chunks that each differing range is split into
+RECONCILE_CHUNKS: int = get_env_int("RECONCILE_CHUNKS", 16)
+# ranges with at most this many rows are compared row by row
+RECONCILE_LEAF_SIZE: int = get_env_int("RECONCILE_LEAF_SIZE", 256)
+
+# Digests are computed over the master database's IDs so that both sides hash the same values.
+# row hash = md5(remote ID || jsonb_build_array(digested columns))
+# range digest = md5(concatenated row hashes ordered by remote ID)
+ROW_HASH = sql.SQL(
+    "md5(reconcile_ids.remote_id::text || jsonb_build_array({columns})::text)"
+)
+
+# the rows in chunk i of [lo, hi] are the ones where width_bucket(remote ID, lo, hi + 1, chunks) = i + 1
+RANGE_DIGESTS_QUERY = sql.SQL("""
+    SELECT width_bucket(remote_id::numeric, %(lo)s::numeric, %(hi)s::numeric + 1, %(chunks)s::integer) - 1 AS chunk, count(*), md5(string_agg(row_hash, '' ORDER BY remote_id))
+    FROM (
+        SELECT reconcile_ids.remote_id, {row_hash} AS row_hash
+        FROM {table_name}
+        INNER JOIN reconcile_ids ON {table_name}.id = reconcile_ids.entry_id
+        WHERE reconcile_ids.remote_id BETWEEN %(lo)s AND %(hi)s
+    ) AS hashed
+    GROUP BY chunk;
+""")
+
+ROW_HASHES_QUERY = sql.SQL("""
+    SELECT reconcile_ids.remote_id, {row_hash}, reconcile_ids.status
+    FROM {table_name}
+    INNER JOIN reconcile_ids ON {table_name}.id = reconcile_ids.entry_id
+    WHERE reconcile_ids.remote_id BETWEEN %(lo)s AND %(hi)s;
+""")
+
+
+class ReconcileResult(TypedDict):
+    # the number of ranges whose digests were compared
+    ranges_compared: int
+    # the number of rows that were compared one by one
+    rows_compared: int
+    # the remote IDs of the local rows that differ from (or are missing from) the master database
+    mismatched: List[int]
+    # the remote IDs of the master database's rows that are missing locally
+    missing: List[int]
+    # the number of rows that were pulled again
+    repaired: int
+
+
+def get_digest_columns(
+    database_name: str,
+    parent_table_name: str,
+    table_type: str,
+    descriptor_name: str | None = None,
+) -> List[Tuple[str, sql.Composable]]:
+    """Lists the canonicalised columns that make up a row's digest, sorted by name. Foreign keys are left out because their values differ between the cache and the master database.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        parent_table_name (str): The parent table name, or the table name if the table has no parent.
+        table_type (str): The target table type.
+        descriptor_name (str | None, optional): The target descriptor. Required when table_type is "descriptors". Defaults to None.
+
+    Returns:
+        List[Tuple[str, sql.Composable]]: The column names and the (table-qualified) expressions that canonicalise them.
+    """
+    target = get_pull_target(
+        database_name, parent_table_name, table_type, descriptor_name
+    )
+    excluded_columns = {
+        target["id_column_name"],
+        *get_foreign_keys(database_name, parent_table_name, table_type),
+    }
+
+    table_info = databases[database_name][parent_table_name]
+    schema = {}
+    match (table_type):
+        case "data":
+            schema = table_info["schema"]
+        case "descriptors" if descriptor_name is not None:
+            schema = table_info["descriptors"][descriptor_name]["schema"]
+        case _:
+            pass
+
+    columns: List[Tuple[str, sql.Composable]] = []
+    for column_name in sorted(target["expected_columns"] - excluded_columns):
+        column = sql.Identifier(target["table_name"], column_name)
+        if (
+            column_name in schema
+            and schema[column_name]["datatype"] == "geodetic point"
+        ):
+            columns.append(
+                (column_name, sql.SQL("ST_AsText({column})").format(column=column))
+            )
+        else:
+            columns.append((column_name, column))
+
+    return columns
+
+
+def load_remote_ids(
+    data_conn: Connection, info_conn: Connection, database_name: str, table_name: str
+) -> None:
+    """Copies the table's local to remote ID mapping from the info database into the reconcile_ids temporary table, which is dropped on commit.
+
+    Args:
+        data_conn (psycopg.Connection): Connection to the target database.
+        info_conn (psycopg.Connection): Connection to the info database.
+        database_name (str): The target database name.
+        table_name (str): The target table name.
+    """
+    data_conn.execute("""
+        CREATE TEMPORARY TABLE reconcile_ids (
+            entry_id BIGINT PRIMARY KEY,
+            remote_id BIGINT NOT NULL,
+            status TEXT
+        ) ON COMMIT DROP;
+        """).close()
+
+    with (
+        info_conn.cursor().copy(
+            "COPY (SELECT entry_id::bigint, remote_id::bigint, status FROM sync_status WHERE database_name = %s AND table_name = %s AND remote_id IS NOT NULL) TO STDOUT",
+            (database_name, table_name),
+        ) as copy_out,
+        data_conn.cursor().copy("COPY reconcile_ids FROM STDIN") as copy_in,
+    ):
+        for block in copy_out:
+            copy_in.write(block)
+
+    data_conn.execute("ANALYZE reconcile_ids;").close()
+
+
+def get_chunk_bounds(lo: int, hi: int, chunks: int, chunk: int) -> Tuple[int, int]:
+    """Finds the inclusive ID range of a chunk, matching width_bucket.
+
+    Args:
+        lo (int): The smallest ID of the range.
+        hi (int): The largest ID of the range.
+        chunks (int): The number of chunks that the range is split into.
+        chunk (int): The zero-based chunk number.
+
+    Returns:
+        Tuple[int, int]: The smallest and largest IDs in the chunk.
+    """
+    span = hi + 1 - lo
+    return (
+        lo + -(-chunk * span // chunks),
+        lo + -(-(chunk + 1) * span // chunks) - 1,
+    )
+
+
+def reconcile(
+    database_name: str,
+    parent_table_name: str,
+    table_type: str = "data",
+    descriptor_name: str | None = None,
+    chunks: int = RECONCILE_CHUNKS,
+    leaf_size: int = RECONCILE_LEAF_SIZE,
+    repair: bool = False,
+) -> ReconcileResult:
+    """Compares a table with the master database using range digests, descending only into the ranges that differ.
+
+    The master database's digest endpoint ([pull endpoint]/digest) is expected to answer:
+    ?columns=[a,b,...] with {"min": [smallest ID], "max": [largest ID], "count": [row count]},
+    ?columns=[...]&lo=[ID]&hi=[ID]&chunks=[n] with {"ranges": [{"chunk": [chunk number], "count": [row count], "digest": [range digest]}, ...]}, leaving out empty chunks,
+    ?columns=[...]&lo=[ID]&hi=[ID]&rows=true with {"rows": [[ID, row hash], ...]}.
+
+    Local rows that differ from the master database are marked as "mismatch", which the sync pass never pushes. The ranges that differ are queued to be pulled again: the next pull of the table (or repair) overwrites the mismatched rows with the master database's version, which marks them as synced again, and pulls the missing rows. Rows that have local changes waiting to be synced are left alone: they do not queue their range, and pulls skip them (see database.db.store_entries). Rows that the master database no longer has stay mismatched.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        parent_table_name (str): The parent table name, or the table name if the table has no parent.
+        table_type (str, optional): The target table type. Aliases are not supported because they are always pulled in full. Defaults to "data".
+        descriptor_name (str | None, optional): The target descriptor. Required when table_type is "descriptors". Defaults to None.
+        chunks (int, optional): The number of chunks to split each differing range into. Defaults to the RECONCILE_CHUNKS environment variable or 16.
+        leaf_size (int, optional): Ranges with at most this many rows are compared row by row. Defaults to the RECONCILE_LEAF_SIZE environment variable or 256.
+        repair (bool, optional): Whether or not to pull the differing ranges again now rather than on the next pull. Defaults to False.
+
+    Raises:
+        HTTPError: When the master database cannot be contacted.
+        ValueError: When the table type is not supported.
+        Psycopg.Error: When computing the local digests fails.
+        RuntimeError: When the data the master database returned is invalid.
+
+    Returns:
+        ReconcileResult: The number of ranges and rows compared and the IDs of the rows that differ.
+    """
+    if table_type == "tag_aliases":
+        raise ValueError("Aliases are always pulled in full and cannot be reconciled.")
+
+    target = get_pull_target(
+        database_name, parent_table_name, table_type, descriptor_name
+    )
+    table_name = target["table_name"]
+    digest_endpoint = f"{target["endpoint"]}/digest"
+    digest_columns = get_digest_columns(
+        database_name, parent_table_name, table_type, descriptor_name
+    )
+    row_hash = ROW_HASH.format(
+        columns=sql.SQL(", ").join([column for _, column in digest_columns])
+    )
+    column_names = ",".join([column_name for column_name, _ in digest_columns])
+
+    result: ReconcileResult = {
+        "ranges_compared": 0,
+        "rows_compared": 0,
+        "mismatched": [],
+        "missing": [],
+        "repaired": 0,
+    }
+    differing_ranges: List[Tuple[int, int]] = []
+
+    with (
+        psycopg.connect(**CONN_CONFIG, dbname=database_name) as data_conn,
+        psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn,
+    ):
+        load_remote_ids(data_conn, info_conn, database_name, table_name)
+
+        master_bounds = get_from_master(digest_endpoint, {"columns": column_names})
+        if not isinstance(master_bounds, dict) or "count" not in master_bounds:
+            raise RuntimeError("Invalid digest received.")
+        local_min, local_max, local_count = data_conn.execute(
+            sql.SQL(
+                "SELECT min(remote_id), max(remote_id), count(*) FROM {table_name} INNER JOIN reconcile_ids ON {table_name}.id = reconcile_ids.entry_id;"
+            ).format(table_name=sql.Identifier(table_name))
+        ).fetchone() or (None, None, 0)
+
+        bounds = [
+            bound
+            for bound in (
+                local_min,
+                local_max,
+                master_bounds.get("min"),
+                master_bounds.get("max"),
+            )
+            if bound is not None
+        ]
+        if not bounds:
+            return result
+
+        ranges: List[Tuple[int, int, int]] = [
+            (
+                min(map(int, bounds)),
+                max(map(int, bounds)),
+                max(local_count, int(master_bounds["count"])),
+            )
+        ]
+        while ranges:
+            lo, hi, count = ranges.pop()
+
+            # small ranges are compared row by row
+            if count <= leaf_size or lo == hi:
+                local_rows: dict[int, Tuple[str, str | None]] = {
+                    remote_id: (row_hash_value, status)
+                    for remote_id, row_hash_value, status in data_conn.execute(
+                        ROW_HASHES_QUERY.format(
+                            row_hash=row_hash, table_name=sql.Identifier(table_name)
+                        ),
+                        {"lo": lo, "hi": hi},
+                    )
+                }
+                master_rows = get_from_master(
+                    digest_endpoint,
+                    {"columns": column_names, "lo": lo, "hi": hi, "rows": "true"},
+                )
+                if not isinstance(master_rows, dict) or "rows" not in master_rows:
+                    raise RuntimeError("Invalid digest received.")
+                master_hashes: dict[int, str] = {
+                    int(remote_id): row_hash_value
+                    for remote_id, row_hash_value in master_rows["rows"]
+                }
+
+                result["rows_compared"] += len(local_rows.keys() | master_hashes.keys())
+                differs = False
+                for remote_id, (row_hash_value, status) in local_rows.items():
+                    # local changes are expected to differ until they are synced, and pulling their range again would overwrite them
+                    if (
+                        master_hashes.get(remote_id) == row_hash_value
+                        or status != "updated"
+                    ):
+                        continue
+                    differs = True
+                    result["mismatched"].append(remote_id)
+                for remote_id in master_hashes.keys() - local_rows.keys():
+                    differs = True
+                    result["missing"].append(remote_id)
+
+                if differs:
+                    differing_ranges.append((lo, hi))
+                continue
+
+            local_digests: dict[int, Tuple[int, str]] = {
+                chunk: (chunk_count, digest)
+                for chunk, chunk_count, digest in data_conn.execute(
+                    RANGE_DIGESTS_QUERY.format(
+                        row_hash=row_hash, table_name=sql.Identifier(table_name)
+                    ),
+                    {"lo": lo, "hi": hi, "chunks": chunks},
+                )
+            }
+            master_digests = get_from_master(
+                digest_endpoint,
+                {"columns": column_names, "lo": lo, "hi": hi, "chunks": chunks},
+            )
+            if not isinstance(master_digests, dict) or "ranges" not in master_digests:
+                raise RuntimeError("Invalid digest received.")
+            master_digests_by_chunk: dict[int, Tuple[int, str]] = {
+                int(chunk_digest["chunk"]): (
+                    int(chunk_digest["count"]),
+                    chunk_digest["digest"],
+                )
+                for chunk_digest in master_digests["ranges"]
+            }
+
+            result["ranges_compared"] += 1
+            for chunk in local_digests.keys() | master_digests_by_chunk.keys():
+                if local_digests.get(chunk) == master_digests_by_chunk.get(chunk):
+                    continue
+                ranges.append(
+                    (
+                        *get_chunk_bounds(lo, hi, chunks, chunk),
+                        max(
+                            local_digests.get(chunk, (0, ""))[0],
+                            master_digests_by_chunk.get(chunk, (0, ""))[0],
+                        ),
+                    )
+                )
+
+        if result["mismatched"]:
+            info_conn.execute(
+                "UPDATE sync_status SET status = 'mismatch' WHERE database_name = %s AND table_name = %s AND remote_id = ANY(%s);",
+                (database_name, table_name, [str(id) for id in result["mismatched"]]),
+            ).close()
+        # the next pull of the table pulls the differing ranges again
+        queue_repull_ranges(
+            info_conn, database_name, table_name, table_type, differing_ranges
+        )
+        info_conn.commit()
+        data_conn.commit()
+
+    logger.info(
+        f"Reconciled {database_name}/{table_name}: {len(result["mismatched"])} mismatched and {len(result["missing"])} missing rows."
+    )
+
+    if repair:
+        result["repaired"] = pull_repull_ranges(
+            database_name,
+            parent_table_name,
+            table_type=table_type,
+            descriptor_name=descriptor_name,
+        )
+
+    return result
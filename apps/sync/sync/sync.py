@@ -1,7 +1,13 @@
 # @TODO fix multithreading database transaction issues >:(
 import logging
 import threading
-from django.http import HttpRequest, HttpResponse
+from contextlib import contextmanager
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+)
 import requests
 from requests import Response, HTTPError
 import datetime
@@ -10,19 +16,50 @@ from constants import CONN_CONFIG
 import psycopg
 from psycopg.rows import dict_row
 from psycopg import sql
-from typing import List, Literal, Any, Tuple, cast
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Any,
+    Tuple,
+    TypedDict,
+    cast,
+)
 
-from database.schema import databases
+from utils import to_lower_snake_case, get_env_int
+from database.schema import databases, get_foreign_keys
+from database.info import (
+    get_repull_ranges,
+    get_watermark,
+    remove_repull_ranges,
+    set_watermark,
+)
 from database.db import (
     update_foreign_key,
-    store_entry,
-    construct_select_all_query,
+    get_column_names,
+    get_local_ids,
+    store_entries,
 )
+from database.queries import get_statement
 
 logger = logging.getLogger("sync")
 
 sql_receptionist_token: str | None = None
 
+# how long (in milliseconds) a write-through insert waits for its entry to reach the master database
+WRITE_THROUGH_TIMEOUT: int = get_env_int("WRITE_THROUGH_TIMEOUT", 1500)
+
+SYNCABLE_TABLE_TYPES = {
+    "data",
+    "descriptors",
+    "tags",
+    "tag_names",
+    "tag_aliases",
+    "tag_groups",
+}
+
 
 def auto_sync(sync_event: threading.Event) -> None:
     # automatic sync interval in minutes
@@ -64,9 +101,6 @@ def prepare_payload(
     remote_id: str | None = None,
 ) -> Tuple[str, dict[str, Any]] | None:
     id_column_name: str = "id"
-    tagging: bool = False
-    if table_type == "data" and table_name == parent_table_name:
-        tagging = databases[database_name][parent_table_name].get("tagging", False)
     # update the ID column information
     match (table_type):
         case "tag_aliases":
@@ -74,49 +108,9 @@ def prepare_payload(
         case _:
             pass
 
-    # find the correct endpoint to POST to & construct the relevant select query
+    # find the correct endpoint to POST to
     endpoint: str = ""
-    select_query: sql.Composed
-    id_column = sql.SQL("{table_name}.{id_column_name}").format(
-        table_name=sql.Identifier(table_name),
-        id_column_name=sql.Identifier(id_column_name),
-    )
     match (table_type):
-        case "data":
-            values: List[sql.Composable] = []
-            conditions: List[sql.Composable] = []
-            # add ID column to the SELECT query. There is no need to account for the edge case where the ID column is a part of the schema.
-            values.append(id_column)
-
-            if tagging:
-                conditions.append(
-                    sql.SQL(
-                        "INNER JOIN sync_status ON sync_status.database_name={database_name} AND sync_status.table_name={tagging_table_name} AND {primary_tag_column}=sync_status.entry_id::integer "
-                    ).format(
-                        database_name=sql.Literal(database_name),
-                        tagging_table_name=sql.Literal(f"{table_name}_tag_names"),
-                        primary_tag_column=sql.SQL("{table_name}.primary_tag").format(
-                            table_name=sql.Identifier(parent_table_name),
-                        ),
-                        id_column_name=sql.Identifier(id_column_name),
-                    )
-                )
-                values.append(sql.SQL("sync_status.remote_id::integer AS primary_tag"))
-                tagging = False
-
-            conditions.append(
-                sql.SQL("WHERE {id_column_name}=%s").format(id_column_name=id_column)
-            )
-
-            endpoint = f"{environ["DATABASE_URL"]}/{database_name}/{parent_table_name}/{table_type}"
-            select_query = construct_select_all_query(
-                table_name,
-                databases[database_name][table_name]["schema"],
-                values=values,
-                conditions=sql.Composed(conditions),
-                tagging=tagging,
-            )
-            # LEFT JOIN sync_status ON entry_id = this.primary_tag
         case "descriptors":
             descriptor_name = table_name.removeprefix(
                 f"{parent_table_name}_"
@@ -126,24 +120,11 @@ def prepare_payload(
                 raise RuntimeError(
                     f"Descriptors unexpectedly not in {database_name}/{table_name}."
                 )
-            descriptor_schema = table_schema["descriptors"][descriptor_name]
             endpoint = f"{environ["DATABASE_URL"]}/{database_name}/{parent_table_name}/{table_type}/{descriptor_name}"
-            select_query = construct_select_all_query(
-                table_name,
-                descriptor_schema["schema"],
-                conditions=sql.SQL("WHERE {id_column_name}=%s").format(
-                    id_column_name=id_column
-                ),
-            )
         case _:
             # @TODO test if tag_names works.
             endpoint = f"{environ["DATABASE_URL"]}/{database_name}/{parent_table_name}/{table_type}"
-            select_query = sql.SQL(
-                "SELECT * FROM {table_name} WHERE {id_column_name}=%s"
-            ).format(
-                table_name=sql.Identifier(table_name),
-                id_column_name=id_column,
-            )
+    select_query = get_statement(database_name, table_name, "extract")
 
     # get the information relating to the target
     target_record_conn = psycopg.connect(
@@ -184,284 +165,945 @@ def prepare_payload(
     return (endpoint, payload)
 
 
-def sync() -> None:
-    with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
-        # select all targets that need syncing (failed, not synced yet (NULL)) (do not select mismatch for now)
-        targets_cur = info_conn.execute(
-            "SELECT id, table_name, parent_table_name, table_type, database_name, entry_id, remote_id FROM sync_status WHERE status IS NULL OR status NOT IN ('updated', 'anomalous');"
-        )
+SYNC_TARGET_QUERY = sql.SQL("""
+    SELECT id, table_name, parent_table_name, table_type, database_name, entry_id, remote_id
+    FROM sync_status
+    WHERE (status IS NULL OR status NOT IN ('updated', 'anomalous', 'mismatch')) {conditions}
+    ORDER BY CASE table_type WHEN 'tag_names' THEN 0 WHEN 'data' THEN 1 ELSE 2 END, id;
+""")
 
-        num_successes = 0
-        num_failures = 0
-        for target in targets_cur.fetchall():
-            sync_status_id = target[0]
-            table_name: str = target[1]
-            parent_table_name: str = target[2]
-            table_type: str = target[3]
-            database_name: str = target[4]
-            target_id: str = target[5]
-
-            # @TODO check if the target already exists
-
-            status: None | Literal["modified", "updated", "failed", "anomalous"] = None
-            endpoint = None
-            payload = None
-            remote_id: int | str | None = target[6]
-
-            data = prepare_payload(
-                target_id,
-                database_name,
-                table_name,
-                parent_table_name,
-                table_type,
-                remote_id=target[6],
+# parents must reach the master database before the entries that reference them
+TABLE_TYPE_SYNC_ORDER: dict[str, int] = {"tag_names": 0, "data": 1}
+
+
+class SyncScope(TypedDict, total=False):
+    database_name: str
+    parent_table_name: str
+    table_name: str
+    table_type: str
+    entry_ids: List[str]
+
+
+def find_sync_targets(
+    info_conn: psycopg.Connection, scope: SyncScope | None = None
+) -> List[Tuple[Any, ...]]:
+    """Finds the sync_status rows that need syncing (failed, not synced yet (NULL)).
+
+    Scoped targets are followed by the unsynced foreign key prerequisites (e.g. the tag names of a tagged entry) of the selected entries.
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        scope (SyncScope | None, optional): Restricts the targets to a database, table, table type and/or a set of entries. Entries require their database, and either their table name or their parent table name and table type (other than descriptors, which have a table per descriptor). Defaults to None (i.e. every target).
+
+    Raises:
+        ValueError: When entries are selected without the table that they belong to.
+
+    Returns:
+        List[Tuple[Any, ...]]: The sync_status rows to sync, in dependency order.
+    """
+    if not scope:
+        with info_conn.execute(SYNC_TARGET_QUERY.format(conditions=sql.SQL(""))) as cur:
+            return cur.fetchall()
+
+    # entry IDs are local to a table, so the same ID would select unrelated entries from other tables
+    if "entry_ids" in scope and (
+        "database_name" not in scope
+        or (
+            "table_name" not in scope
+            and (
+                "parent_table_name" not in scope
+                or scope.get("table_type") in (None, "descriptors")
+            )
+        )
+    ):
+        raise ValueError("Entry IDs require the table that they belong to.")
+
+    conditions: List[sql.Composable] = []
+    params: List[Any] = []
+    for column_name in (
+        "database_name",
+        "parent_table_name",
+        "table_name",
+        "table_type",
+    ):
+        if column_name in scope:
+            conditions.append(
+                sql.SQL("AND {column_name} = %s").format(
+                    column_name=sql.Identifier(column_name)
+                )
             )
+            params.append(scope[column_name])
+    if "entry_ids" in scope:
+        conditions.append(sql.SQL("AND entry_id = ANY(%s)"))
+        params.append([str(entry_id) for entry_id in scope["entry_ids"]])
+
+    with info_conn.execute(
+        SYNC_TARGET_QUERY.format(conditions=sql.SQL(" ").join(conditions)), params
+    ) as cur:
+        targets: List[Tuple[Any, ...]] = cur.fetchall()
+
+    # pull in the prerequisites of the prerequisites until there are no new targets
+    seen: set[Any] = {target[0] for target in targets}
+    frontier = targets
+    while frontier:
+        frontier = [
+            target
+            for target in find_sync_prerequisites(info_conn, frontier)
+            if target[0] not in seen
+        ]
+        seen.update(target[0] for target in frontier)
+        targets.extend(frontier)
+
+    return sorted(targets, key=lambda target: TABLE_TYPE_SYNC_ORDER.get(target[3], 2))
+
+
+def find_sync_prerequisites(
+    info_conn: psycopg.Connection, targets: List[Tuple[Any, ...]]
+) -> List[Tuple[Any, ...]]:
+    """Finds the unsynced entries that the given targets reference through their foreign keys.
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        targets (List[Tuple[Any, ...]]): The sync_status rows whose foreign keys should be followed.
 
-            if data is None:
-                logger.warning(
-                    f"Could not find a related entry for {database_name}/{table_name}/{target_id}."
+    Returns:
+        List[Tuple[Any, ...]]: The sync_status rows of the referenced entries that still need syncing.
+    """
+    # group the targets by table so that each table is only queried once
+    entry_ids: dict[Tuple[str, str, str, str], List[str]] = {}
+    for target in targets:
+        entry_ids.setdefault((target[4], target[1], target[2], target[3]), []).append(
+            target[5]
+        )
+
+    references: dict[Tuple[str, str], set[str]] = {}
+    for (
+        database_name,
+        table_name,
+        parent_table_name,
+        table_type,
+    ), ids in entry_ids.items():
+        if (
+            database_name not in databases
+            or parent_table_name not in databases[database_name]
+        ):
+            continue
+        foreign_keys = get_foreign_keys(database_name, parent_table_name, table_type)
+        if not foreign_keys:
+            continue
+
+        # the IDs are bound with the ID column's type, so that its primary key index can be used
+        id_column_name = "alias" if table_type == "tag_aliases" else "id"
+        typed_ids: List[Any] = (
+            ids if table_type == "tag_aliases" else [int(id) for id in ids]
+        )
+        with psycopg.connect(**CONN_CONFIG, dbname=database_name) as data_conn:
+            with data_conn.execute(
+                sql.SQL(
+                    "SELECT {columns} FROM {table_name} WHERE {id_column} = ANY(%s);"
+                ).format(
+                    columns=sql.SQL(", ").join(map(sql.Identifier, foreign_keys)),
+                    table_name=sql.Identifier(table_name),
+                    id_column=sql.Identifier(id_column_name),
+                ),
+                (typed_ids,),
+            ) as cur:
+                for row in cur:
+                    for referenced_table_name, value in zip(foreign_keys.values(), row):
+                        if value is not None:
+                            references.setdefault(
+                                (database_name, referenced_table_name), set()
+                            ).add(str(value))
+
+    prerequisites: List[Tuple[Any, ...]] = []
+    for (database_name, referenced_table_name), ids in references.items():
+        with info_conn.execute(
+            SYNC_TARGET_QUERY.format(
+                conditions=sql.SQL(
+                    "AND database_name = %s AND table_name = %s AND entry_id = ANY(%s)"
                 )
-                status = "failed"
-            else:
-                endpoint, payload = data
-                response = None
-
-                global sql_receptionist_token  # suppress intellisense "potentially unbound variable"
-                # correct the foreign key to the master database's key ids. If those key IDs are not yet available, abort.
-                try:
-                    # @TODO move logic to JOIN queries
-                    match (table_type):
-                        case "tag_aliases":
-                            update_foreign_key(
-                                payload,
-                                database_name,
-                                f"{parent_table_name}_tag_names",
-                                "tag_id",
-                                target_type=int,
-                            )
-                        case "tag_groups":
-                            update_foreign_key(
-                                payload,
-                                database_name,
-                                f"{parent_table_name}_tag_names",
-                                "tag_id",
-                                target_type=int,
-                            )
-                        case "tags":
-                            update_foreign_key(
-                                payload,
-                                database_name,
-                                f"{parent_table_name}_tag_names",
-                                "tag_id",
-                                target_type=int,
-                            )
-                            update_foreign_key(
-                                payload,
-                                database_name,
-                                parent_table_name,
-                                "entry_id",
-                                target_type=int,
-                            )
-                        case _:
-                            pass
-
-                    # lazily load credentials. Remember that syncing doesn't need to happen in one shot, so there does not need to be re-try logic.
-                    if sql_receptionist_token is None:
-                        with open("/run/secrets/admin", "r") as f:
-                            auth_response = requests.post(
-                                f"{environ["DATABASE_URL"]}/auth",
-                                timeout=5,
-                                headers={"Origin": environ["CACHE_URL"]},
-                                json={"username": "admin", "password": f.read()},
-                            )
+            ),
+            (database_name, referenced_table_name, list(ids)),
+        ) as cur:
+            prerequisites.extend(cur.fetchall())
+
+    return prerequisites
 
-                            auth_response.raise_for_status()
 
-                            sql_receptionist_token = auth_response.cookies["session"]
+def sync_target(
+    info_conn: psycopg.Connection, target: Tuple[Any, ...]
+) -> Literal["modified", "updated", "failed", "anomalous"] | None:
+    """Uploads one entry to the master database and records the outcome in sync_status.
 
-                    response = requests.post(
-                        endpoint,
+    The sync_status row is locked while the entry is uploaded so that concurrent sync passes (e.g. a scoped sync and the automatic sync) never upload the same entry twice.
+
+    Args:
+        info_conn (psycopg.Connection): Connection to the info database.
+        target (Tuple[Any, ...]): The sync_status row to sync.
+
+    Returns:
+        Literal["modified", "updated", "failed", "anomalous"] | None: The new status of the entry, or None if another sync pass has already claimed or synced it.
+    """
+    sync_status_id = target[0]
+    table_name: str = target[1]
+    parent_table_name: str = target[2]
+    table_type: str = target[3]
+    database_name: str = target[4]
+    target_id: str = target[5]
+
+    # claim the target. Re-read the status because another pass may have synced it since it was selected.
+    claim = info_conn.execute(
+        "SELECT status, remote_id FROM sync_status WHERE id=%s FOR UPDATE SKIP LOCKED;",
+        (sync_status_id,),
+    ).fetchone()
+    # mismatched rows are pulled again rather than pushed (see sync.reconcile)
+    if claim is None or claim[0] in ("updated", "anomalous", "mismatch"):
+        info_conn.rollback()
+        return None
+
+    # @TODO check if the target already exists
+
+    status: None | Literal["modified", "updated", "failed", "anomalous"] = None
+    endpoint = None
+    payload = None
+    remote_id: int | str | None = claim[1]
+
+    data = prepare_payload(
+        target_id,
+        database_name,
+        table_name,
+        parent_table_name,
+        table_type,
+        remote_id=claim[1],
+    )
+
+    if data is None:
+        logger.warning(
+            f"Could not find a related entry for {database_name}/{table_name}/{target_id}."
+        )
+        status = "failed"
+    else:
+        endpoint, payload = data
+        response = None
+
+        global sql_receptionist_token  # suppress intellisense "potentially unbound variable"
+        # correct the foreign key to the master database's key ids. If those key IDs are not yet available, abort.
+        try:
+            # @TODO move logic to JOIN queries
+            # the primary tag of data entries is already corrected by prepare_payload
+            if table_type != "data":
+                for column_name, referenced_table_name in get_foreign_keys(
+                    database_name, parent_table_name, table_type
+                ).items():
+                    update_foreign_key(
+                        payload,
+                        database_name,
+                        referenced_table_name,
+                        column_name,
+                        target_type=int,
+                    )
+
+            # lazily load credentials. Remember that syncing doesn't need to happen in one shot, so there does not need to be re-try logic.
+            if sql_receptionist_token is None:
+                with open("/run/secrets/admin", "r") as f:
+                    auth_response = requests.post(
+                        f"{environ["DATABASE_URL"]}/auth",
                         timeout=5,
                         headers={"Origin": environ["CACHE_URL"]},
-                        cookies={"session": sql_receptionist_token},
-                        json=payload,
+                        json={"username": "admin", "password": f.read()},
                     )
-                    response.raise_for_status()
 
-                    remote_id = response.text
+                    auth_response.raise_for_status()
 
-                    if not remote_id:
-                        raise ValueError("remote_id is not valid.")
-                    status = "updated"
-                except RuntimeError as e:
-                    logger.warning(
-                        f"Sync failed: {e} . Reason: {"None" if response is None else response.text}",
-                        exc_info=False,
-                    )
-                    status = "failed"
-                except (requests.HTTPError, requests.exceptions.RequestException) as e:
-                    logger.debug(
-                        f"Sync failed: {e} . Reason: {"None" if response is None else response.text}",
-                        exc_info=False,
-                    )
+                    sql_receptionist_token = auth_response.cookies["session"]
 
-                    if response is not None and response.status_code == 401:
-                        sql_receptionist_token = None
-                    status = "failed"
-                except ValueError as e:
-                    logger.critical(
-                        f"Sync failed due to anomalous entry: {e}", exc_info=True
-                    )
-                    status = "anomalous"
-                else:
-                    status = "updated"
+            response = requests.post(
+                endpoint,
+                timeout=5,
+                headers={"Origin": environ["CACHE_URL"]},
+                cookies={"session": sql_receptionist_token},
+                json=payload,
+            )
+            response.raise_for_status()
+
+            remote_id = response.text
+
+            if not remote_id:
+                raise ValueError("remote_id is not valid.")
+            status = "updated"
+        except RuntimeError as e:
+            logger.warning(
+                f"Sync failed: {e} . Reason: {"None" if response is None else response.text}",
+                exc_info=False,
+            )
+            status = "failed"
+        except (requests.HTTPError, requests.exceptions.RequestException) as e:
+            logger.debug(
+                f"Sync failed: {e} . Reason: {"None" if response is None else response.text}",
+                exc_info=False,
+            )
+
+            if response is not None and response.status_code == 401:
+                sql_receptionist_token = None
+            status = "failed"
+        except ValueError as e:
+            logger.critical(f"Sync failed due to anomalous entry: {e}", exc_info=True)
+            status = "anomalous"
+        else:
+            status = "updated"
+
+    info_conn.execute(
+        """
+        UPDATE sync_status
+        SET status=%s, sync_timestamp=%s, remote_id=%s
+        WHERE "id"=%s;
+        """,
+        (
+            status,
+            datetime.datetime.now().isoformat(),
+            remote_id,
+            sync_status_id,
+        ),
+    ).close()
+    # release the claim right away so that other passes can see the remote id
+    info_conn.commit()
+
+    return status
+
+
+def sync(scope: SyncScope | None = None) -> Tuple[int, int]:
+    """Uploads the entries that have not been synced yet to the master database.
+
+    Args:
+        scope (SyncScope | None, optional): Restricts the sync to a database, table, table type and/or a set of entries (and their prerequisites). Defaults to None (i.e. sync everything).
+
+    Returns:
+        Tuple[int, int]: The number of entries that were successfully synced and the number of entries that failed to sync.
+    """
+    with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+        targets = find_sync_targets(info_conn, scope)
+        info_conn.commit()
 
-            match (status):
+        num_successes = 0
+        num_failures = 0
+        for target in targets:
+            match (sync_target(info_conn, target)):
                 case "updated":
                     num_successes += 1
+                case None:
+                    pass
                 case _:
                     num_failures += 1
-            info_conn.execute(
-                """
-                UPDATE sync_status
-                SET status=%s, sync_timestamp=%s, remote_id=%s
-                WHERE "id"=%s;
-                """,
-                (
-                    status,
-                    datetime.datetime.now().isoformat(),
-                    remote_id,
-                    sync_status_id,
-                ),
-            ).close()
-        targets_cur.close()
 
         logger.info(
-            f"Successfully synced {num_successes} entries and failed to sync {num_failures} entries."
+            f"Successfully synced {num_successes} entries and failed to sync {num_failures} entries{"" if scope is None else f" (scope: {scope})"}."
+        )
+
+        return (num_successes, num_failures)
+
+
+# the columns that the master database returns for each tag table type. The columns of data and descriptors depend on their schemas.
+PULL_COLUMNS: dict[str, set[str]] = {
+    "tags": {"id", "entry_id", "tag_id"},
+    "tag_names": {"id", "tag_name"},
+    "tag_aliases": {"alias", "tag_id"},
+    "tag_groups": {"id", "tag_id", "group_name"},
+}
+
+# referenced tables must be pulled before the tables that reference them
+PULL_ORDER: List[str] = [
+    "tag_names",
+    "data",
+    "tags",
+    "tag_aliases",
+    "tag_groups",
+    "descriptors",
+]
+
+# the maximum number of rows to request from the master database at once
+PULL_PAGE_SIZE: int = get_env_int("PULL_PAGE_SIZE", 1000)
+
+
+def get_from_master(endpoint: str, params: dict[str, Any]) -> Any:
+    """Sends an authenticated GET request to the master database.
+
+    Args:
+        endpoint (str): The endpoint to GET from.
+        params (dict[str, Any]): The query parameters.
+
+    Raises:
+        HTTPError: When the master database cannot be contacted.
+
+    Returns:
+        Any: The decoded JSON response.
+    """
+    with open("/run/secrets/admin", "r") as f:
+        password = f.read()
+
+    response: Response = requests.get(
+        endpoint,
+        params=params,
+        timeout=5,
+        headers={"Origin": environ["CACHE_URL"]},
+        cookies={"username": "admin", "password": password},
+    )
+    response.raise_for_status()
+
+    return response.json()
+
+
+def has_moved_past(last_id: Any, after: Any) -> bool:
+    """Checks if a page that was requested after a cursor ends after it. Watermarks are stored as text, so integer IDs are compared with them as integers.
+
+    Args:
+        last_id (Any): The ID of the page's last row.
+        after (Any): The cursor that the page was requested with.
+
+    Returns:
+        bool: Whether or not the page ends after the cursor.
+    """
+    if isinstance(last_id, int) and str(after).lstrip("-").isdigit():
+        return last_id > int(after)
+    return str(last_id) != str(after)
+
+
+def fetch_pages(
+    endpoint: str,
+    id_column_name: str,
+    page_size: int = PULL_PAGE_SIZE,
+    after: Any = None,
+) -> Iterator[Tuple[List[str], List[Any]]]:
+    """Fetches a table from the master database one page at a time, ordered by the ID column.
+
+    Each page is requested with a keyset cursor (?limit=[page size]&after=[last ID of the previous page]), so only one page is held in memory at a time.
+
+    Args:
+        endpoint (str): The endpoint to GET from.
+        id_column_name (str): The name of the ID column (PRIMARY KEY) to paginate on.
+        page_size (int, optional): The maximum number of rows per page. Defaults to the PULL_PAGE_SIZE environment variable or 1000.
+        after (Any, optional): Only fetch the rows after this ID (e.g. a watermark). Defaults to None (i.e. fetch every row).
+
+    Raises:
+        HTTPError: When the master database cannot be contacted.
+        RuntimeError: When the data the master database returned is invalid.
+
+    Yields:
+        Iterator[Tuple[List[str], List[Any]]]: The column names and the rows of each page.
+    """
+    while True:
+        params: dict[str, Any] = {"limit": page_size}
+        if after is not None:
+            params["after"] = after
+
+        data = get_from_master(endpoint, params)
+        if (
+            data is None
+            or "data" not in data
+            or not isinstance(data["data"], list)
+            or "columns" not in data
+            or not isinstance(data["columns"], list)
+        ):
+            raise RuntimeError("Invalid data received.")
+
+        columns = cast(List[str], data["columns"])
+        rows = cast(List[Any], data["data"])
+        if id_column_name not in columns:
+            raise RuntimeError("Malformed column names.")
+
+        last_id: Any = None
+        if rows:
+            last_row = rows[-1]
+            if not isinstance(last_row, list):
+                raise RuntimeError("Malformed row type.")
+            last_id = cast(List[Any], last_row)[columns.index(id_column_name)]
+
+        # a master database that ignores the cursor returns the same rows again, which would never end
+        if rows and after is not None and not has_moved_past(last_id, after):
+            logger.warning(
+                f"{endpoint} did not move past {after}. Stopped fetching pages."
+            )
+            return
+
+        yield columns, rows
+
+        # a short page is the last page. A page that is too long means that the master database does not paginate.
+        if len(rows) != page_size:
+            return
+        after = last_id
+
+
+class PullTarget(TypedDict):
+    # the endpoint to GET from
+    endpoint: str
+    table_name: str
+    id_column_name: str
+    # the columns that the master database may return
+    expected_columns: set[str]
+    # whether or not the master database must return every expected column. Data and descriptors may leave out optional columns.
+    exact_columns: bool
+
+
+def get_pull_target(
+    database_name: str,
+    parent_table_name: str,
+    table_type: str,
+    descriptor_name: str | None = None,
+) -> PullTarget:
+    """Finds where to pull a table from and which columns to expect.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        parent_table_name (str): The parent table name, or the table name if the table has no parent.
+        table_type (str): The target table type.
+        descriptor_name (str | None, optional): The target descriptor. Required when table_type is "descriptors". Defaults to None.
+
+    Raises:
+        ValueError: When table_type or descriptor_name is invalid.
+
+    Returns:
+        PullTarget: The target's endpoint, table name, ID column name and expected columns.
+    """
+    if table_type not in PULL_ORDER:
+        raise ValueError(f"Table type {table_type} not supported for pulling.")
+
+    table_info = databases[database_name][parent_table_name]
+
+    endpoint: str = ""
+    table_name: str = f"{parent_table_name}_{table_type}"
+    expected_columns: set[str] = set()
+    exact_columns: bool = True
+    match (table_type):
+        case "data":
+            endpoint = f"{environ["DATABASE_URL"]}/{database_name}/{parent_table_name}"
+            table_name = parent_table_name
+            expected_columns = {
+                "id",
+                *get_column_names(
+                    table_info["schema"], tagging=table_info.get("tagging", False)
+                ),
+            }
+            exact_columns = False
+        case "descriptors":
+            if descriptor_name is None or descriptor_name not in table_info.get(
+                "descriptors", {}
+            ):
+                raise ValueError(
+                    f"Descriptor {descriptor_name} not found in table {parent_table_name}."
+                )
+            endpoint = f"{environ["DATABASE_URL"]}/{database_name}/{parent_table_name}/{table_type}/{descriptor_name}"
+            table_name = f"{parent_table_name}_{descriptor_name}_descriptors"
+            expected_columns = {
+                "id",
+                *get_column_names(table_info["descriptors"][descriptor_name]["schema"]),
+            }
+            exact_columns = False
+        case _:
+            endpoint = f"{environ["DATABASE_URL"]}/{database_name}/{parent_table_name}/{table_type}"
+            expected_columns = PULL_COLUMNS[table_type]
+
+    return {
+        "endpoint": endpoint,
+        "table_name": table_name,
+        "id_column_name": "alias" if table_type == "tag_aliases" else "id",
+        "expected_columns": expected_columns,
+        "exact_columns": exact_columns,
+    }
+
+
+# the pull slots that the current thread holds (see hold_pull_slot)
+held_pull_slots = threading.local()
+
+
+@contextmanager
+def hold_pull_slot(
+    database_name: str, table_name: str, table_type: str
+) -> Iterator[None]:
+    """Waits for and holds the pull slot of a table, so that only one pull of the table runs at a time, across threads and processes (the slot is a Postgres advisory lock in the info database). The slot is released when the context exits.
+
+    Slots are reentrant within a thread, so that a pull may pull again (e.g. the queued ranges of an incremental pull) without waiting for itself.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        table_name (str): The table that is pulled.
+        table_type (str): The table type that is pulled.
+
+    Raises:
+        Psycopg.Error: When the info database cannot be contacted.
+    """
+    keys: set[Tuple[str, str, str]] = getattr(held_pull_slots, "keys", set())
+    held_pull_slots.keys = keys
+    key = (database_name, table_name, table_type)
+    if key in keys:
+        yield
+        return
+
+    # the advisory lock belongs to the session, so it is released when the connection closes (even if the process dies)
+    with psycopg.connect(**CONN_CONFIG, dbname="info", autocommit=True) as lock_conn:
+        lock_conn.execute(
+            "SELECT pg_advisory_lock(hashtextextended(%s, 0));",
+            ("/".join(("pull", *key)),),
         )
+        keys.add(key)
+        try:
+            yield
+        finally:
+            keys.discard(key)
 
 
-def pull(database_name: str, parent_table_name: str, table_type: str = "data") -> None:
-    """Pulls in entries from the master database.
+def pull(
+    database_name: str,
+    parent_table_name: str,
+    table_type: str = "data",
+    page_size: int = PULL_PAGE_SIZE,
+    full: bool = False,
+    on_page: Callable[[int, int], None] | None = None,
+    descriptor_name: str | None = None,
+    id_range: Tuple[int, int] | None = None,
+) -> int:
+    """Pulls in entries from the master database, one page at a time. Each page is committed once it has been stored.
+
+    Unless a full refresh or an ID range is requested, only the entries after the table's watermark (i.e. the last remote ID that was pulled) are requested.
+    Pulls of the same table wait for each other (see hold_pull_slot).
 
     Args:
         database_name (str): The database containing the respective table.
         parent_table_name (str): The parent table name, or the table name if the table has no parent.
         table_type (str, optional): The target table type. Defaults to "data".
+        page_size (int, optional): The maximum number of rows to request at once. Defaults to the PULL_PAGE_SIZE environment variable or 1000.
+        full (bool, optional): Whether or not to ignore the watermark and pull every entry. Defaults to False.
+        on_page (Callable[[int, int], None] | None, optional): Called after each page is committed with the number of rows that were fetched and stored. Defaults to None.
+        descriptor_name (str | None, optional): The descriptor to pull. Required when table_type is "descriptors". Defaults to None.
+        id_range (Tuple[int, int] | None, optional): Only pull the entries whose remote IDs are within this inclusive range (e.g. to repair them). The watermark is left alone. Defaults to None.
 
     Raises:
         HTTPError: When the master database cannot be contacted.
-        ValueError: When a schema column is missing from an entry to record.
+        ValueError: When a schema column is missing from an entry to record, or when table_type or descriptor_name is invalid.
         Psycopg.Error: When storing an entry fails.
-        RuntimeError: When the data the master database returned is invalid, or when table_type is invalid.
+        RuntimeError: When the data the master database returned is invalid.
+
+    Returns:
+        int: The number of entries that were stored.
     """
-    if table_type not in {"tags", "tag_names", "tag_aliases", "tag_groups"}:
-        raise ValueError(f"Table type {table_type} not supported for pulling.")
+    target = get_pull_target(
+        database_name, parent_table_name, table_type, descriptor_name
+    )
+    endpoint = target["endpoint"]
+    table_name = target["table_name"]
+    expected_columns = target["expected_columns"]
+    exact_columns = target["exact_columns"]
+    id_column_name = target["id_column_name"]
+
+    # the master database's IDs do not make sense locally, except for aliases which are the IDs themselves.
+    translate_id_column: bool = table_type != "tag_aliases"
+    # new aliases do not necessarily sort after the old ones, so aliases are always pulled in full
+    incremental: bool = not full and id_range is None and table_type != "tag_aliases"
+    foreign_keys = get_foreign_keys(database_name, parent_table_name, table_type)
+
+    # another pull of the same table (e.g. a refresh job or the hydrate command) waits for this one, so that the same rows are not stored twice
+    with hold_pull_slot(database_name, table_name, table_type):
+        num_stored = 0
+        # whether or not every requested entry was stored
+        complete = True
+        with (
+            psycopg.connect(**CONN_CONFIG, dbname=database_name) as data_conn,
+            psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn,
+        ):
+            try:
+                watermark: Any = None
+                if incremental:
+                    watermark = get_watermark(
+                        info_conn, database_name, table_name, table_type
+                    )
+                elif id_range is not None:
+                    watermark = id_range[0] - 1
 
-    with (
-        psycopg.connect(**CONN_CONFIG, dbname=database_name) as data_conn,
-        psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn,
-    ):
-        try:
-            # @TODO tables with many entries
-
-            # find the correct endpoint to GET from
-            endpoint: str = ""
-            match (table_type):
-                case "data":
-                    endpoint = (
-                        f"{environ["DATABASE_URL"]}/{database_name}/{parent_table_name}"
+                for columns, rows in fetch_pages(
+                    endpoint, id_column_name, page_size, after=watermark
+                ):
+                    # check if the schema matches
+                    # check to see that the column names are valid
+                    if (
+                        expected_columns != set(columns)
+                        if exact_columns
+                        else not expected_columns.issuperset(columns)
+                    ):
+                        raise RuntimeError("Malformed column names.")
+
+                    num_columns = len(columns)
+                    for row in rows:
+                        if not isinstance(row, list):
+                            raise RuntimeError("Malformed row type.")
+
+                        if len(cast(list[Any], row)) != num_columns:
+                            raise RuntimeError("Malformed row size.")
+
+                    if id_range is not None:
+                        num_fetched = len(rows)
+                        rows = [
+                            row
+                            for row in rows
+                            if row[columns.index(id_column_name)] <= id_range[1]
+                        ]
+                        # the rest of the table is out of range
+                        if len(rows) != num_fetched and not rows:
+                            break
+
+                    if not rows:
+                        continue
+
+                    # translate the master database's IDs into local IDs with a single query per page
+                    id_column_index = columns.index(id_column_name)
+                    foreign_key_indices = {
+                        columns.index(column_name): referenced_table_name
+                        for column_name, referenced_table_name in foreign_keys.items()
+                    }
+                    lookups: dict[str, set[Any]] = {}
+                    if translate_id_column:
+                        lookups[table_name] = {row[id_column_index] for row in rows}
+                    for index, referenced_table_name in foreign_key_indices.items():
+                        lookups.setdefault(referenced_table_name, set()).update(
+                            row[index] for row in rows if row[index] is not None
+                        )
+                    local_ids = get_local_ids(info_conn, database_name, lookups)
+
+                    remote_ids: List[Any] = []
+                    translated_rows: List[List[Any]] = []
+                    for row in rows:
+                        unresolved = [
+                            columns[index]
+                            for index, referenced_table_name in foreign_key_indices.items()
+                            if row[index] is not None
+                            and (referenced_table_name, str(row[index]))
+                            not in local_ids
+                        ]
+                        if unresolved:
+                            # the referenced entries have not been pulled (or synced) yet. Stop here so that the watermark does not skip past this row.
+                            logger.warning(
+                                f"Stopped pulling {database_name}/{table_name} at remote ID {row[id_column_index]}: unknown {", ".join(unresolved)}."
+                            )
+                            break
+
+                        for index, referenced_table_name in foreign_key_indices.items():
+                            if row[index] is not None:
+                                row[index] = local_ids[
+                                    (referenced_table_name, str(row[index]))
+                                ]
+
+                        # keep the master database's ID so that the row is not uploaded back to the master database
+                        remote_ids.append(row[id_column_index])
+                        if translate_id_column:
+                            # rows that were pulled before are updated rather than duplicated
+                            row[id_column_index] = local_ids.get(
+                                (table_name, str(row[id_column_index]))
+                            )
+
+                        translated_rows.append(row)
+
+                    # rows with local changes waiting to be synced are skipped (see store_entries)
+                    num_page_stored = 0
+                    if translated_rows:
+                        num_page_stored = len(
+                            store_entries(
+                                data_conn,
+                                info_conn,
+                                database_name,
+                                table_name,
+                                parent_table_name,
+                                table_type,
+                                columns,
+                                translated_rows,
+                                id_column_name=id_column_name,
+                                remote_ids=remote_ids,
+                            )
+                        )
+                        # rows are ordered by ID, so the last translated row holds the new watermark
+                        if id_range is None:
+                            set_watermark(
+                                info_conn,
+                                database_name,
+                                table_name,
+                                table_type,
+                                str(remote_ids[-1]),
+                            )
+
+                    data_conn.commit()
+                    info_conn.commit()
+                    num_stored += num_page_stored
+                    if on_page is not None:
+                        on_page(len(rows), num_page_stored)
+
+                    if len(translated_rows) != len(rows):
+                        complete = False
+                        break
+                    if (
+                        id_range is not None
+                        and rows[-1][id_column_index] >= id_range[1]
+                    ):
+                        break
+
+                # ranges that differed from the master database have been pulled again (a full pull pulls every range)
+                if complete and not incremental:
+                    remove_repull_ranges(
+                        info_conn, database_name, table_name, table_type, id_range
                     )
-                case _:
-                    endpoint = f"{environ["DATABASE_URL"]}/{database_name}/{parent_table_name}/{table_type}"
-
-            response: Response
-            # get all data
-            with open("/run/secrets/admin", "r") as f:
-                response = requests.get(
-                    endpoint,
-                    timeout=5,
-                    headers={"Origin": environ["CACHE_URL"]},
-                    cookies={"username": "admin", "password": f.read()},
+                    info_conn.commit()
+            except (psycopg.Error, ValueError, HTTPError, RuntimeError):
+                data_conn.rollback()
+                info_conn.rollback()
+                raise
+
+        # incremental pulls also pull the queued ranges, which are behind the watermark
+        if incremental:
+            num_stored += pull_repull_ranges(
+                database_name,
+                parent_table_name,
+                table_type,
+                page_size=page_size,
+                on_page=on_page,
+                descriptor_name=descriptor_name,
+            )
+
+        return num_stored
+
+
+def pull_repull_ranges(
+    database_name: str,
+    parent_table_name: str,
+    table_type: str = "data",
+    page_size: int = PULL_PAGE_SIZE,
+    on_page: Callable[[int, int], None] | None = None,
+    descriptor_name: str | None = None,
+) -> int:
+    """Pulls the ranges of a table that were queued to be pulled again (see sync.reconcile), so that rows which differ from the master database are overwritten by the master database's version. Each range is removed from the queue once it has been pulled.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        parent_table_name (str): The parent table name, or the table name if the table has no parent.
+        table_type (str, optional): The target table type. Defaults to "data".
+        page_size (int, optional): The maximum number of rows to request at once. Defaults to the PULL_PAGE_SIZE environment variable or 1000.
+        on_page (Callable[[int, int], None] | None, optional): Called after each page is committed (see pull). Defaults to None.
+        descriptor_name (str | None, optional): The descriptor to pull. Required when table_type is "descriptors". Defaults to None.
+
+    Raises:
+        See pull.
+
+    Returns:
+        int: The number of entries that were stored.
+    """
+    table_name = get_pull_target(
+        database_name, parent_table_name, table_type, descriptor_name
+    )["table_name"]
+    with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+        id_ranges = get_repull_ranges(info_conn, database_name, table_name, table_type)
+
+    num_stored = 0
+    for id_range in id_ranges:
+        num_stored += pull(
+            database_name,
+            parent_table_name,
+            table_type=table_type,
+            page_size=page_size,
+            on_page=on_page,
+            descriptor_name=descriptor_name,
+            id_range=id_range,
+        )
+    return num_stored
+
+
+def pull_table(
+    database_name: str,
+    parent_table_name: str,
+    full: bool = False,
+    on_page: Callable[[int, int], None] | None = None,
+    table_types: Iterable[str] | None = None,
+) -> dict[str, int]:
+    """Pulls in every pullable table type of a table in dependency order (i.e. referenced entries before the entries that reference them). The watermarks act as checkpoints, so an interrupted pull resumes where it stopped.
+
+    Args:
+        database_name (str): The database containing the respective table.
+        parent_table_name (str): The table name.
+        full (bool, optional): Whether or not to ignore the watermarks and pull every entry. Defaults to False.
+        on_page (Callable[[int, int], None] | None, optional): See pull. Defaults to None.
+        table_types (Iterable[str] | None, optional): Only pull these table types. Defaults to None (i.e. every table type).
+
+    Raises:
+        See pull.
+
+    Returns:
+        dict[str, int]: The number of entries that were stored for each table name.
+    """
+    table_info = databases[database_name][parent_table_name]
+    selected_table_types = PULL_ORDER if table_types is None else set(table_types)
+
+    num_stored: dict[str, int] = {}
+    for table_type in PULL_ORDER:
+        if table_type not in selected_table_types:
+            continue
+
+        match (table_type):
+            case "data":
+                num_stored[parent_table_name] = pull(
+                    database_name,
+                    parent_table_name,
+                    table_type=table_type,
+                    full=full,
+                    on_page=on_page,
                 )
-                response.raise_for_status()
-
-                data = response.json()
-                if (
-                    data is None
-                    or "data" not in data
-                    or not isinstance(data["data"], list)
-                    or "columns" not in data
-                    or not isinstance(data["columns"], list)
-                ):
-                    raise RuntimeError("Invalid data received.")
-
-                # check if the schema matches
-                # check to see that the column names are valid
-                columns = set(data["columns"])
-                id_column_name: str = "id"
-                remove_id_column: bool = True
-                table_name: str = parent_table_name
-                match (table_type):
-                    # case "data": @TODO
-                    case "tags":
-                        if {"id", "entry_id", "tag_id"} != columns:
-                            raise RuntimeError("Malformed column names.")
-
-                        table_name = f"{parent_table_name}_tags"
-                    case "tag_names":
-                        if {"id", "tag_name"} != columns:
-                            raise RuntimeError("Malformed column names.")
-
-                        table_name = f"{parent_table_name}_tag_names"
-                    case "tag_aliases":
-                        if {"alias", "tag_id"} != columns:
-                            raise RuntimeError("Malformed column names.")
-
-                        id_column_name = "alias"
-                        remove_id_column = False
-                        table_name = f"{parent_table_name}_tag_aliases"
-                    case "tag_groups":
-                        if {"id", "tag_id", "group_name"} != columns:
-                            raise RuntimeError("Malformed column names.")
-
-                        table_name = f"{parent_table_name}_tag_groups"
-                    case _:
-                        raise RuntimeError(f'Invalid table type "{table_type}"')
-
-                num_columns = len(data["columns"])
-
-                for row in data["data"]:
-                    if not isinstance(row, list):
-                        raise RuntimeError("Malformed row type.")
-                    row = cast(list[Any], row)
-
-                    if len(row) != num_columns:
-                        raise RuntimeError("Malformed row size.")
-
-                if remove_id_column:
-                    id_column_index = data["columns"].index(id_column_name)
-                    for row in data["data"]:
-                        row.pop(id_column_index)
-                    data["columns"].pop(id_column_index)
-
-                for row in data["data"]:
-                    store_entry(
-                        data_conn,
-                        info_conn,
-                        database_name,
-                        table_name,
-                        parent_table_name,
-                        table_type,
-                        data["columns"],
-                        row,
-                        id_column_name=id_column_name,
+            case "descriptors":
+                for descriptor_name in table_info.get("descriptors", {}):
+                    num_stored[f"{parent_table_name}_{descriptor_name}_descriptors"] = (
+                        pull(
+                            database_name,
+                            parent_table_name,
+                            table_type=table_type,
+                            full=full,
+                            on_page=on_page,
+                            descriptor_name=descriptor_name,
+                        )
                     )
+            case _:
+                if not table_info.get("tagging", False):
+                    continue
+                num_stored[f"{parent_table_name}_{table_type}"] = pull(
+                    database_name,
+                    parent_table_name,
+                    table_type=table_type,
+                    full=full,
+                    on_page=on_page,
+                )
+
+    return num_stored
+
 
-        except (psycopg.Error, ValueError, HTTPError):
-            data_conn.rollback()
-            info_conn.rollback()
-            raise
+def write_through(
+    scope: SyncScope, timeout: float = WRITE_THROUGH_TIMEOUT / 1000
+) -> str | None:
+    """Syncs the given entries inline, waiting at most until the deadline.
+
+    If the deadline passes, the sync carries on in the background. Entries that fail to sync are left to the automatic sync like any other entry.
+
+    Args:
+        scope (SyncScope): The entries to sync. Should select exactly one entry from one table.
+        timeout (float, optional): The deadline in seconds. Defaults to the WRITE_THROUGH_TIMEOUT environment variable (in milliseconds) or 1.5 seconds.
+
+    Returns:
+        str | None: The remote id of the entry, or None if the entry has not reached the master database yet.
+    """
+    sync_thread = threading.Thread(target=sync, args=(scope,), daemon=True)
+    sync_thread.start()
+    sync_thread.join(timeout)
+
+    if sync_thread.is_alive():
+        logger.info(f"Write-through sync missed its deadline (scope: {scope}).")
+        return None
+
+    with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+        row = info_conn.execute(
+            "SELECT remote_id FROM sync_status WHERE database_name = %s AND table_name = %s AND entry_id = ANY(%s) AND status = 'updated';",
+            (scope["database_name"], scope["table_name"], scope["entry_ids"]),
+        ).fetchone()
+
+    return None if row is None else row[0]
 
 
 def queue_sync() -> None:
@@ -469,8 +1111,74 @@ def queue_sync() -> None:
 
 
 def request_sync(request: HttpRequest) -> HttpResponse:
-    queue_sync()
-    return HttpResponse("Queued sync.")
+    """Queues a full sync, or immediately syncs the entries selected by the query parameters.
+
+    /sync?database=[database name]&table=[table name]&table_type=[table type]&id=[entry id],[entry id]...
+
+    Entry IDs are local to a single table, so id requires database, table and table_type (and descriptor=[descriptor name] for descriptors).
+
+    Args:
+        request (HttpRequest): The request to handle.
+
+    Returns:
+        HttpResponse: The response to the client.
+    """
+    scope: SyncScope = {}
+
+    database_name = request.GET.get("database")
+    table_name = request.GET.get("table")
+    table_type = request.GET.get("table_type")
+    entry_ids = request.GET.get("id")
+    descriptor_name = request.GET.get("descriptor")
+
+    if database_name is not None:
+        scope["database_name"] = to_lower_snake_case(database_name)
+        if scope["database_name"] not in databases:
+            return HttpResponseBadRequest(f'Database "{database_name}" was not found.')
+    if table_name is not None:
+        if "database_name" not in scope:
+            return HttpResponseBadRequest(
+                "A table cannot be selected without its database."
+            )
+        scope["parent_table_name"] = to_lower_snake_case(table_name)
+        if scope["parent_table_name"] not in databases[scope["database_name"]]:
+            return HttpResponseBadRequest(
+                f'Table "{database_name}/{table_name}" was not found.'
+            )
+    if table_type is not None:
+        scope["table_type"] = to_lower_snake_case(table_type)
+        if scope["table_type"] not in SYNCABLE_TABLE_TYPES:
+            return HttpResponseBadRequest(f'"{table_type}" is not a valid table type.')
+    if entry_ids is not None:
+        if "parent_table_name" not in scope or "table_type" not in scope:
+            return HttpResponseBadRequest(
+                "Entry IDs cannot be selected without their database, table and table type."
+            )
+        if scope["table_type"] == "descriptors":
+            if descriptor_name is None:
+                return HttpResponseBadRequest(
+                    "Descriptor IDs cannot be selected without their descriptor."
+                )
+            descriptor_name = to_lower_snake_case(descriptor_name)
+            if descriptor_name not in databases[scope["database_name"]][
+                scope["parent_table_name"]
+            ].get("descriptors", {}):
+                return HttpResponseBadRequest(
+                    f'Descriptor "{database_name}/{table_name}/{descriptor_name}" was not found.'
+                )
+            scope["table_name"] = (
+                f"{scope["parent_table_name"]}_{descriptor_name}_descriptors"
+            )
+        scope["entry_ids"] = [entry_id for entry_id in entry_ids.split(",") if entry_id]
+        if not scope["entry_ids"]:
+            return HttpResponseBadRequest("No entry IDs supplied.")
+
+    if not scope:
+        queue_sync()
+        return HttpResponse("Queued sync.")
+
+    num_successes, num_failures = sync(scope)
+    return JsonResponse({"synced": num_successes, "failed": num_failures})
 
 
 SYNC_EVENT: threading.Event = threading.Event()
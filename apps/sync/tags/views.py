@@ -5,8 +5,10 @@ from django.http import (
     HttpResponseBadRequest,
     HttpResponseServerError,
     HttpResponseNotAllowed,
+    StreamingHttpResponse,
 )
 import psycopg
+from typing import Any
 from psycopg import sql
 from wywy_website_types.data import EntryTableData
 from constants import CONN_CONFIG
@@ -15,7 +17,22 @@ import json
 from database.schema import databases
 from utils import chunkify_url, to_lower_snake_case
 from sync.sync import queue_sync
-from database.db import store_entry
+from database.response_cache import cache_select_response
+from database.queries import get_select_statement, get_upsert_statement
+from database.db import (
+    PAGE_LIMIT_CLAUSE,
+    STREAM_LIMIT_CLAUSE,
+    PageCursors,
+    construct_id_list_clauses,
+    construct_page_clauses,
+    construct_stream_query,
+    estimate_row_count,
+    finish_page,
+    parse_id_list,
+    parse_page_request,
+    store_entry,
+    open_stream_select,
+)
 
 
 def handle_select_request(request: HttpRequest) -> HttpResponse:
@@ -48,27 +65,88 @@ def handle_select_request(request: HttpRequest) -> HttpResponse:
         case _:
             return HttpResponseBadRequest(f'"{table_type}" is not a valid table type.')
 
+    id_column_name = "alias" if table_type == "tag_aliases" else "id"
+    integer_ids = table_type != "tag_aliases"
+    try:
+        page = parse_page_request(request.GET, integer_ids=integer_ids)
+        # ?id=[ID],[ID],... selects a batch of rows in the requested order instead of a page
+        select_ids = (
+            parse_id_list(request.GET["id"], integer_ids=integer_ids)
+            if "id" in request.GET
+            else None
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    if select_ids is not None and (
+        page["after"] is not None or page["before"] is not None
+    ):
+        return HttpResponseBadRequest(
+            "A batch of IDs cannot be selected with after or before."
+        )
+    stream = request.GET.get("stream", "false").lower() == "true"
+
     conditions: list[sql.Composable] = []
+    # the page and the conditions' values are bound as parameters
+    params: dict[str, Any] = {**page}
 
-    select_id = request.GET.get("id")
     parent_id = request.GET.get("parent_id")
-    if select_id is not None:
-        conditions.append(sql.SQL("WHERE id={id}").format(id=sql.Literal(select_id)))
+    if select_ids is not None:
+        params["ids"] = select_ids
     elif parent_id is not None:
+        params["parent_id"] = parent_id
         match (table_type):
             case "tags":
-                conditions.append(
-                    sql.SQL("WHERE entry_id={id}").format(id=sql.Literal(parent_id))
-                )
+                conditions.append(sql.SQL("entry_id = %(parent_id)s"))
             case "tag_aliases":
-                conditions.append(
-                    sql.SQL("WHERE tag_id={id}").format(id=sql.Literal(parent_id))
-                )
+                conditions.append(sql.SQL("tag_id = %(parent_id)s"))
             case _:
                 return HttpResponseBadRequest(
                     f"This table type does not support selection by parent ID."
                 )
 
+    page_conditions, order = (
+        construct_id_list_clauses(sql.Identifier(id_column_name), integer_ids)
+        if select_ids is not None
+        else construct_page_clauses(page, sql.Identifier(id_column_name))
+    )
+    conditions.extend(page_conditions)
+    target_table_name = f"{table_name}_{table_type}"
+
+    select_query = sql.SQL("{select_query} {conditions} {order} {limit}").format(
+        select_query=get_select_statement(database_name, target_table_name),
+        conditions=(
+            sql.SQL("WHERE {conditions}").format(
+                conditions=sql.SQL(" AND ").join(conditions)
+            )
+            if conditions
+            else sql.SQL("")
+        ),
+        order=order,
+        # streamed responses and batches are unbounded unless a limit is given. Otherwise, one extra row shows whether or not there is another page.
+        limit=(
+            (STREAM_LIMIT_CLAUSE if "limit" in request.GET else sql.SQL(""))
+            if stream or select_ids is not None
+            else PAGE_LIMIT_CLAUSE
+        ),
+    )
+
+    if stream:
+        # the query runs before the response starts, so that failures are reported with an error status
+        try:
+            chunks = open_stream_select(
+                database_name,
+                construct_stream_query(select_query, page, id_column_name),
+                params,
+            )
+        except psycopg.DataError as e:
+            return HttpResponseBadRequest(f"Invalid query: {e}")
+        except psycopg.Error:
+            return HttpResponseServerError(
+                "Could not fetch the rows from the database."
+            )
+
+        return StreamingHttpResponse(chunks, content_type="application/json")
+
     # get results
     with psycopg.connect(
         **CONN_CONFIG,
@@ -76,23 +154,29 @@ def handle_select_request(request: HttpRequest) -> HttpResponse:
     ) as conn:
         with conn.cursor() as cur:
             # @TODO change to tag_aliases
-            cur.execute(
-                sql.SQL("SELECT * FROM {table_name} {conditions};").format(
-                    table_name=sql.Identifier(f"{table_name}_{table_type}"),
-                    conditions=sql.SQL(" ").join(conditions),
-                )
-            )
+            cur.execute(select_query, params)
 
             if cur.description is None:
                 return HttpResponseServerError(
                     "Could not fetch the column schema from the database."
                 )
 
-            output: EntryTableData = {
-                "columns": [column.name for column in cur.description],
-                "data": [list(row) for row in cur.fetchall()],
+            columns = [column.name for column in cur.description]
+            rows = [list(row) for row in cur.fetchall()]
+
+        cursors: PageCursors = (
+            {"next": None, "previous": None}
+            if select_ids is not None
+            else finish_page(rows, page, columns.index(id_column_name))
+        )
+        output: EntryTableData = {"columns": columns, "data": rows}
+        return JsonResponse(
+            {
+                **output,
+                **cursors,
+                "estimated_count": estimate_row_count(conn, target_table_name),
             }
-        return JsonResponse(output)
+        )
 
 
 def handle_insert_request(request: HttpRequest) -> HttpResponse:
@@ -164,6 +248,9 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
                         "tags",
                         list(data.keys()),
                         list(data.values()),
+                        query=get_upsert_statement(
+                            database_name, f"{table_name}_tags", list(data.keys())
+                        ),
                     )
                 case "tag_names":
                     # validate input
@@ -191,6 +278,9 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
                         "tag_names",
                         list(data.keys()),
                         list(data.values()),
+                        query=get_upsert_statement(
+                            database_name, f"{table_name}_tag_names", list(data.keys())
+                        ),
                     )
 
                     # automatically add the related alias
@@ -204,6 +294,11 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
                         ["alias", "tag_id"],
                         [data["tag_name"], next_id],
                         id_column_name="alias",
+                        query=get_upsert_statement(
+                            database_name,
+                            f"{table_name}_tag_aliases",
+                            ["alias", "tag_id"],
+                        ),
                     )
                 case "tag_aliases":
                     # validate input
@@ -234,6 +329,11 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
                         list(data.keys()),
                         list(data.values()),
                         id_column_name="alias",
+                        query=get_upsert_statement(
+                            database_name,
+                            f"{table_name}_tag_aliases",
+                            list(data.keys()),
+                        ),
                     )
                 case "tag_groups":
                     # validate input
@@ -269,11 +369,18 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
                         "tag_groups",
                         list(data.keys()),
                         list(data.values()),
+                        query=get_upsert_statement(
+                            database_name, f"{table_name}_tag_groups", list(data.keys())
+                        ),
                     )
                 case _:
                     return HttpResponseBadRequest(
                         "Invalid URL. Expecting tags/[databaseName]/[tableName]/[tag_names/tag_aliases]."
                     )
+
+            # the entry is committed before its table's new version, so that a response cached under the new version always contains it (as in sync.pull)
+            data_conn.commit()
+            info_conn.commit()
         except psycopg.Error:
             data_conn.rollback()
             info_conn.rollback()
@@ -285,10 +392,14 @@ def handle_insert_request(request: HttpRequest) -> HttpResponse:
     return HttpResponse()
 
 
+# responses are cached where requests are dispatched (/main caches its own), so that each request is only looked up once
+handle_cached_select_request = cache_select_response(handle_select_request)
+
+
 # Create your views here.
 def index(request: HttpRequest) -> HttpResponse:
     if request.method == "GET":
-        return handle_select_request(request)
+        return handle_cached_select_request(request)
     elif request.method == "POST":
         return handle_insert_request(request)
 
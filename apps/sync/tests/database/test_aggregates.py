@@ -0,0 +1,112 @@
+import json
+import unittest
+import psycopg
+from typing import Any
+
+from constants import CONN_CONFIG
+from database.aggregates import (
+    construct_aggregate_query,
+    construct_downsample_query,
+    parse_bucket,
+)
+
+SCHEMA: Any = {
+    "kind": {"datatype": "enum", "values": ["a", "b"]},
+    "amount": {"datatype": "int"},
+    "day": {"datatype": "date"},
+    "name": {"datatype": "str"},
+}
+
+
+class TestAggregates(unittest.TestCase):
+    def setUp(self):
+        self.conn = psycopg.connect(**CONN_CONFIG, dbname="info")
+        self.conn.execute("""
+            CREATE TEMPORARY TABLE aggregate_test (
+                id SERIAL PRIMARY KEY,
+                kind TEXT,
+                amount INTEGER,
+                day DATE,
+                name TEXT
+            );
+            INSERT INTO aggregate_test (kind, amount, day, name) VALUES
+                ('a', 1, '2024-01-01', 'x'),
+                ('a', 2, '2024-02-01', 'y'),
+                ('b', 3, '2024-02-15', 'z');
+            """).close()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def aggregate(
+        self, params: dict[str, str], construct_query=construct_aggregate_query
+    ) -> dict[str, Any]:
+        query, query_params = construct_query("aggregate_test", SCHEMA, params)
+        row = self.conn.execute(query, query_params).fetchone()
+        assert row is not None
+        return json.loads(row[0])
+
+    def test_group_by(self):
+        """Test if groups are counted and summed in order."""
+        document = self.aggregate({"group_by": "kind", "metrics": "count,sum:amount"})
+        self.assertEqual(document["columns"], ["kind", "count", "sum_amount"])
+        self.assertEqual(document["data"], [["a", 2, 3], ["b", 1, 3]])
+
+    def test_date_trunc_and_filters(self):
+        """Test if dates are grouped by month after filtering."""
+        document = self.aggregate({"group_by": "day:month", "amount__gte": "2"})
+        self.assertEqual(document["data"], [["2024-02-01", 2]])
+
+    def test_single_group(self):
+        """Test if a request without groupings aggregates the whole table, even when it is empty."""
+        self.assertEqual(self.aggregate({})["data"], [[3]])
+        self.assertEqual(self.aggregate({"amount__gt": "3"})["data"], [[0]])
+
+    def test_invalid_aggregates(self):
+        """Test if unsuitable groupings and metrics are rejected."""
+        for params in (
+            {"group_by": "name"},
+            {"group_by": "amount:month"},
+            {"group_by": "tag"},
+            {"metrics": "sum:name"},
+            {"metrics": "median:amount"},
+            {"order": "kind"},
+        ):
+            with self.assertRaises(ValueError):
+                construct_aggregate_query("aggregate_test", SCHEMA, params)
+
+    def test_downsample(self):
+        """Test if rows are summarised in weekly buckets and empty buckets are filled."""
+        params = {
+            "bucket": "1w",
+            "start": "2024-01-29",
+            "end": "2024-02-19",
+            "metrics": "count,sum:amount",
+        }
+        document = self.aggregate(params, construct_downsample_query)
+        self.assertEqual(document["columns"], ["bucket", "count", "sum_amount"])
+        self.assertEqual(
+            document["data"],
+            [
+                ["2024-01-29T00:00:00", 1, 2],
+                ["2024-02-05T00:00:00", 0, None],
+                ["2024-02-12T00:00:00", 1, 3],
+            ],
+        )
+        document = self.aggregate(
+            {**params, "gaps": "false"}, construct_downsample_query
+        )
+        self.assertEqual(len(document["data"]), 2)
+
+    def test_invalid_downsamples(self):
+        """Test if malformed buckets, missing bounds and too many buckets are rejected."""
+        self.assertEqual(parse_bucket("15m").total_seconds(), 900)
+        for params in (
+            {"bucket": "1y", "start": "2024-01-01", "end": "2024-02-01"},
+            {"bucket": "1d", "start": "2024-01-01"},
+            {"bucket": "1d", "start": "2024-02-01", "end": "2024-01-01"},
+            {"bucket": "1s", "start": "2000-01-01", "end": "2024-01-01"},
+            {"bucket": "1d", "column": "amount"},
+        ):
+            with self.assertRaises(ValueError):
+                construct_downsample_query("aggregate_test", SCHEMA, params)
@@ -0,0 +1,24 @@
+import unittest
+from typing import Any
+
+from database.db import decompose_entry
+from database.descriptors import link_descriptor
+from database.schema import DESCRIPTOR_PARENT_COLUMN_NAME
+
+SCHEMA: Any = {
+    "name": {"datatype": "str"},
+    "note": {"datatype": "str", "optional": True},
+}
+
+
+class TestDescriptors(unittest.TestCase):
+    def test_link_descriptor(self):
+        """Test if descriptors stored with their entry reference it last, as their compiled upserts expect."""
+        decomposed_descriptor = decompose_entry({"name": "a"}, SCHEMA)
+        link_descriptor(decomposed_descriptor, 7)
+        self.assertEqual(
+            decomposed_descriptor["columns"],
+            ["name", "note", DESCRIPTOR_PARENT_COLUMN_NAME],
+        )
+        self.assertEqual(decomposed_descriptor["values"], ["a", None, 7])
+        self.assertEqual(len(decomposed_descriptor["values_shapes"]), 3)
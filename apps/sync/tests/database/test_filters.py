@@ -0,0 +1,120 @@
+import datetime
+import unittest
+from typing import Any
+import psycopg
+from psycopg import sql
+
+from constants import CONN_CONFIG
+from database.filters import parse_select_filters
+
+SCHEMA: Any = {
+    "name": {"datatype": "str"},
+    "count": {"datatype": "int"},
+    "date": {"datatype": "date"},
+    "location": {"datatype": "geodetic point", "optional": True},
+}
+
+
+class TestFilters(unittest.TestCase):
+    def test_filters(self):
+        """Test if filters are converted into parameterised conditions of the column's datatype."""
+        filters = parse_select_filters(
+            {
+                "name": "a",
+                "count__in": "1,2",
+                "date__gte": "2024-01-01",
+                "limit": "10",
+            },
+            SCHEMA,
+        )
+        self.assertEqual(len(filters["conditions"]), 3)
+        self.assertEqual(
+            sorted(filters["params"].values(), key=str),
+            sorted(["a", [1, 2], datetime.date(2024, 1, 1)], key=str),
+        )
+        self.assertFalse(filters["projected"])
+        self.assertIsNone(filters["order_by"])
+
+    def test_invalid_filters(self):
+        """Test if unknown columns, bad values and unsupported ranges are rejected."""
+        for params in (
+            {"missing": "a"},
+            {"count": "a"},
+            {"name__gte": "a"},
+            {"count__like": "1"},
+            {"location": "POINT(1 2)"},
+            {"fields": "missing"},
+            {"order": "-missing"},
+        ):
+            with self.assertRaises(ValueError):
+                parse_select_filters(params, SCHEMA)
+
+    def test_projection_and_order(self):
+        """Test if only the requested fields are selected, in a custom order."""
+        filters = parse_select_filters(
+            {"fields": "name,primary_tag", "order": "-date,name"}, SCHEMA, tagging=True
+        )
+        self.assertEqual(list(filters["schema"]), ["name"])
+        self.assertTrue(filters["tagging"])
+        self.assertTrue(filters["projected"])
+        self.assertEqual(filters["order_by"], [("date", True), ("name", False)])
+
+    def test_spatial_filters(self):
+        """Test if geodetic points are filtered by area and ordered by distance, with their shapes bound as EWKT."""
+        filters = parse_select_filters(
+            {
+                "location__bbox": "-1,-1,1,1",
+                "location__within": "0,0,500",
+                "location__nearest": "0.5,0.5",
+                "order": "name",
+            },
+            SCHEMA,
+        )
+        self.assertEqual(len(filters["conditions"]), 2)
+        self.assertIn("SRID=4326;POINT(0.5 0.5)", filters["params"].values())
+        self.assertIn(500, filters["params"].values())
+        assert filters["order_by"] is not None
+        self.assertEqual(filters["order_by"][1], ("name", False))
+
+        for params in (
+            {"location__bbox": "1,1,-1,-1"},
+            {"location__within": "0,0,-5"},
+            {"location__nearest": "200,0"},
+            {"location__nearest": "0"},
+            {"name__bbox": "-1,-1,1,1"},
+            {"order": "location"},
+        ):
+            with self.assertRaises(ValueError):
+                parse_select_filters(params, SCHEMA)
+
+    def test_bbox_follows_latitude(self):
+        """Test if bounding boxes end at their latitudes, rather than at the great circles between their corners."""
+        filters = parse_select_filters({"location__bbox": "-80,30,80,40"}, SCHEMA)
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as conn:
+            rows = conn.execute(
+                sql.SQL("""
+                    SELECT ST_Y(location::geometry)
+                    FROM (VALUES
+                        (ST_GeographyFromText('SRID=4326;POINT(0 35)')),
+                        (ST_GeographyFromText('SRID=4326;POINT(0 50)')),
+                        (ST_GeographyFromText('SRID=4326;POINT(90 35)'))
+                    ) AS points (location)
+                    WHERE {conditions}
+                    """).format(
+                    conditions=sql.SQL(" AND ").join(filters["conditions"])
+                ),
+                filters["params"],
+            ).fetchall()
+        self.assertEqual(rows, [(35,)])
+
+    def test_reserved_parameters(self):
+        """Test if the parameters of other endpoints are only reserved on those endpoints."""
+        schema: Any = {"start": {"datatype": "date"}}
+        filters = parse_select_filters({"start": "2024-01-01"}, schema)
+        self.assertEqual(len(filters["conditions"]), 1)
+        filters = parse_select_filters(
+            {"start": "2024-01-01"}, schema, False, {"start"}
+        )
+        self.assertEqual(filters["conditions"], [])
+        with self.assertRaises(ValueError):
+            parse_select_filters({"group_by": "start"}, schema)
@@ -0,0 +1,30 @@
+import unittest
+
+from database.indexes import MAX_IDENTIFIER_LENGTH, get_index_name, parse_index_hint
+
+
+class TestIndexes(unittest.TestCase):
+    def test_index_hints(self):
+        """Test if index hints pick a method that suits the column."""
+        self.assertEqual(parse_index_hint(True, "timestamp"), "btree")
+        self.assertEqual(parse_index_hint(True, "geodetic point"), "gist")
+        self.assertEqual(parse_index_hint("brin", "timestamp"), "brin")
+        self.assertIsNone(parse_index_hint(None, "timestamp"))
+        self.assertEqual(parse_index_hint("gin", "text"), "gin")
+        for hint, datatype in (
+            ("hash", "timestamp"),
+            ("gin", "int"),
+            ("gist", "timestamp"),
+            ("brin", "geodetic point"),
+            ("brin", "bool"),
+        ):
+            with self.assertRaises(ValueError):
+                parse_index_hint(hint, datatype)
+
+    def test_index_names(self):
+        """Test if long index names are shortened without colliding."""
+        self.assertEqual(get_index_name("t", "c", "brin"), "t_c_brin_idx")
+        first = get_index_name("t" * 60, "first", "btree")
+        second = get_index_name("t" * 60, "second", "btree")
+        self.assertLessEqual(len(first), MAX_IDENTIFIER_LENGTH)
+        self.assertNotEqual(first, second)
@@ -0,0 +1,95 @@
+import json
+import unittest
+import psycopg
+from psycopg import sql
+from database.db import (
+    SELECT_MAX_PAGE_SIZE,
+    construct_stream_query,
+    finish_page,
+    open_stream_select,
+    parse_id_list,
+    parse_page_request,
+)
+
+
+class TestPagination(unittest.TestCase):
+    def test_parse_page_request(self):
+        """Test if page sizes are bounded and cursors are validated."""
+        self.assertEqual(
+            parse_page_request({"limit": "10", "after": "5"}),
+            {"limit": 10, "after": 5, "before": None},
+        )
+        self.assertEqual(
+            parse_page_request({"before": "a"}, integer_ids=False)["before"], "a"
+        )
+        for params in (
+            {"limit": "0"},
+            {"limit": str(SELECT_MAX_PAGE_SIZE + 1)},
+            {"limit": "ten"},
+            {"after": "a"},
+        ):
+            with self.assertRaises(ValueError):
+                parse_page_request(params)
+
+    def test_parse_id_list(self):
+        """Test if batches of IDs keep their order without repeats and are validated."""
+        self.assertEqual(parse_id_list("3, 1,3,2"), [3, 1, 2])
+        self.assertEqual(parse_id_list("b,a", integer_ids=False), ["b", "a"])
+        for value in (
+            "",
+            "1,a",
+            ",".join(map(str, range(SELECT_MAX_PAGE_SIZE + 1))),
+            # repeats count towards the limit
+            ",".join(["1"] * (SELECT_MAX_PAGE_SIZE + 1)),
+        ):
+            with self.assertRaises(ValueError):
+                parse_id_list(value)
+
+    def test_forward_page(self):
+        """Test if the extra row is trimmed and becomes the next cursor."""
+        rows = [[1], [2], [3]]
+        page = parse_page_request({"limit": "2", "after": "0"})
+        self.assertEqual(finish_page(rows, page, 0), {"next": 2, "previous": 1})
+        self.assertEqual(rows, [[1], [2]])
+
+        rows = [[3]]
+        self.assertEqual(finish_page(rows, page, 0), {"next": None, "previous": 3})
+
+    def test_backward_page(self):
+        """Test if pages selected in descending order are returned in ascending order."""
+        rows = [[9], [8], [7]]
+        page = parse_page_request({"limit": "2", "before": "10"})
+        self.assertEqual(finish_page(rows, page, 0), {"next": 9, "previous": 8})
+        self.assertEqual(rows, [[8], [9]])
+
+    def test_stream_query(self):
+        """Test if only pages that are selected backwards are reordered for streaming."""
+        query = sql.SQL("SELECT id FROM t ORDER BY id DESC LIMIT 2")
+        self.assertIs(
+            construct_stream_query(query, parse_page_request({"after": "1"}), "id"),
+            query,
+        )
+        self.assertIsNot(
+            construct_stream_query(query, parse_page_request({"before": "9"}), "id"),
+            query,
+        )
+
+    def test_open_stream(self):
+        """Test if streamed queries fail before the response starts, and stream every row otherwise."""
+        # the division fails on the third row, while the first batch is read
+        with self.assertRaises(psycopg.DataError):
+            open_stream_select(
+                "info",
+                sql.SQL("SELECT 1 / (g - 3) AS x FROM generate_series(1, 5) AS g"),
+                itersize=10,
+            )
+
+        chunks = open_stream_select(
+            "info",
+            sql.SQL("SELECT g AS x FROM generate_series(1, 5) AS g"),
+            itersize=2,
+        )
+        self.assertEqual(
+            json.loads(b"".join(chunks)),
+            {"columns": ["x"], "data": [[1], [2], [3], [4], [5]]},
+        )
@@ -0,0 +1,36 @@
+import unittest
+from typing import Any
+
+from database.db import construct_select_all_query, decompose_entry
+from database.queries import STATEMENTS, get_entry_shape
+
+SCHEMA: Any = {
+    "name": {"datatype": "str"},
+    "location": {"datatype": "geodetic point", "optional": True},
+    "note": {"datatype": "str", "optional": True, "comments": True},
+}
+
+
+class TestQueries(unittest.TestCase):
+    def test_select_values_are_not_shared(self):
+        """Test if SELECT queries built with the default values do not grow."""
+        first = construct_select_all_query("t", SCHEMA).as_string()
+        second = construct_select_all_query("t", SCHEMA).as_string()
+        self.assertEqual(first, second)
+
+    def test_registry_is_immutable(self):
+        """Test if compiled statements cannot be replaced."""
+        with self.assertRaises(TypeError):
+            STATEMENTS[("database", "table", "select")] = None  # type: ignore[index]
+
+    def test_entry_shape(self):
+        """Test if entries with and without their optional columns have the compiled shape."""
+        columns, values_shapes = get_entry_shape(SCHEMA)
+        for entry in (
+            {"name": "a"},
+            {"name": "a", "location": "POINT(1 2)", "note": "b", "note_comments": "c"},
+        ):
+            decomposed_entry = decompose_entry(entry, SCHEMA)
+            self.assertEqual(decomposed_entry["columns"], columns)
+            self.assertEqual(decomposed_entry["values_shapes"], values_shapes)
+            self.assertEqual(len(decomposed_entry["values"]), len(columns))
@@ -0,0 +1,25 @@
+import unittest
+from database.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_lru(self):
+        """Test if the least recently used responses are evicted first and large responses are not cached."""
+        cache = ResponseCache(2, 4)
+        cache.put(("a", "", (1,)), b"a")
+        cache.put(("b", "", (1,)), b"b")
+        # "a" becomes the most recently used response
+        self.assertEqual(cache.get(("a", "", (1,))), b"a")
+        cache.put(("c", "", (1,)), b"c")
+
+        self.assertIsNone(cache.get(("b", "", (1,))))
+        self.assertEqual(cache.get(("c", "", (1,))), b"c")
+
+        cache.put(("d", "", (1,)), b"too large")
+        self.assertIsNone(cache.get(("d", "", (1,))))
+
+    def test_versions(self):
+        """Test if responses of an older table version are not returned."""
+        cache = ResponseCache(2, 4)
+        cache.put(("a", "limit=1", (1,)), b"old")
+        self.assertIsNone(cache.get(("a", "limit=1", (2,))))
@@ -0,0 +1,158 @@
+import json
+import unittest
+import psycopg
+from psycopg import sql
+from typing import Any
+
+from constants import CONN_CONFIG
+from database.db import construct_select_json_query, parse_page_request
+from database.includes import construct_document_query, construct_include_queries
+
+SCHEMA: Any = {"name": {"datatype": "str"}, "day": {"datatype": "date"}}
+
+
+class TestSelectJson(unittest.TestCase):
+    def setUp(self):
+        self.conn = psycopg.connect(**CONN_CONFIG, dbname="info")
+        self.conn.execute("""
+            CREATE TEMPORARY TABLE select_json_test (
+                id SERIAL PRIMARY KEY,
+                name TEXT,
+                day DATE
+            );
+            INSERT INTO select_json_test (name, day) VALUES
+                ('a', '2024-01-01'), ('b', '2024-01-02'), ('c', '2024-01-03');
+            """).close()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def select(self, params: dict[str, str], conditions=[]) -> dict[str, Any]:
+        page = parse_page_request(params)
+        row = self.conn.execute(
+            construct_select_json_query("select_json_test", SCHEMA, page, conditions),
+            page,
+        ).fetchone()
+        assert row is not None
+        return json.loads(row[0])
+
+    def test_forward_page(self):
+        """Test if pages are built in order with ISO dates and cursors."""
+        document = self.select({"limit": "2"})
+        self.assertEqual(document["columns"], ["id", "name", "day"])
+        self.assertEqual(
+            document["data"], [[1, "a", "2024-01-01"], [2, "b", "2024-01-02"]]
+        )
+        self.assertEqual(document["next"], 2)
+        self.assertIsNone(document["previous"])
+
+        document = self.select({"limit": "2", "after": "2"})
+        self.assertEqual(document["data"], [[3, "c", "2024-01-03"]])
+        self.assertIsNone(document["next"])
+        self.assertEqual(document["previous"], 3)
+
+    def test_backward_page(self):
+        """Test if pages selected backwards are returned in ascending order."""
+        document = self.select({"limit": "1", "before": "3"})
+        self.assertEqual(document["data"], [[2, "b", "2024-01-02"]])
+        self.assertEqual(document["next"], 2)
+        self.assertEqual(document["previous"], 2)
+
+    def test_empty_page(self):
+        """Test if a page without rows is still a complete document."""
+        document = self.select(
+            {}, [sql.SQL("name = {name}").format(name=sql.Literal("z"))]
+        )
+        self.assertEqual(document["data"], [])
+        self.assertIsNone(document["next"])
+        self.assertIsNone(document["previous"])
+
+    def test_custom_order(self):
+        """Test if pages in a custom order keep that order and have no cursors."""
+        page = parse_page_request({"limit": "2"})
+        row = self.conn.execute(
+            construct_select_json_query(
+                "select_json_test", SCHEMA, page, [], order_by=[("name", True)]
+            ),
+            page,
+        ).fetchone()
+        assert row is not None
+        document = json.loads(row[0])
+        self.assertEqual([entry[1] for entry in document["data"]], ["c", "b"])
+        self.assertIsNone(document["next"])
+        self.assertIsNone(document["previous"])
+
+    def test_id_batch(self):
+        """Test if a batch of IDs is selected in the requested order, whatever the page size."""
+        page = parse_page_request({"limit": "1"})
+        row = self.conn.execute(
+            construct_select_json_query("select_json_test", SCHEMA, page, [], ids=True),
+            {**page, "ids": [3, 1, 4]},
+        ).fetchone()
+        assert row is not None
+        document = json.loads(row[0])
+        self.assertEqual([entry[0] for entry in document["data"]], [3, 1])
+        self.assertIsNone(document["next"])
+        self.assertIsNone(document["previous"])
+
+    def test_included_tags(self):
+        """Test if the tags of the page's entries are embedded, without those of the extra row."""
+        self.conn.execute("""
+            CREATE TEMPORARY TABLE select_json_test_tag_names (
+                id SERIAL PRIMARY KEY,
+                tag_name TEXT
+            );
+            CREATE TEMPORARY TABLE select_json_test_tags (
+                id SERIAL PRIMARY KEY,
+                entry_id INTEGER,
+                tag_id INTEGER
+            );
+            INSERT INTO select_json_test_tag_names (tag_name) VALUES ('x'), ('y');
+            INSERT INTO select_json_test_tags (entry_id, tag_id) VALUES (1, 1), (3, 2);
+            ALTER TABLE select_json_test ADD COLUMN primary_tag INTEGER;
+            """).close()
+        page = parse_page_request({"limit": "2"})
+        row = self.conn.execute(
+            construct_select_json_query(
+                "select_json_test",
+                SCHEMA,
+                page,
+                [],
+                included=construct_include_queries(
+                    "info", "select_json_test", ["tags", "tag_names"]
+                ),
+            ),
+            page,
+        ).fetchone()
+        assert row is not None
+        document = json.loads(row[0])
+        self.assertEqual(len(document["data"]), 2)
+        self.assertEqual(document["included"]["tags"]["data"], [[1, 1, 1]])
+        self.assertEqual(document["included"]["tag_names"]["data"], [[1, "x"]])
+
+    def test_wide_document(self):
+        """Test if included documents of tables with more than 100 columns are built."""
+        column_names = ["id", *(f"column_{i}" for i in range(120))]
+        self.conn.execute(
+            sql.SQL(
+                "CREATE TEMPORARY TABLE wide_test (id SERIAL PRIMARY KEY, {columns}); INSERT INTO wide_test DEFAULT VALUES;"
+            ).format(
+                columns=sql.SQL(", ").join(
+                    sql.SQL("{column} INTEGER DEFAULT 1").format(
+                        column=sql.Identifier(column_name)
+                    )
+                    for column_name in column_names[1:]
+                )
+            )
+        ).close()
+        row = self.conn.execute(
+            sql.SQL("SELECT ({document})::text").format(
+                document=construct_document_query(
+                    sql.Identifier("wide_test"), column_names, sql.SQL("TRUE")
+                )
+            )
+        ).fetchone()
+        assert row is not None
+        document = json.loads(row[0])
+        self.assertEqual(document["columns"], column_names)
+        self.assertEqual(document["data"], [[1, *([1] * 120)]])
@@ -0,0 +1,69 @@
+import unittest
+import psycopg
+from typing import Any
+
+from constants import CONN_CONFIG
+from database.tiles import construct_tile_query, get_tile_bounds, parse_tile
+
+SCHEMA: Any = {
+    "location": {"datatype": "geodetic point"},
+    "amount": {"datatype": "int"},
+}
+
+
+class TestTiles(unittest.TestCase):
+    def setUp(self):
+        self.conn = psycopg.connect(**CONN_CONFIG, dbname="info")
+        self.conn.execute("""
+            CREATE TEMPORARY TABLE tile_test (
+                id SERIAL PRIMARY KEY,
+                location GEOGRAPHY(POINT, 4326),
+                amount INTEGER
+            );
+            INSERT INTO tile_test (location, amount) VALUES
+                (ST_GeographyFromText('SRID=4326;POINT(1 1)'), 1),
+                (ST_GeographyFromText('SRID=4326;POINT(1.0001 1.0001)'), 2),
+                (ST_GeographyFromText('SRID=4326;POINT(-100 40)'), 3),
+                (NULL, 4);
+            """).close()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def render(self, tile, params: dict[str, str] = {}) -> bytes:
+        query, query_params = construct_tile_query(tile, "tile_test", SCHEMA, params)
+        row = self.conn.execute(query, query_params).fetchone()
+        assert row is not None
+        return bytes(row[0])
+
+    def test_parse_tile(self):
+        """Test if tile coordinates are read and tiles outside of the map are rejected."""
+        self.assertEqual(parse_tile(["3", "4", "5.mvt"]), (3, 4, 5))
+        for url_chunks in (["1", "2", "0"], ["1", "-1", "0"], ["99", "0", "0"], ["0"]):
+            with self.assertRaises(ValueError):
+                parse_tile(url_chunks)
+
+    def test_tile_bounds(self):
+        """Test if tile bounds follow web mercator and stay inside of the map."""
+        west, south, east, north = get_tile_bounds((1, 1, 0))
+        self.assertEqual((west, south, east), (0, 0, 180))
+        self.assertAlmostEqual(north, 85.0511287798066)
+        self.assertEqual(get_tile_bounds((1, 1, 0), 0.5)[2], 180)
+
+    def test_render(self):
+        """Test if tiles with points are rendered and empty tiles are empty."""
+        self.assertGreater(len(self.render((0, 0, 0))), 0)
+        self.assertGreater(len(self.render((1, 1, 0))), 0)
+        self.assertGreater(len(self.render((16, 32950, 32585))), 0)
+        self.assertEqual(self.render((2, 0, 3)), b"")
+        self.assertEqual(self.render((1, 1, 0), {"amount__gt": "2"}), b"")
+
+    def test_invalid_tiles(self):
+        """Test if tiles of unsuitable columns and ordered tiles are rejected."""
+        for params in (
+            {"column": "amount"},
+            {"order": "amount"},
+            {"location__nearest": "0,0"},
+        ):
+            with self.assertRaises(ValueError):
+                construct_tile_query((0, 0, 0), "tile_test", SCHEMA, params)
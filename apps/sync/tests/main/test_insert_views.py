@@ -0,0 +1,111 @@
+import json
+import unittest
+from typing import Any
+import psycopg
+from psycopg import sql
+from django.test import RequestFactory
+from wywy_website_types import DictSchema
+
+from constants import CONN_CONFIG
+from database.schema import DESCRIPTOR_PARENT_COLUMN_NAME, databases
+from main.views import handle_insert_request
+from ..generic_database_api.transformations.purge import purge_database
+
+# values that pass the schema check of each (simple) datatype
+SAMPLE_VALUES: dict[str, Any] = {
+    "int": 1,
+    "integer": 1,
+    "float": 1.5,
+    "number": 1.5,
+    "string": "a",
+    "str": "a",
+    "text": "a",
+    "bool": True,
+    "boolean": True,
+    "date": "2024-01-01",
+    "time": "12:00:00",
+    "timestamp": "2024-01-01T12:00:00",
+}
+
+
+def build_sample(schema: DictSchema) -> dict[str, Any] | None:
+    """Builds an item with every required column of a schema, or None if a required column has no sample value."""
+    sample: dict[str, Any] = {}
+    for column_name, column_schema in schema.items():
+        if column_schema.get("optional", False) is True:
+            continue
+        if column_schema["datatype"] not in SAMPLE_VALUES:
+            return None
+        sample[column_name] = SAMPLE_VALUES[column_schema["datatype"]]
+    return sample
+
+
+class TestInsertDescriptors(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.database_name: str = ""
+        self.table_name: str = ""
+        self.body: dict[str, Any] = {}
+        # find an untagged table with descriptors whose entries can be built
+        for database_name, tables in databases.items():
+            for table_name, table_info in tables.items():
+                if (
+                    not table_info.get("descriptors")
+                    or table_info.get("tagging", False) is True
+                    or table_info.get("writeThrough", False) is True
+                ):
+                    continue
+                entry = build_sample(table_info["schema"])
+                descriptors = {
+                    descriptor_name: build_sample(descriptor_info["schema"])
+                    for descriptor_name, descriptor_info in table_info[
+                        "descriptors"
+                    ].items()
+                }
+                if entry is None or None in descriptors.values():
+                    continue
+                self.database_name = database_name
+                self.table_name = table_name
+                self.body = {
+                    "data": entry,
+                    "descriptors": {
+                        descriptor_name: [descriptor]
+                        for descriptor_name, descriptor in descriptors.items()
+                    },
+                }
+                break
+            if self.table_name:
+                break
+
+        if not self.table_name:
+            self.skipTest("No untagged table with descriptors has simple columns.")
+
+    def tearDown(self):
+        purge_database()
+
+    def test_descriptors_without_tags(self):
+        """Test if descriptors posted with an entry, but without tags, are stored and linked to the entry."""
+        response = handle_insert_request(
+            self.factory.post(
+                f"/main/{self.database_name}/{self.table_name}/data",
+                data=json.dumps(self.body),
+                content_type="application/json",
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        entry_id = int(response.content)
+
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            for descriptor_name in self.body["descriptors"]:
+                row = data_conn.execute(
+                    sql.SQL(
+                        "SELECT count(*) FROM {table_name} WHERE {parent_column} = %s;"
+                    ).format(
+                        table_name=sql.Identifier(
+                            f"{self.table_name}_{descriptor_name}_descriptors"
+                        ),
+                        parent_column=sql.Identifier(DESCRIPTOR_PARENT_COLUMN_NAME),
+                    ),
+                    (entry_id,),
+                ).fetchone()
+                self.assertEqual(row, (1,), descriptor_name)
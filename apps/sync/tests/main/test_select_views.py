@@ -0,0 +1,39 @@
+import unittest
+from django.test import RequestFactory
+
+from database.schema import databases
+from main.views import handle_select_request
+
+
+class TestSelectIncludes(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.database_name: str = ""
+        self.table_name: str = ""
+        # find a table without descriptors
+        for database_name, tables in databases.items():
+            for table_name, table_info in tables.items():
+                if not table_info.get("descriptors"):
+                    self.database_name = database_name
+                    self.table_name = table_name
+                    self.tagging = table_info.get("tagging", False)
+                    break
+            if self.table_name:
+                break
+
+        if not self.table_name:
+            self.skipTest("Every table has descriptors.")
+
+    def test_include_without_descriptors(self):
+        """Test if tables without descriptors can include their tags, and reject including descriptors."""
+        path = f"/main/{self.database_name}/{self.table_name}/data"
+
+        response = handle_select_request(
+            self.factory.get(path, {"include": "tags", "limit": "1"})
+        )
+        self.assertEqual(response.status_code, 200 if self.tagging else 400)
+
+        response = handle_select_request(
+            self.factory.get(path, {"include": "descriptors", "limit": "1"})
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,112 @@
+import unittest
+from io import StringIO
+from os import environ
+from typing import List, Tuple
+from unittest.mock import patch
+import psycopg
+from psycopg import sql
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from sync.sync import PULL_ORDER, get_pull_target
+from database.info import set_watermark
+from database.schema import databases
+from ..sync.master_stand_in import MasterStandIn
+from ..generic_database_api.transformations.purge import purge_database
+from constants import CONN_CONFIG
+
+MASTER_URL = "http://master"
+
+
+class TestHydrate(unittest.TestCase):
+    def setUp(self):
+        self.database_name: str = ""
+        self.table_name: str = ""
+        # find a database with a tagging table
+        for database_name, tables in databases.items():
+            for table_name, table_info in tables.items():
+                if table_info.get("tagging", False) is True:
+                    self.database_name = database_name
+                    self.table_name = table_name
+                    break
+            if self.table_name:
+                break
+
+        if not self.table_name:
+            self.fail("Unable to test hydrating: no tables have tagging enabled.")
+
+        self.master = MasterStandIn()
+        # every table type of every table in the database, so that the command can pull them
+        self.targets: List[Tuple[str, str]] = []
+        with patch.dict(environ, {"DATABASE_URL": MASTER_URL}):
+            for table_name, table_info in databases[self.database_name].items():
+                for table_type in PULL_ORDER:
+                    descriptor_names: List[str | None] = [None]
+                    if table_type == "descriptors":
+                        descriptor_names = list(table_info.get("descriptors", {}))
+                    for descriptor_name in descriptor_names:
+                        target = get_pull_target(
+                            self.database_name,
+                            table_name,
+                            table_type,
+                            descriptor_name,
+                        )
+                        self.master.add_table(
+                            target["endpoint"],
+                            sorted(target["expected_columns"]),
+                            [],
+                            id_column_name=target["id_column_name"],
+                        )
+                        self.targets.append((target["table_name"], table_type))
+
+        self.master.add_table(
+            f"{MASTER_URL}/{self.database_name}/{self.table_name}/tag_names",
+            ["id", "tag_name"],
+            [[1, "a"], [2, "b"]],
+        )
+
+    def tearDown(self):
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            for table_name, table_type in self.targets:
+                set_watermark(
+                    info_conn, self.database_name, table_name, table_type, None
+                )
+        purge_database()
+
+    def hydrate(self, stdout: StringIO) -> None:
+        with (
+            patch.dict(environ, {"DATABASE_URL": MASTER_URL, "CACHE_URL": MASTER_URL}),
+            patch("sync.sync.requests.get", self.master.get),
+            patch("refresh.management.commands.hydrate.POLL_INTERVAL", 0.01),
+        ):
+            call_command(
+                "hydrate",
+                "--database",
+                self.database_name,
+                stdout=stdout,
+                stderr=StringIO(),
+            )
+
+    def test_hydrate(self):
+        """Test if every table of a database is pulled through refresh jobs, and if failed tables fail the command."""
+        stdout = StringIO()
+        self.hydrate(stdout)
+        self.assertIn(
+            f"Hydrated {len(databases[self.database_name])} tables", stdout.getvalue()
+        )
+        self.assertIn(
+            f"{self.database_name}/{self.table_name}: stored 2 entries.",
+            stdout.getvalue(),
+        )
+
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            rows = data_conn.execute(
+                sql.SQL("SELECT tag_name FROM {table_name} ORDER BY id;").format(
+                    table_name=sql.Identifier(f"{self.table_name}_tag_names")
+                )
+            ).fetchall()
+        self.assertEqual([row[0] for row in rows], ["a", "b"])
+
+        # the master database stops serving the table's entries
+        del self.master.tables[f"{MASTER_URL}/{self.database_name}/{self.table_name}"]
+        with self.assertRaises(CommandError):
+            self.hydrate(StringIO())
@@ -0,0 +1,170 @@
+import threading
+import time
+import unittest
+from os import environ
+from typing import Any
+from unittest.mock import patch
+import psycopg
+from psycopg import sql
+from refresh.jobs import RefreshJobStatus, get_job_status, submit_refresh
+from sync.sync import hold_pull_slot
+from database.info import set_watermark
+from ..sync.master_stand_in import MasterStandIn, find_tagging_table
+from ..generic_database_api.transformations.purge import purge_database
+from constants import CONN_CONFIG
+
+MASTER_URL = "http://master"
+
+
+def wait_for_job(job_id: str, timeout: float = 10) -> RefreshJobStatus:
+    deadline = time.time() + timeout
+    while True:
+        status = get_job_status(job_id)
+        assert status is not None
+        if status["state"] in ("done", "failed") or time.time() > deadline:
+            return status
+        time.sleep(0.05)
+
+
+class TestRefreshJobs(unittest.TestCase):
+    def test_lifecycle(self):
+        """Test if jobs record their progress, and if failed jobs record their error."""
+
+        def pull_table(*args: Any, on_page: Any = None, **kwargs: Any) -> None:
+            on_page(3, 2)
+            on_page(1, 1)
+
+        with patch("refresh.jobs.pull_table", pull_table):
+            job, queued = submit_refresh("lifecycle", "table", "tag_names")
+            self.assertTrue(queued)
+            status = wait_for_job(job["id"])
+        self.assertEqual(status["state"], "done")
+        self.assertEqual((status["rows_fetched"], status["rows_stored"]), (4, 3))
+        self.assertIsNone(status["error"])
+        self.assertGreaterEqual(status["elapsed"], 0)
+
+        def failing_pull_table(*args: Any, **kwargs: Any) -> None:
+            raise RuntimeError("Malformed row size.")
+
+        with patch("refresh.jobs.pull_table", failing_pull_table):
+            job, _ = submit_refresh("lifecycle", "table", "tag_names")
+            status = wait_for_job(job["id"])
+        self.assertEqual(status["state"], "failed")
+        self.assertEqual(status["error"], "Malformed row size.")
+
+        self.assertIsNone(get_job_status("unknown"))
+
+    def test_dedup(self):
+        """Test if a target is not queued twice while its job is active, unless the second refresh is full."""
+        release = threading.Event()
+        calls: list[tuple[Any, ...]] = []
+
+        def pull_table(*args: Any, **kwargs: Any) -> None:
+            calls.append((*args, kwargs["full"], kwargs["table_types"]))
+            release.wait(10)
+
+        with patch("refresh.jobs.pull_table", pull_table):
+            job, queued = submit_refresh("dedup", "table")
+            self.assertTrue(queued)
+            same_job, queued = submit_refresh("dedup", "table")
+            self.assertFalse(queued)
+            self.assertEqual(same_job["id"], job["id"])
+
+            full_job, queued = submit_refresh("dedup", "table", full=True)
+            self.assertTrue(queued)
+            self.assertNotEqual(full_job["id"], job["id"])
+            type_job, queued = submit_refresh("dedup", "table", "tag_names")
+            self.assertTrue(queued)
+
+            release.set()
+            for job_id in (job["id"], full_job["id"], type_job["id"]):
+                self.assertEqual(wait_for_job(job_id)["state"], "done")
+
+            # finished targets are queued again
+            new_job, queued = submit_refresh("dedup", "table")
+            self.assertTrue(queued)
+            self.assertNotEqual(new_job["id"], job["id"])
+            self.assertEqual(wait_for_job(new_job["id"])["state"], "done")
+
+        self.assertCountEqual(
+            calls,
+            [
+                ("dedup", "table", False, None),
+                ("dedup", "table", True, None),
+                ("dedup", "table", False, ["tag_names"]),
+                ("dedup", "table", False, None),
+            ],
+        )
+
+
+class TestPullSlots(unittest.TestCase):
+    def setUp(self):
+        # find a table with tagging
+        tagging_table = find_tagging_table()
+        if tagging_table is None:
+            self.fail("Unable to test pulling tags: no tables have tagging enabled.")
+        self.database_name, self.table_name, _ = tagging_table
+
+        self.master = MasterStandIn()
+        self.master.add_table(
+            f"{MASTER_URL}/{self.database_name}/{self.table_name}/tag_names",
+            ["id", "tag_name"],
+            [[1, "a"], [2, "b"], [3, "c"]],
+        )
+
+    def tearDown(self):
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            set_watermark(
+                info_conn,
+                self.database_name,
+                f"{self.table_name}_tag_names",
+                "tag_names",
+                None,
+            )
+        purge_database()
+
+    def test_slot(self):
+        """Test if a pull slot is held by one thread at a time, and if the holding thread may enter it again."""
+        key = (self.database_name, f"{self.table_name}_tag_names", "tag_names")
+        entered = threading.Event()
+
+        def enter() -> None:
+            with hold_pull_slot(*key):
+                entered.set()
+
+        with hold_pull_slot(*key):
+            with hold_pull_slot(*key):
+                pass
+            thread = threading.Thread(target=enter)
+            thread.start()
+            self.assertFalse(entered.wait(0.5))
+        self.assertTrue(entered.wait(5))
+        thread.join()
+
+    def test_overlapping_jobs(self):
+        """Test if a refresh of a whole table and a refresh of one of its table types do not store the same rows twice."""
+        master_get = self.master.get
+
+        def slow_get(*args: Any, **kwargs: Any) -> Any:
+            time.sleep(0.1)
+            return master_get(*args, **kwargs)
+
+        with (
+            patch.dict(environ, {"DATABASE_URL": MASTER_URL, "CACHE_URL": MASTER_URL}),
+            patch("sync.sync.requests.get", slow_get),
+        ):
+            # the other table types are not served, so the table-wide job fails after pulling the tag names
+            table_job, _ = submit_refresh(self.database_name, self.table_name)
+            type_job, _ = submit_refresh(
+                self.database_name, self.table_name, "tag_names"
+            )
+            wait_for_job(table_job["id"])
+            self.assertEqual(wait_for_job(type_job["id"])["state"], "done")
+
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            rows = data_conn.execute(
+                sql.SQL("SELECT tag_name FROM {table_name} ORDER BY id;").format(
+                    table_name=sql.Identifier(f"{self.table_name}_tag_names")
+                )
+            ).fetchall()
+        self.assertEqual([row[0] for row in rows], ["a", "b", "c"])
@@ -0,0 +1,168 @@
+import json
+from copy import deepcopy
+from hashlib import md5
+from typing import Any, Tuple
+from requests import HTTPError
+from wywy_website_types.data import TableInfo
+
+from config import CONFIG
+from utils import to_lower_snake_case
+
+
+def find_tagging_table() -> Tuple[str, str, TableInfo] | None:
+    """Finds the first table with tagging enabled.
+
+    Returns:
+        Tuple[str, str, TableInfo] | None: The (lower snake case) database and table names and the table's info, or None if no table has tagging enabled.
+    """
+    for database_info in CONFIG["data"]:
+        for table_info in database_info["tables"]:
+            if table_info.get("tagging", False) is True:
+                return (
+                    to_lower_snake_case(database_info["dbname"]),
+                    to_lower_snake_case(table_info["tableName"]),
+                    table_info,
+                )
+    return None
+
+
+class StandInResponse:
+    """The subset of requests.Response that the cache relies on."""
+
+    def __init__(self, status_code: int, payload: Any) -> None:
+        self.status_code = status_code
+        self.payload = payload
+
+    @property
+    def text(self) -> str:
+        return str(self.payload)
+
+    def json(self) -> Any:
+        return self.payload
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code}: {self.text}")
+
+
+class MasterStandIn:
+    """A local stand-in for the master database's GET endpoints.
+
+    Tables are served from memory in the same {"columns": [...], "data": [...]} format as the master database, ordered by their ID column. The ?limit= parameter bounds the page size and the ?after= parameter (a keyset cursor or a watermark) skips every row up to and including that ID.
+
+    [endpoint]/digest answers with range digests in the format that sync.reconcile expects. Rows are canonicalised with json.dumps, which matches jsonb's text output for the strings and integers used in tests.
+
+    Patch requests.get with MasterStandIn.get to use it.
+    """
+
+    def __init__(self) -> None:
+        self.tables: dict[str, tuple[list[str], str, list[list[Any]]]] = {}
+        self.requests: list[tuple[str, dict[str, Any]]] = []
+
+    def add_table(
+        self,
+        endpoint: str,
+        columns: list[str],
+        rows: list[list[Any]],
+        id_column_name: str = "id",
+    ) -> None:
+        self.tables[endpoint] = (columns, id_column_name, rows)
+
+    def get(
+        self, url: str, params: dict[str, Any] | None = None, **kwargs: Any
+    ) -> StandInResponse:
+        params = {} if params is None else dict(params)
+        self.requests.append((url, params))
+
+        if url.endswith("/digest") and url.removesuffix("/digest") in self.tables:
+            return self.digest(url.removesuffix("/digest"), params)
+
+        if url not in self.tables:
+            return StandInResponse(404, "Not found.")
+
+        columns, id_column_name, rows = self.tables[url]
+        id_column_index = columns.index(id_column_name)
+        output = sorted(rows, key=lambda row: row[id_column_index])
+
+        after = params.get("after")
+        if after is not None:
+            # IDs arrive as query parameters, so compare them the way the master database would
+            output = [
+                row
+                for row in output
+                if row[id_column_index] > type(row[id_column_index])(after)
+            ]
+
+        limit = params.get("limit")
+        if limit is not None:
+            output = output[: int(limit)]
+
+        # the cache is free to modify the rows it receives
+        return StandInResponse(
+            200, {"columns": list(columns), "data": deepcopy(output)}
+        )
+
+    def digest(self, url: str, params: dict[str, Any]) -> StandInResponse:
+        columns, id_column_name, rows = self.tables[url]
+        id_column_index = columns.index(id_column_name)
+        digest_column_indices = [
+            columns.index(column_name)
+            for column_name in params["columns"].split(",")
+            if column_name
+        ]
+        hashes = sorted(
+            (
+                row[id_column_index],
+                md5(
+                    (
+                        str(row[id_column_index])
+                        + json.dumps(
+                            [row[index] for index in digest_column_indices],
+                            ensure_ascii=False,
+                        )
+                    ).encode()
+                ).hexdigest(),
+            )
+            for row in rows
+        )
+
+        if "lo" not in params:
+            ids = [remote_id for remote_id, _ in hashes]
+            return StandInResponse(
+                200,
+                {
+                    "min": min(ids, default=None),
+                    "max": max(ids, default=None),
+                    "count": len(ids),
+                },
+            )
+
+        lo, hi = int(params["lo"]), int(params["hi"])
+        hashes = [
+            (remote_id, row_hash)
+            for remote_id, row_hash in hashes
+            if lo <= remote_id <= hi
+        ]
+        if params.get("rows") == "true":
+            return StandInResponse(200, {"rows": [list(row) for row in hashes]})
+
+        chunks = int(params["chunks"])
+        chunk_hashes: dict[int, list[str]] = {}
+        for remote_id, row_hash in hashes:
+            # same as width_bucket(remote_id, lo, hi + 1, chunks) - 1
+            chunk_hashes.setdefault(
+                (remote_id - lo) * chunks // (hi + 1 - lo), []
+            ).append(row_hash)
+        return StandInResponse(
+            200,
+            {
+                "ranges": [
+                    {
+                        "chunk": chunk,
+                        "count": len(row_hashes),
+                        "digest": md5("".join(row_hashes).encode()).hexdigest(),
+                    }
+                    for chunk, row_hashes in chunk_hashes.items()
+                ]
+            },
+        )
@@ -0,0 +1,158 @@
+import unittest
+from os import environ
+from unittest.mock import patch
+import psycopg
+from sync.sync import fetch_pages, has_moved_past, pull
+from database.info import get_watermark, set_watermark
+from .master_stand_in import MasterStandIn, find_tagging_table
+from ..generic_database_api.transformations.purge import purge_database
+from constants import CONN_CONFIG
+
+MASTER_URL = "http://master"
+
+
+class TestIncrementalPull(unittest.TestCase):
+    def setUp(self):
+        # find a table with tagging
+        tagging_table = find_tagging_table()
+        if tagging_table is None:
+            self.fail("Unable to test pulling tags: no tables have tagging enabled.")
+        self.database_name, self.table_name, _ = tagging_table
+
+        self.master = MasterStandIn()
+        self.master.add_table(
+            f"{MASTER_URL}/{self.database_name}/{self.table_name}/tag_names",
+            ["id", "tag_name"],
+            [[1, "a"], [2, "b"], [3, "c"]],
+        )
+
+    def tearDown(self):
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            set_watermark(
+                info_conn,
+                self.database_name,
+                f"{self.table_name}_tag_names",
+                "tag_names",
+                None,
+            )
+        purge_database()
+
+    def pull_tag_names(self, full: bool = False) -> int:
+        with (
+            patch.dict(environ, {"DATABASE_URL": MASTER_URL, "CACHE_URL": MASTER_URL}),
+            patch("sync.sync.requests.get", self.master.get),
+        ):
+            return pull(
+                self.database_name,
+                self.table_name,
+                table_type="tag_names",
+                page_size=2,
+                full=full,
+            )
+
+    def get_watermark(self) -> str | None:
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            return get_watermark(
+                info_conn,
+                self.database_name,
+                f"{self.table_name}_tag_names",
+                "tag_names",
+            )
+
+    def test_incremental_pull(self):
+        """Test if only the entries after the watermark are pulled, unless a full refresh is requested."""
+        self.assertEqual(self.pull_tag_names(), 3)
+        self.assertEqual(self.get_watermark(), "3")
+        # two pages: [1, 2] and [3]
+        self.assertEqual(
+            [params.get("after") for _, params in self.master.requests], [None, 2]
+        )
+
+        # nothing changed
+        self.master.requests.clear()
+        self.assertEqual(self.pull_tag_names(), 0)
+        self.assertEqual(self.master.requests[0][1].get("after"), "3")
+
+        # one new entry
+        self.master.tables[
+            f"{MASTER_URL}/{self.database_name}/{self.table_name}/tag_names"
+        ][2].append([4, "d"])
+        self.assertEqual(self.pull_tag_names(), 1)
+        self.assertEqual(self.get_watermark(), "4")
+
+        # full refresh
+        self.master.requests.clear()
+        self.assertEqual(self.pull_tag_names(full=True), 4)
+        self.assertIsNone(self.master.requests[0][1].get("after"))
+
+    def test_full_refresh_updates_in_place(self):
+        """Test if pulling entries that were pulled before updates them rather than duplicating them."""
+        self.assertEqual(self.pull_tag_names(), 3)
+        self.master.tables[
+            f"{MASTER_URL}/{self.database_name}/{self.table_name}/tag_names"
+        ][2][0][1] = "z"
+        self.assertEqual(self.pull_tag_names(full=True), 3)
+
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            tag_names = [
+                row[0]
+                for row in data_conn.execute(
+                    f'SELECT tag_name FROM "{self.table_name}_tag_names" ORDER BY tag_name;'
+                )
+            ]
+        self.assertEqual(tag_names, ["b", "c", "z"])
+
+    def test_full_refresh_keeps_local_changes(self):
+        """Test if pulling entries again leaves local changes that are waiting to be synced alone."""
+        self.assertEqual(self.pull_tag_names(), 3)
+        tag_names_table_name = f"{self.table_name}_tag_names"
+        # edit the first tag name locally
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            row = info_conn.execute(
+                "UPDATE sync_status SET status = 'modified' WHERE database_name = %s AND table_name = %s AND remote_id = '1' RETURNING entry_id;",
+                (self.database_name, tag_names_table_name),
+            ).fetchone()
+            assert row is not None
+            entry_id = row[0]
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            data_conn.execute(
+                f"UPDATE \"{tag_names_table_name}\" SET tag_name = 'local' WHERE id = %s;",
+                (int(entry_id),),
+            )
+
+        self.assertEqual(self.pull_tag_names(full=True), 2)
+
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            row = data_conn.execute(
+                f'SELECT tag_name FROM "{tag_names_table_name}" WHERE id = %s;',
+                (int(entry_id),),
+            ).fetchone()
+        self.assertEqual(row, ("local",))
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            row = info_conn.execute(
+                "SELECT status FROM sync_status WHERE database_name = %s AND table_name = %s AND entry_id = %s;",
+                (self.database_name, tag_names_table_name, entry_id),
+            ).fetchone()
+        self.assertEqual(row, ("modified",))
+
+
+class TestFetchPages(unittest.TestCase):
+    def test_ignored_cursor(self):
+        """Test if fetching stops when a master database returns the same full page whatever the cursor."""
+        page = {"columns": ["id"], "data": [[1], [2]]}
+        with patch("sync.sync.get_from_master", return_value=page) as get:
+            pages = list(fetch_pages("http://master/ignores_cursors", "id", 2))
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(get.call_count, 2)
+
+        # watermarks are text
+        with patch("sync.sync.get_from_master", return_value=page):
+            pages = list(fetch_pages("http://master/ignores_cursors", "id", 2, "2"))
+        self.assertEqual(pages, [])
+
+    def test_has_moved_past(self):
+        """Test if cursors are compared as integers when they can be."""
+        self.assertTrue(has_moved_past(10, "9"))
+        self.assertFalse(has_moved_past(9, "10"))
+        self.assertFalse(has_moved_past("b", "b"))
+        self.assertTrue(has_moved_past("c", "b"))
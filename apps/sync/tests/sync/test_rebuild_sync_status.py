@@ -0,0 +1,48 @@
+import unittest
+import psycopg
+from psycopg import sql
+from sync.rebuild import rebuild_sync_status
+from .master_stand_in import find_tagging_table
+from ..generic_database_api.transformations.purge import purge_database
+from constants import CONN_CONFIG
+
+
+class TestRebuildSyncStatus(unittest.TestCase):
+    def setUp(self):
+        # find a table with tagging
+        tagging_table = find_tagging_table()
+        if tagging_table is None:
+            self.fail("Unable to test rebuilding tags: no tables have tagging enabled.")
+        self.database_name, self.table_name, _ = tagging_table
+
+    def tearDown(self):
+        purge_database()
+
+    def test_rebuild(self):
+        """Test if entries stored without sync_status rows and sync_status rows without entries are found and fixed."""
+        tag_names_table_name = f"{self.table_name}_tag_names"
+        # bypass the API, e.g. a manual SQL import
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            data_conn.execute(
+                sql.SQL(
+                    "INSERT INTO {table_name} (tag_name) VALUES ('a'), ('b');"
+                ).format(table_name=sql.Identifier(tag_names_table_name))
+            )
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            info_conn.execute(
+                "INSERT INTO sync_status (table_name, parent_table_name, table_type, database_name, entry_id) VALUES (%s, %s, 'tag_names', %s, '-1');",
+                (tag_names_table_name, self.table_name, self.database_name),
+            )
+
+        expected = [
+            {
+                "table_name": tag_names_table_name,
+                "missing": 2,
+                "orphaned": 1,
+                "misfiled": 0,
+            }
+        ]
+        # reporting does not change anything
+        self.assertEqual(rebuild_sync_status(self.database_name), expected)
+        self.assertEqual(rebuild_sync_status(self.database_name, apply=True), expected)
+        self.assertEqual(rebuild_sync_status(self.database_name), [])
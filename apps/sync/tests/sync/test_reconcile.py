@@ -0,0 +1,150 @@
+import unittest
+from os import environ
+from unittest.mock import patch
+import psycopg
+from sync.sync import find_sync_targets, pull
+from sync.reconcile import reconcile
+from database.info import get_repull_ranges, set_watermark
+from .master_stand_in import MasterStandIn, find_tagging_table
+from ..generic_database_api.transformations.purge import purge_database
+from constants import CONN_CONFIG
+
+MASTER_URL = "http://master"
+
+
+class TestReconcile(unittest.TestCase):
+    def setUp(self):
+        # find a table with tagging
+        tagging_table = find_tagging_table()
+        if tagging_table is None:
+            self.fail(
+                "Unable to test reconciling tags: no tables have tagging enabled."
+            )
+        self.database_name, self.table_name, _ = tagging_table
+
+        self.endpoint = f"{MASTER_URL}/{self.database_name}/{self.table_name}/tag_names"
+        self.master = MasterStandIn()
+        self.master.add_table(
+            self.endpoint,
+            ["id", "tag_name"],
+            [[remote_id, f"tag {remote_id}"] for remote_id in range(1, 101)],
+        )
+        self.patches = [
+            patch.dict(environ, {"DATABASE_URL": MASTER_URL, "CACHE_URL": MASTER_URL}),
+            patch("sync.sync.requests.get", self.master.get),
+        ]
+        for p in self.patches:
+            p.start()
+
+        pull(self.database_name, self.table_name, table_type="tag_names")
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            set_watermark(
+                info_conn,
+                self.database_name,
+                f"{self.table_name}_tag_names",
+                "tag_names",
+                None,
+            )
+        purge_database()
+
+    def reconcile(self, repair: bool = False):
+        return reconcile(
+            self.database_name,
+            self.table_name,
+            table_type="tag_names",
+            chunks=4,
+            leaf_size=8,
+            repair=repair,
+        )
+
+    def test_identical(self):
+        """Test if identical tables are verified with a single range comparison."""
+        result = self.reconcile()
+        self.assertEqual(result["ranges_compared"], 1)
+        self.assertEqual(result["rows_compared"], 0)
+        self.assertEqual(result["mismatched"], [])
+        self.assertEqual(result["missing"], [])
+
+    def test_divergent(self):
+        """Test if only the rows that differ are found, marked and repaired."""
+        rows = self.master.tables[self.endpoint][2]
+        rows[41][1] = "changed"
+        rows.append([101, "new"])
+
+        result = self.reconcile(repair=True)
+        self.assertEqual(result["mismatched"], [42])
+        self.assertEqual(result["missing"], [101])
+        self.assertLess(result["rows_compared"], 50)
+        # the leaf ranges around both rows are pulled again
+        self.assertGreaterEqual(result["repaired"], 2)
+
+        self.assertEqual(self.reconcile()["mismatched"], [])
+
+    def test_queued_repull(self):
+        """Test if the ranges that differ are pulled again by the next incremental pull, and mismatched rows are never pushed."""
+        rows = self.master.tables[self.endpoint][2]
+        rows[41][1] = "changed"
+
+        self.assertEqual(self.reconcile()["mismatched"], [42])
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            targets = find_sync_targets(
+                info_conn,
+                {"database_name": self.database_name, "table_type": "tag_names"},
+            )
+        self.assertEqual(targets, [])
+
+        # nothing is new, so only the queued ranges are pulled
+        self.assertGreaterEqual(
+            pull(self.database_name, self.table_name, table_type="tag_names"), 1
+        )
+        self.assertEqual(self.reconcile()["mismatched"], [])
+        self.assertEqual(
+            pull(self.database_name, self.table_name, table_type="tag_names"), 0
+        )
+
+    def test_local_changes(self):
+        """Test if rows with local changes waiting to be synced are neither marked nor queued to be pulled again."""
+        rows = self.master.tables[self.endpoint][2]
+        rows[41][1] = "changed"
+        tag_names_table_name = f"{self.table_name}_tag_names"
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            row = info_conn.execute(
+                "UPDATE sync_status SET status = 'modified' WHERE database_name = %s AND table_name = %s AND remote_id = '42' RETURNING entry_id;",
+                (self.database_name, tag_names_table_name),
+            ).fetchone()
+            assert row is not None
+            entry_id = row[0]
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            data_conn.execute(
+                f"UPDATE \"{tag_names_table_name}\" SET tag_name = 'local' WHERE id = %s;",
+                (int(entry_id),),
+            )
+
+        result = self.reconcile()
+        self.assertEqual(result["mismatched"], [])
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            self.assertEqual(
+                get_repull_ranges(
+                    info_conn, self.database_name, tag_names_table_name, "tag_names"
+                ),
+                [],
+            )
+
+        # the local change survives a pull, and is still waiting to be synced
+        pull(self.database_name, self.table_name, table_type="tag_names")
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            row = data_conn.execute(
+                f'SELECT tag_name FROM "{tag_names_table_name}" WHERE id = %s;',
+                (int(entry_id),),
+            ).fetchone()
+        self.assertEqual(row, ("local",))
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            row = info_conn.execute(
+                "SELECT status FROM sync_status WHERE database_name = %s AND table_name = %s AND entry_id = %s;",
+                (self.database_name, tag_names_table_name, entry_id),
+            ).fetchone()
+        self.assertEqual(row, ("modified",))
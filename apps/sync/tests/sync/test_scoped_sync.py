@@ -0,0 +1,123 @@
+import unittest
+import psycopg
+from django.test import RequestFactory
+from psycopg.rows import dict_row
+from sync.sync import find_sync_targets, request_sync
+from .master_stand_in import find_tagging_table
+from ..generic_database_api.transformations.purge import purge_database
+from ..generic_database_api.transformations.populate import populate_transformation
+from ..generic_database_api.transformations.transform import TransformTargets
+from constants import CONN_CONFIG
+
+
+class TestScopedSync(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        purge_database()
+
+    def test_scoped_targets_include_prerequisites(self):
+        """Test if syncing one tagged entry also syncs its (unsynced) primary tag first."""
+        # find a table with tagging
+        tagging_table = find_tagging_table()
+        if tagging_table is None:
+            self.fail(
+                "Unable to test scoped sync prerequisites: no tables have primary_tag enabled."
+            )
+        database_name, table_name, target_table_info = tagging_table
+
+        target: TransformTargets = {}
+        target[table_name] = ("data", target_table_info)
+        target[f"{table_name}_tags"] = ("tags", None)
+        target[f"{table_name}_tag_aliases"] = ("tag_aliases", None)
+        target[f"{table_name}_tag_names"] = ("tag_names", None)
+        target[f"{table_name}_tag_groups"] = ("tag_groups", None)
+
+        with psycopg.connect(
+            **CONN_CONFIG, dbname=database_name, row_factory=dict_row
+        ) as data_conn, psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            # populate test values
+            with data_conn.cursor() as data_cur, info_conn.cursor() as info_cur:
+                populate_transformation(data_cur, target)
+
+                for sync_table_name, table_type in (
+                    (f"{table_name}_tag_names", "tag_names"),
+                    (table_name, "data"),
+                ):
+                    info_cur.execute(
+                        "INSERT INTO sync_status (table_name, parent_table_name, table_type, database_name, entry_id, remote_id, sync_timestamp, status) VALUES (%s, %s, %s, %s, %s, NULL, NULL, NULL);",
+                        (sync_table_name, table_name, table_type, database_name, 1),
+                    )
+
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            targets = find_sync_targets(
+                info_conn,
+                {
+                    "database_name": database_name,
+                    "parent_table_name": table_name,
+                    "table_type": "data",
+                    "entry_ids": ["1"],
+                },
+            )
+
+        # expect the primary tag to be synced before the entry that references it
+        self.assertEqual(
+            [target[3] for target in targets],
+            ["tag_names", "data"],
+        )
+
+    def test_entry_ids_require_table_type(self):
+        """Test if entry IDs only select entries from their own table, when the same ID exists in two table types."""
+        # find a table with tagging
+        tagging_table = find_tagging_table()
+        if tagging_table is None:
+            self.fail("Unable to test scoped sync: no tables have tagging enabled.")
+        database_name, table_name, _ = tagging_table
+
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            for sync_table_name, table_type in (
+                (f"{table_name}_tag_names", "tag_names"),
+                (f"{table_name}_tags", "tags"),
+            ):
+                info_conn.execute(
+                    "INSERT INTO sync_status (table_name, parent_table_name, table_type, database_name, entry_id, remote_id, sync_timestamp, status) VALUES (%s, %s, %s, %s, %s, NULL, NULL, NULL);",
+                    (sync_table_name, table_name, table_type, database_name, 1),
+                )
+
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            targets = find_sync_targets(
+                info_conn,
+                {
+                    "database_name": database_name,
+                    "parent_table_name": table_name,
+                    "table_type": "tag_names",
+                    "entry_ids": ["1"],
+                },
+            )
+            self.assertEqual([target[3] for target in targets], ["tag_names"])
+
+            with self.assertRaises(ValueError):
+                find_sync_targets(
+                    info_conn,
+                    {
+                        "database_name": database_name,
+                        "parent_table_name": table_name,
+                        "entry_ids": ["1"],
+                    },
+                )
+
+        factory = RequestFactory()
+        for params in (
+            {"id": "1"},
+            {"database": database_name, "id": "1"},
+            {"database": database_name, "table": table_name, "id": "1"},
+            {
+                "database": database_name,
+                "table": table_name,
+                "table_type": "descriptors",
+                "id": "1",
+            },
+        ):
+            response = request_sync(factory.get("/sync", params))
+            self.assertEqual(response.status_code, 400, params)
@@ -0,0 +1,115 @@
+import threading
+import time
+import unittest
+from os import environ
+from typing import Any
+from unittest.mock import patch
+import psycopg
+import requests
+from psycopg import sql
+from sync.sync import SyncScope, write_through
+from .master_stand_in import StandInResponse, find_tagging_table
+from ..generic_database_api.transformations.purge import purge_database
+from constants import CONN_CONFIG
+
+MASTER_URL = "http://master"
+
+
+class TestWriteThrough(unittest.TestCase):
+    def setUp(self):
+        # find a table with tagging
+        tagging_table = find_tagging_table()
+        if tagging_table is None:
+            self.fail("Unable to test write-through: no tables have tagging enabled.")
+        self.database_name, self.table_name, _ = tagging_table
+
+        # a freshly inserted tag name, waiting to be synced
+        tag_names_table_name = f"{self.table_name}_tag_names"
+        with psycopg.connect(**CONN_CONFIG, dbname=self.database_name) as data_conn:
+            row = data_conn.execute(
+                sql.SQL(
+                    "INSERT INTO {table_name} (tag_name) VALUES ('write through') RETURNING id;"
+                ).format(table_name=sql.Identifier(tag_names_table_name))
+            ).fetchone()
+            assert row is not None
+            entry_id = str(row[0])
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            info_conn.execute(
+                "INSERT INTO sync_status (table_name, parent_table_name, table_type, database_name, entry_id, remote_id, sync_timestamp, status) VALUES (%s, %s, %s, %s, %s, NULL, NULL, NULL);",
+                (
+                    tag_names_table_name,
+                    self.table_name,
+                    "tag_names",
+                    self.database_name,
+                    entry_id,
+                ),
+            )
+
+        self.scope: SyncScope = {
+            "database_name": self.database_name,
+            "table_name": tag_names_table_name,
+            "entry_ids": [entry_id],
+        }
+
+    def tearDown(self):
+        purge_database()
+
+    def write_through(self, post: Any, timeout: float = 5) -> str | None:
+        with (
+            patch.dict(environ, {"DATABASE_URL": MASTER_URL, "CACHE_URL": MASTER_URL}),
+            patch("sync.sync.requests.post", post),
+            patch("sync.sync.sql_receptionist_token", "session"),
+        ):
+            return write_through(self.scope, timeout=timeout)
+
+    def get_sync_status(self) -> tuple[Any, ...] | None:
+        with psycopg.connect(**CONN_CONFIG, dbname="info") as info_conn:
+            return info_conn.execute(
+                "SELECT status, remote_id FROM sync_status WHERE database_name = %s AND table_name = %s AND entry_id = %s;",
+                (
+                    self.database_name,
+                    self.scope["table_name"],
+                    self.scope["entry_ids"][0],
+                ),
+            ).fetchone()
+
+    def test_synced(self):
+        """Test if the remote id is returned once the entry has reached the master database."""
+
+        def post(*args: Any, **kwargs: Any) -> StandInResponse:
+            return StandInResponse(200, "42")
+
+        self.assertEqual(self.write_through(post), "42")
+        self.assertEqual(self.get_sync_status(), ("updated", "42"))
+
+    def test_deadline(self):
+        """Test if inserts stop waiting at the deadline, and if the sync carries on in the background."""
+        release = threading.Event()
+
+        def slow_post(*args: Any, **kwargs: Any) -> StandInResponse:
+            release.wait(10)
+            return StandInResponse(200, "42")
+
+        with (
+            patch.dict(environ, {"DATABASE_URL": MASTER_URL, "CACHE_URL": MASTER_URL}),
+            patch("sync.sync.requests.post", slow_post),
+            patch("sync.sync.sql_receptionist_token", "session"),
+        ):
+            started_at = time.time()
+            self.assertIsNone(write_through(self.scope, timeout=0.2))
+            self.assertLess(time.time() - started_at, 5)
+
+            release.set()
+            deadline = time.time() + 10
+            while self.get_sync_status() != ("updated", "42"):
+                self.assertLess(time.time(), deadline)
+                time.sleep(0.05)
+
+    def test_unreachable(self):
+        """Test if entries that cannot reach the master database are left to the automatic sync."""
+
+        def unreachable_post(*args: Any, **kwargs: Any) -> StandInResponse:
+            raise requests.ConnectionError("Connection refused.")
+
+        self.assertIsNone(self.write_through(unreachable_post))
+        self.assertEqual(self.get_sync_status(), ("failed", None))